@@ -0,0 +1,85 @@
+"""
+Сравнение разбора html-страницы главы целиком (Parser.parse_chapter_page) и потокового разбора
+(ChapterPageStreamParser), который прекращает чтение страницы после закрытия контейнера со страницами главы.
+
+Запуск из директории coloredmanga_scrapper_async:
+    python -m benchmarks.bench_chapter_parser [chapter.html ...]
+Если файлы с сохранёнными страницами глав не указаны, то используется синтетическая страница.
+"""
+import json
+import sys
+import time
+
+from benchmarks.synthetic_pages import make_chapter_page, make_chapter_pages_urls
+from classes.c_utils.parser import ChapterPageStreamParser, Parser
+
+# Размер частей, которыми страница передаётся потоковому разбору (как при загрузке).
+CHUNK_SIZE = 1024 * 16
+
+# Число повторов измерения для каждой страницы.
+REPEATS = 50
+
+
+def parse_full(data: bytes) -> list[str]:
+    """
+    Разбор страницы целиком, как до появления потокового разбора: декодирование и построение полного дерева.
+    """
+    return Parser(data.decode("utf-8")).parse_chapter_page()
+
+
+def parse_stream(data: bytes) -> tuple[list[str], int]:
+    """
+    Потоковый разбор страницы. Возвращает ссылки на страницы и число прочитанных байт.
+    """
+    parser = ChapterPageStreamParser()
+    for start in range(0, len(data), CHUNK_SIZE):
+        parser.feed(data[start:start + CHUNK_SIZE])
+        if parser.is_done:
+            break
+    return parser.close(), parser.bytes_read
+
+
+def measure(func, data: bytes) -> float:
+    """
+    Возвращает среднее процессорное время (в миллисекундах) выполнения func(data).
+    """
+    start = time.process_time()
+    for _ in range(REPEATS):
+        func(data)
+    return (time.process_time() - start) / REPEATS * 1000
+
+
+def bench(name: str, data: bytes) -> dict:
+    """
+    Сравнивает оба способа разбора на странице data.
+    """
+    full_pages = parse_full(data)
+    stream_pages, bytes_read = parse_stream(data)
+    if full_pages != stream_pages:
+        raise AssertionError(f"Результаты разбора {name} не совпадают.")
+
+    return {
+        "page": name,
+        "images": len(full_pages),
+        "bytes_total": len(data),
+        "bytes_read_stream": bytes_read,
+        "cpu_ms_full": round(measure(parse_full, data), 3),
+        "cpu_ms_stream": round(measure(parse_stream, data), 3)
+    }
+
+
+def main() -> None:
+    if len(sys.argv) > 1:
+        pages = []
+        for filename in sys.argv[1:]:
+            with open(filename, "rb") as f_in:
+                pages.append((filename, f_in.read()))
+    else:
+        html = make_chapter_page("Chapter 1 - Romance Dawn", make_chapter_pages_urls(50))
+        pages = [("synthetic", html.encode("utf-8"))]
+
+    print(json.dumps([bench(name, data) for name, data in pages], indent=2))
+
+
+if __name__ == '__main__':
+    main()
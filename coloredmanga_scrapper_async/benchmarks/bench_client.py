@@ -0,0 +1,140 @@
+"""
+Загрузка манги с локального сайта (см. mock_site) асинхронной или синхронной версией в отдельном процессе: сначала
+строится содержание манги, затем загружаются все страницы. Последней строкой выводится результат в формате JSON
+с префиксом RESULT_PREFIX. Запускается из bench_end_to_end.
+
+Запуск:
+    python benchmarks/bench_client.py async|sync <ссылка на мангу> <директория для сохранения> [--threads N]
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+# Директории версий программы.
+PACKAGE_DIRS = {
+    "async": os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "sync": os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                         "coloredmanga_scrapper_sync"),
+}
+
+# Префикс строки с результатом.
+RESULT_PREFIX = "BENCH_RESULT "
+
+
+def get_peak_rss() -> int | None:
+    """
+    Возвращает наибольший объём физической памяти (в байтах), занятой процессом, или None, если его не удалось
+    определить.
+    """
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage"
+                )
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # в macOS значение в байтах, в Linux - в килобайтах.
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def get_quantiles(entry: dict) -> dict[str, float | None]:
+    """
+    Возвращает квантили p50 и p99 (в секундах) из снимка гистограммы.
+    """
+    return {q: round(entry[q], 6) if entry[q] is not None else None for q in ("p50", "p99")}
+
+
+def get_dir_size(path: str) -> tuple[int, int]:
+    """
+    Возвращает число файлов в директории path (включая вложенные) и их общий размер.
+    """
+    files_num = 0
+    size = 0
+    for dir_path, _, files in os.walk(path):
+        for name in files:
+            files_num += 1
+            size += os.path.getsize(os.path.join(dir_path, name))
+    return files_num, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Загрузка манги с локального сайта для бенчмарка.")
+    parser.add_argument("client", choices=sorted(PACKAGE_DIRS), help="версия программы")
+    parser.add_argument("url", help="ссылка на главную страницу манги")
+    parser.add_argument("out_dir", help="директория для сохранения манги")
+    parser.add_argument("--threads", type=int, default=None, help="число потоков загрузки синхронной версии")
+    parser.add_argument("--flatten", action="store_true", help="упрощённая иерархия директорий")
+    args = parser.parse_args()
+
+    # модули выбранной версии импортируются из её директории, которая заменяет директорию скрипта.
+    package_dir = PACKAGE_DIRS[args.client]
+    sys.path[0] = package_dir
+    os.chdir(package_dir)
+    utils = importlib.import_module("utility.utils")
+    metrics = importlib.import_module("utility.metrics")
+
+    if args.threads is not None and args.client == "sync":
+        utils.set_threads_num(args.threads)
+    os.makedirs(args.out_dir, exist_ok=True)
+    os.chdir(args.out_dir)
+
+    started_at = time.perf_counter()
+    manga = utils.build_contents(args.url, use_cache=False)
+    crawled_at = time.perf_counter()
+    utils.download_manga(manga, "manga\\", args.flatten)
+    elapsed = time.perf_counter() - started_at
+
+    latency = {}
+    for entry in metrics.REQUEST_DURATION.snapshot():
+        latency[entry["labels"]["kind"]] = {"count": entry["count"], **get_quantiles(entry)}
+    ttfb = {}
+    for entry in metrics.REQUEST_TTFB.snapshot():
+        ttfb[entry["labels"]["kind"]] = get_quantiles(entry)
+    image_bytes = sum(
+        entry["value"] for entry in metrics.DOWNLOADED_BYTES.snapshot() if entry["labels"]["kind"] == "images"
+    )
+    pages = metrics.PAGES.get_total()
+    files_num, files_size = get_dir_size(args.out_dir)
+    peak_rss = get_peak_rss()
+
+    result = {
+        "client": args.client,
+        "elapsed": round(elapsed, 3),
+        "contents_seconds": round(crawled_at - started_at, 3),
+        "pages": pages,
+        "failed_pages": metrics.FAILED_PAGES.get_total(),
+        "retries": metrics.RETRIES.get_total(),
+        "files": files_num,
+        "files_mb": round(files_size / 1024 ** 2, 3),
+        "downloaded_mb": round(image_bytes / 1024 ** 2, 3),
+        "pages_per_second": round(pages / elapsed, 3),
+        "mb_per_second": round(image_bytes / 1024 ** 2 / elapsed, 3),
+        "latency": latency,
+        "ttfb": ttfb,
+        "peak_rss_mb": round(peak_rss / 1024 ** 2, 1) if peak_rss is not None else None,
+    }
+    print(RESULT_PREFIX + json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Сравнение прежней загрузки содержания манги из файла (файл разбирается целиком и сразу создаются все тома, главы и
+страницы) с текущей, при которой тома создаются только при обращении к ним. Измеряются время и пиковый объём
+выделенной памяти (tracemalloc) для загрузки содержания и для загрузки с последующим обращением к одному тому.
+Содержание также сохраняется во временный файл в компактном формате и измеряется повторно.
+
+Запуск из директории coloredmanga_scrapper_async:
+    python -m benchmarks.bench_contents_load [файл содержания]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from utility.utils import Downloader, Manga
+from classes.volume import Volume
+from utility.contents_format import save_compact
+
+# Число повторов измерения времени.
+REPEATS = 10
+
+
+def load_legacy(filename: str) -> list[Volume]:
+    """
+    Прежняя реализация: все тома создаются сразу.
+    """
+    manga_json = Downloader(filename).download_local_file()
+    return [Volume(vol['name'], vol['chapters']) for vol in manga_json['volumes']]
+
+
+def load_legacy_one_volume(filename: str) -> Volume:
+    """
+    Прежняя реализация с обращением к последнему тому.
+    """
+    return load_legacy(filename)[-1]
+
+
+def load_current(filename: str) -> Manga:
+    """
+    Текущая реализация: создаются только названия томов.
+    """
+    return Manga(filename, from_file=True)
+
+
+def load_current_one_volume(filename: str) -> Volume:
+    """
+    Текущая реализация с обращением к последнему тому.
+    """
+    return load_current(filename).volumes[-1]
+
+
+def measure(func, filename: str) -> dict[str, float]:
+    """
+    Возвращает среднее время выполнения func(filename) в миллисекундах, а также пиковый объём выделенной при этом
+    памяти и объём памяти, занятой результатом, в мегабайтах.
+    """
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        func(filename)
+    elapsed = (time.perf_counter() - start) / REPEATS * 1000
+
+    tracemalloc.start()
+    result = func(filename)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    return {
+        "ms": round(elapsed, 2),
+        "peak_mb": round(peak / 1024 / 1024, 2),
+        "retained_mb": round(retained / 1024 / 1024, 2)
+    }
+
+
+def measure_file(filename: str) -> dict[str, dict[str, float]]:
+    """
+    Выполняет все измерения для файла filename.
+    """
+    return {
+        "legacy": measure(load_legacy, filename),
+        "current": measure(load_current, filename),
+        "legacy_one_volume": measure(load_legacy_one_volume, filename),
+        "current_one_volume": measure(load_current_one_volume, filename)
+    }
+
+
+def main() -> None:
+    filename = sys.argv[1] if len(sys.argv) > 1 else os.path.join("data", "contents_full.json")
+    with open(filename, 'r', encoding='utf-8') as f_in:
+        manga_json = json.load(f_in)
+
+    if load_current(filename).to_JSON() != manga_json:
+        raise AssertionError("Содержание, загруженное по томам, не совпадает с исходным.")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        compact_filename = os.path.join(tmp_dir, "contents.json.gz")
+        save_compact(manga_json, compact_filename)
+        print(json.dumps({
+            "volumes": len(manga_json['volumes']),
+            "json": measure_file(filename),
+            "compact": measure_file(compact_filename)
+        }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
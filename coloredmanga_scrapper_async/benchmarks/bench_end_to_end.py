@@ -0,0 +1,130 @@
+"""
+Сквозной бенчмарк загрузки манги без обращения к настоящему сайту: запускается локальный сайт (см. mock_site) с
+заданными задержкой, пропускной способностью, размерами изображений и долей ошибок, после чего асинхронная и
+синхронная версии по очереди строят содержание манги и загружают все страницы, каждая в отдельном процессе
+(см. bench_client). Для каждого запуска выводятся страницы в секунду, МБ в секунду, квантили p50 и p99 времени
+запросов, пиковый объём памяти процесса и статистика сервера. Отчёт в формате JSON можно сохранить в файл и
+сравнивать отчёты до и после изменения кода.
+
+Запуск из директории coloredmanga_scrapper_async:
+    python -m benchmarks.bench_end_to_end [--clients async,sync] [--chapters 30] [--latency 0.05] [--output файл]
+    python -m benchmarks.bench_end_to_end --help
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_client import RESULT_PREFIX
+from benchmarks.mock_site import MockSite, SiteConfig
+
+# Путь к скрипту, загружающему мангу в отдельном процессе.
+CLIENT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_client.py")
+
+# Наибольшее время (в секундах) одного запуска.
+RUN_TIMEOUT = 3600
+
+
+def run_client(client: str, site: MockSite, threads: int | None, is_flatten: bool) -> dict:
+    """
+    Загружает мангу с сайта site версией client в отдельном процессе во временную директорию и возвращает
+    результат запуска.
+    """
+    out_dir = tempfile.mkdtemp(prefix=f"bench_{client}_")
+    command = [sys.executable, CLIENT_SCRIPT, client, site.manga_url, out_dir]
+    if threads is not None:
+        command += ["--threads", str(threads)]
+    if is_flatten:
+        command.append("--flatten")
+
+    site.reset_stats()
+    started_at = time.perf_counter()
+    try:
+        process = subprocess.run(command, capture_output=True, text=True, encoding="utf-8", errors="replace",
+                                 timeout=RUN_TIMEOUT)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    wall_time = time.perf_counter() - started_at
+
+    lines = [line for line in process.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    if process.returncode != 0 or not lines:
+        print(f"[ERR] Запуск {client} завершился с кодом {process.returncode}:\n{process.stderr[-2000:]}")
+        return {"client": client, "error": process.stderr[-2000:], "server": site.reset_stats()}
+
+    result = json.loads(lines[-1][len(RESULT_PREFIX):])
+    result["wall_time"] = round(wall_time, 3)
+    result["server"] = site.reset_stats()
+    print(
+        f"[INFO] {client}: {result['pages']} стр. за {result['elapsed']} с, {result['pages_per_second']} стр/с, "
+        f"{result['mb_per_second']} МБ/с, пик памяти {result['peak_rss_mb']} МБ."
+    )
+    return result
+
+
+def main() -> None:
+    defaults = SiteConfig()
+    parser = argparse.ArgumentParser(description="Сквозной бенчмарк загрузки манги с локального сайта.")
+    parser.add_argument("--clients", default="async,sync", help="версии программы через запятую")
+    parser.add_argument("--repeats", type=int, default=1, help="число запусков каждой версии")
+    parser.add_argument("--threads", type=int, default=None, help="число потоков загрузки синхронной версии")
+    parser.add_argument("--flatten", action="store_true", help="упрощённая иерархия директорий")
+    parser.add_argument("--volumes", type=int, default=defaults.volumes_num, help="число томов")
+    parser.add_argument("--chapters", type=int, default=defaults.chapters_num, help="число глав")
+    parser.add_argument("--pages-min", type=int, default=defaults.pages_min, help="наименьшее число страниц главы")
+    parser.add_argument("--pages-max", type=int, default=defaults.pages_max, help="наибольшее число страниц главы")
+    parser.add_argument("--image-size", type=int, default=defaults.image_size,
+                        help="средний размер изображения, байт")
+    parser.add_argument("--image-size-sigma", type=float, default=defaults.image_size_sigma,
+                        help="разброс логнормального распределения размеров изображений")
+    parser.add_argument("--filler-size", type=int, default=defaults.filler_size,
+                        help="объём прочего содержимого страницы главы, байт")
+    parser.add_argument("--latency", type=float, default=defaults.latency, help="задержка ответа, с")
+    parser.add_argument("--latency-jitter", type=float, default=defaults.latency_jitter,
+                        help="случайная добавка к задержке ответа, с")
+    parser.add_argument("--bandwidth", type=float, default=defaults.bandwidth,
+                        help="скорость отправки каждого ответа, байт в секунду")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate,
+                        help="доля запросов изображений с ответом 503")
+    parser.add_argument("--truncate-rate", type=float, default=defaults.truncate_rate,
+                        help="доля оборванных ответов с изображениями")
+    parser.add_argument("--seed", type=int, default=defaults.seed, help="начальное значение генератора")
+    parser.add_argument("--output", default=None, help="файл для сохранения отчёта в формате JSON")
+    args = parser.parse_args()
+
+    config = SiteConfig(
+        args.volumes, args.chapters, args.pages_min, args.pages_max, args.image_size, args.image_size_sigma,
+        args.filler_size, args.latency, args.latency_jitter, args.bandwidth, args.error_rate, args.truncate_rate,
+        args.seed
+    )
+    site = MockSite(config)
+    site.start()
+    try:
+        results = [
+            run_client(client.strip(), site, args.threads, args.flatten)
+            for _ in range(args.repeats) for client in args.clients.split(",")
+        ]
+    finally:
+        site.stop()
+
+    report = json.dumps({
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "site": config.to_dict(),
+        "threads": args.threads,
+        "is_flatten": args.flatten,
+        "results": results,
+    }, indent=2, ensure_ascii=False)
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as f_out:
+            f_out.write(report)
+    print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Сравнение прежнего разбора главной страницы манги (выражения XPath компилируются при каждом вызове, на каждый том
+приходится три запроса, а названия и ссылки глав собираются в два независимых списка) с текущим
+Parser.parse_manga_page на синтетической странице с большим числом глав.
+
+Запуск из директории coloredmanga_scrapper_async:
+    python -m benchmarks.bench_manga_parser [число глав] [число томов]
+"""
+import json
+import sys
+import time
+
+import lxml.html
+
+from benchmarks.synthetic_pages import make_manga_page, make_manga_volumes
+from classes.c_utils.parser import Parser
+
+# Число повторов измерения.
+REPEATS = 20
+
+
+def parse_manga_page_legacy(data: str) -> tuple[str, dict[str, dict[str, str]]]:
+    """
+    Прежняя реализация Parser.parse_manga_page.
+    """
+    parsed_data: dict[str, dict[str, str]] = {}
+
+    tree = lxml.html.document_fromstring(data)
+
+    title: str = tree.xpath("//head/title/text()")[0].split('|')[0].strip()[5:]
+
+    no_volumes = tree.xpath("//*[starts-with(@class, 'main version-chap no-volumn')]")
+
+    vols = no_volumes if no_volumes else tree.xpath("//*[starts-with(@class, 'parent has-child')]")
+
+    for vol in vols:
+        vol_name = vol.xpath(".//a/text()")[0].strip()
+        if no_volumes:
+            vol_name = "No Volumes"
+        chapters_names = vol.xpath(".//*[starts-with(@class, 'wp-manga-chapter')]/a/text()")
+        chapters_links = vol.xpath(".//*[starts-with(@class, 'wp-manga-chapter')]/a//@href")
+
+        parsed_data[vol_name] = parsed_data.setdefault(vol_name, {})
+
+        for chapter_name, chapter_link in zip(chapters_names, chapters_links):
+            parsed_data[vol_name][chapter_name.strip()] = chapter_link
+
+    return title, parsed_data
+
+
+def parse_manga_page_current(data: str) -> tuple[str, dict[str, dict[str, str]]]:
+    """
+    Текущая реализация без вывода времени выполнения декоратором timer.
+    """
+    return Parser.parse_manga_page.__wrapped__(Parser(data))
+
+
+def parse_tree_only(data: str) -> None:
+    """
+    Только построение дерева документа: нижняя граница времени разбора.
+    """
+    lxml.html.document_fromstring(data)
+
+
+def measure(func, data: str) -> float:
+    """
+    Возвращает среднее процессорное время (в миллисекундах) выполнения func(data).
+    """
+    start = time.process_time()
+    for _ in range(REPEATS):
+        func(data)
+    return (time.process_time() - start) / REPEATS * 1000
+
+
+def main() -> None:
+    chapters_num = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    volumes_num = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    html = make_manga_page("One Piece", make_manga_volumes(volumes_num, chapters_num))
+    if parse_manga_page_legacy(html) != parse_manga_page_current(html):
+        raise AssertionError("Результаты разбора не совпадают.")
+
+    print(json.dumps({
+        "chapters": chapters_num,
+        "volumes": volumes_num,
+        "bytes": len(html.encode("utf-8")),
+        "cpu_ms_tree_only": round(measure(parse_tree_only, html), 3),
+        "cpu_ms_legacy": round(measure(parse_manga_page_legacy, html), 3),
+        "cpu_ms_current": round(measure(parse_manga_page_current, html), 3)
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""
+Локальный сайт, имитирующий coloredmanga.com (тема Madara): главная страница манги, страницы глав и изображения
+страниц (см. synthetic_pages). Задержка ответов, пропускная способность соединения, распределение размеров
+изображений и доля ошибок задаются в SiteConfig. Сервер работает в отдельном потоке, поэтому к нему можно обращаться
+как из текущего процесса, так и из дочерних.
+"""
+import asyncio
+import math
+import random
+import threading
+import zlib
+
+from aiohttp import web
+
+from benchmarks.synthetic_pages import (SITE_URL, make_chapter_page, make_chapter_pages_urls, make_manga_page,
+                                        make_manga_volumes)
+
+# Название и адрес манги на локальном сайте.
+MANGA_NAME = "One Piece"
+MANGA_SLUG = "one-piece"
+
+# Путь, по которому на сайте хранятся изображения.
+UPLOADS_PATH = "/wp-content/uploads/"
+
+# Размер части ответа, которая отправляется за один раз при ограничении пропускной способности.
+CHUNK_SIZE = 16 * 1024
+
+# Маркеры начала и конца изображения JPEG, которые проверяются при загрузке.
+JPEG_HEAD = b"\xff\xd8\xff\xe0"
+JPEG_TAIL = b"\xff\xd9"
+
+# Наименьший размер изображения (в байтах).
+MIN_IMAGE_SIZE = 1024
+
+
+class SiteConfig:
+    def __init__(self, volumes_num: int = 3, chapters_num: int = 30, pages_min: int = 15, pages_max: int = 25,
+                 image_size: int = 300 * 1024, image_size_sigma: float = 0.5, filler_size: int = 150 * 1024,
+                 latency: float = 0.05, latency_jitter: float = 0.02, bandwidth: float | None = None,
+                 error_rate: float = 0.0, truncate_rate: float = 0.0, seed: int = 0) -> None:
+        """
+        Параметры локального сайта:
+        volumes_num, chapters_num - число томов и глав (при volumes_num=0 главы не разбиты на тома);
+        pages_min, pages_max - наименьшее и наибольшее число страниц главы;
+        image_size, image_size_sigma - средний размер изображения в байтах и разброс логнормального распределения
+        размеров (0 - все изображения одного размера);
+        filler_size - объём прочего содержимого страницы главы в байтах;
+        latency, latency_jitter - задержка перед ответом на каждый запрос и её случайная добавка (в секундах);
+        bandwidth - скорость отправки каждого ответа (байт в секунду), None - без ограничения;
+        error_rate - доля запросов изображений, на которые сервер отвечает 503 Service Unavailable;
+        truncate_rate - доля ответов с изображениями, которые обрываются на середине;
+        seed - начальное значение генератора случайных чисел: при одном и том же значении сайт одинаков.
+        """
+        self.volumes_num = volumes_num
+        self.chapters_num = chapters_num
+        self.pages_min = pages_min
+        self.pages_max = pages_max
+        self.image_size = image_size
+        self.image_size_sigma = image_size_sigma
+        self.filler_size = filler_size
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.truncate_rate = truncate_rate
+        self.seed = seed
+
+    def to_dict(self) -> dict:
+        """
+        Возвращает параметры сайта для вывода в отчёт.
+        """
+        return dict(self.__dict__)
+
+
+class MockSite:
+    def __init__(self, config: SiteConfig, host: str = "127.0.0.1", port: int = 0) -> None:
+        """
+        Класс локального сайта с мангой, описанной config. При port=0 порт выбирается свободный.
+        Сервер запускается методом start и останавливается методом stop.
+        """
+        self.config = config
+        self.host = host
+        self.port = port
+        self.base_url = ""
+        self.stats = self.__empty_stats()
+
+        self.__pages: dict[str, bytes] = {}
+        self.__noise = b""
+        self.__rnd = random.Random(config.seed)
+        self.__loop: asyncio.AbstractEventLoop | None = None
+        self.__thread: threading.Thread | None = None
+        self.__started = threading.Event()
+
+    @property
+    def manga_url(self) -> str:
+        """
+        Ссылка на главную страницу манги.
+        """
+        return f"{self.base_url}/manga/{MANGA_SLUG}/"
+
+    @staticmethod
+    def __empty_stats() -> dict[str, int]:
+        """
+        Возвращает обнулённую статистику сервера.
+        """
+        return {"requests": 0, "errors": 0, "truncated": 0, "bytes_sent": 0}
+
+    def reset_stats(self) -> dict[str, int]:
+        """
+        Возвращает статистику сервера с момента предыдущего вызова и обнуляет её.
+        """
+        stats, self.stats = self.stats, self.__empty_stats()
+        return stats
+
+    def __build_pages(self) -> None:
+        """
+        Создаёт html-страницы сайта со ссылками на локальный адрес.
+        """
+        config = self.config
+        rnd = random.Random(config.seed)
+        volumes = make_manga_volumes(config.volumes_num, config.chapters_num, MANGA_SLUG)
+        self.__pages[f"/manga/{MANGA_SLUG}/"] = make_manga_page(MANGA_NAME, volumes).replace(
+            SITE_URL, self.base_url).encode("utf-8")
+        for chapters in volumes.values():
+            for name, link in chapters:
+                pages_num = rnd.randint(config.pages_min, config.pages_max)
+                urls = [url.replace(SITE_URL, self.base_url)
+                        for url in make_chapter_pages_urls(pages_num, rnd.getrandbits(32))]
+                self.__pages[link.replace(SITE_URL, "")] = make_chapter_page(
+                    name, urls, config.filler_size).encode("utf-8")
+
+        # случайные данные, из которых вырезается содержимое изображений.
+        max_size = self.__get_max_image_size()
+        self.__noise = random.Random(config.seed).randbytes(max_size)
+
+    def __get_max_image_size(self) -> int:
+        """
+        Возвращает наибольший размер изображения: среднее плюс четыре стандартных отклонения логарифма размера.
+        """
+        config = self.config
+        return max(MIN_IMAGE_SIZE, int(config.image_size * math.exp(4 * config.image_size_sigma)))
+
+    def __get_image(self, path: str) -> bytes:
+        """
+        Возвращает изображение по пути path. Размер и содержимое зависят только от пути и seed, поэтому повторный
+        запрос возвращает то же изображение.
+        """
+        config = self.config
+        rnd = random.Random(zlib.crc32(path.encode("utf-8")) ^ config.seed)
+        sigma = config.image_size_sigma
+        # среднее логнормального распределения равно exp(mu + sigma^2 / 2).
+        size = int(rnd.lognormvariate(math.log(config.image_size) - sigma ** 2 / 2, sigma))
+        size = min(max(size, MIN_IMAGE_SIZE), len(self.__noise)) - len(JPEG_HEAD) - len(JPEG_TAIL)
+        offset = rnd.randrange(len(self.__noise) - size + 1)
+        return JPEG_HEAD + self.__noise[offset:offset + size] + JPEG_TAIL
+
+    @staticmethod
+    def __parse_range(value: str | None) -> int:
+        """
+        Возвращает начало запрошенного диапазона из заголовка Range вида bytes=N- (0, если заголовка нет).
+        """
+        if not value or not value.startswith("bytes="):
+            return 0
+        start = value[6:].partition("-")[0]
+        return int(start) if start.isdigit() else 0
+
+    async def __handle(self, request: web.Request) -> web.StreamResponse:
+        """
+        Отвечает на запрос страницы или изображения.
+        """
+        config = self.config
+        self.stats["requests"] += 1
+        await asyncio.sleep(config.latency + self.__rnd.uniform(0, config.latency_jitter))
+
+        path = request.path
+        if path.startswith(UPLOADS_PATH):
+            if self.__rnd.random() < config.error_rate:
+                self.stats["errors"] += 1
+                return web.Response(status=503, headers={"Retry-After": "1"})
+            body = self.__get_image(path)
+            content_type = "image/jpeg"
+            is_truncated = self.__rnd.random() < config.truncate_rate
+        elif path in self.__pages:
+            body = self.__pages[path]
+            content_type = "text/html"
+            is_truncated = False
+        else:
+            return web.Response(status=404)
+
+        start = self.__parse_range(request.headers.get("Range"))
+        if start >= len(body):
+            return web.Response(status=416, headers={"Content-Range": f"bytes */{len(body)}"})
+        response = web.StreamResponse(status=206 if start else 200)
+        response.content_type = content_type
+        if content_type == "text/html":
+            response.charset = "UTF-8"
+        response.content_length = len(body) - start
+        if start:
+            response.headers["Content-Range"] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+        end = len(body)
+        if is_truncated:
+            # соединение закрывается после отправки половины данных, указанных в Content-Length.
+            self.stats["truncated"] += 1
+            response.force_close()
+            end = start + (end - start) // 2
+        await response.prepare(request)
+
+        view = memoryview(body)
+        step = CHUNK_SIZE if config.bandwidth else max(1, end - start)
+        for i in range(start, end, step):
+            chunk = view[i:min(end, i + step)]
+            await response.write(chunk)
+            self.stats["bytes_sent"] += len(chunk)
+            if config.bandwidth:
+                await asyncio.sleep(len(chunk) / config.bandwidth)
+        await response.write_eof()
+        return response
+
+    def __run(self) -> None:
+        """
+        Запускает сервер в цикле событий текущего потока.
+        """
+        loop = asyncio.new_event_loop()
+        self.__loop = loop
+        app = web.Application()
+        app.router.add_get("/{path:.*}", self.__handle)
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, self.host, self.port)
+        loop.run_until_complete(site.start())
+        self.port = runner.addresses[0][1]
+        self.__started.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(runner.cleanup())
+            loop.close()
+
+    def start(self) -> str:
+        """
+        Запускает сервер и возвращает адрес сайта.
+        """
+        self.__thread = threading.Thread(target=self.__run, name="mock_site", daemon=True)
+        self.__thread.start()
+        self.__started.wait()
+        self.base_url = f"http://{self.host}:{self.port}"
+        self.__build_pages()
+        print(f"[INFO] Локальный сайт запущен: {self.manga_url}")
+        return self.base_url
+
+    def stop(self) -> None:
+        """
+        Останавливает сервер.
+        """
+        if self.__loop is not None:
+            self.__loop.call_soon_threadsafe(self.__loop.stop)
+            self.__thread.join()
+            self.__loop = None
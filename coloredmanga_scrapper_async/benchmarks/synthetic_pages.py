@@ -0,0 +1,124 @@
+"""
+Генерация html-страниц, повторяющих разметку сайта (тема Madara), которую разбирает Parser. Используется в
+бенчмарках вместо сохранённых страниц сайта.
+"""
+import random
+
+SITE_URL = "https://coloredmanga.com"
+UPLOADS_URL = f"{SITE_URL}/wp-content/uploads/WP-manga/data"
+
+
+def make_filler(size: int) -> str:
+    """
+    Возвращает разметку размером около size байт, имитирующую комментарии, боковые панели и скрипты.
+    """
+    blocks = []
+    length = 0
+    i = 0
+    while length < size:
+        block = (
+            f'<div class="comment" id="comment-{i}"><div class="comment-author">user_{i}</div>'
+            f'<p class="comment-text">{"Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 4}</p></div>\n'
+            f'<script type="text/javascript">var widget_{i} = {{"id": {i}, "lazy": true}};</script>\n'
+        )
+        blocks.append(block)
+        length += len(block)
+        i += 1
+    return "".join(blocks)
+
+
+def make_chapter_page(title: str, pages: list[str], filler_size: int = 150 * 1024) -> str:
+    """
+    Возвращает html-страницу главы с изображениями pages. После контейнера со страницами следует около
+    filler_size байт прочего содержимого.
+    """
+    images = "".join(
+        f'<div class="page-break no-gaps">\n'
+        f'<img id="image-{i}" src="\n\t\t\t{url}" class="wp-manga-chapter-img">\n'
+        f'</div>\n'
+        for i, url in enumerate(pages)
+    )
+    return (
+        f'<!DOCTYPE html><html lang="en-US"><head><meta charset="UTF-8">'
+        f'<title>{title} | ColoredManga</title>'
+        f'<script type="text/javascript">var manga = {{"chapter": "{title}"}};</script></head>\n'
+        f'<body class="wp-manga-template-default"><div class="wrap"><div class="body-wrap">'
+        f'<header class="site-header"><nav class="main-navigation"><ul><li><a href="{SITE_URL}">Home</a></li></ul>'
+        f'</nav></header>\n'
+        f'<div class="c-page-content"><div class="content-area"><div class="container"><div class="row">'
+        f'<div class="main-col col-md-12"><div class="main-col-inner"><div class="c-blog-post">'
+        f'<div class="entry-header"><h1 id="chapter-heading">{title}</h1></div>'
+        f'<div class="entry-content"><div class="entry-content_wrap"><div class="read-container">\n'
+        f'<div class="reading-content">\n{images}</div>\n'
+        f'</div></div></div></div>\n'
+        f'<div class="c-select-bottom"><a class="btn prev_page" href="#">Prev</a>'
+        f'<a class="btn next_page" href="#">Next</a></div>\n'
+        f'<div id="comments" class="comments-area">{make_filler(filler_size)}</div>'
+        f'</div></div></div></div></div></div>\n'
+        f'<footer class="site-footer">{make_filler(filler_size // 10)}</footer></div></div></body></html>'
+    )
+
+
+def make_chapter_pages_urls(pages_num: int, seed: int = 0) -> list[str]:
+    """
+    Возвращает pages_num url-адресов изображений главы.
+    """
+    rnd = random.Random(seed)
+    chapter_hash = "%032x" % rnd.getrandbits(128)
+    return [f"{UPLOADS_URL}/manga_617f9817c8904/{chapter_hash}/{i:03d}.jpg" for i in range(pages_num)]
+
+
+def make_manga_volumes(volumes_num: int, chapters_num: int,
+                       manga_slug: str = "one-piece") -> dict[str, list[tuple[str, str]]]:
+    """
+    Возвращает тома манги с chapters_num главами, равномерно распределёнными по volumes_num томам. Если
+    volumes_num равно 0, то все главы помещаются в том "No Volumes". Главы каждого тома перечислены в обратном
+    порядке, как на сайте.
+    """
+    volumes: dict[str, list[tuple[str, str]]] = {}
+    per_volume = chapters_num // volumes_num if volumes_num else chapters_num
+    for ch_num in range(1, chapters_num + 1):
+        if volumes_num:
+            vol_num = min((ch_num - 1) // per_volume, volumes_num - 1) + 1
+            vol_name = f"Volume {vol_num}"
+            vol_slug = f"volume-{vol_num}/"
+        else:
+            vol_name = "No Volumes"
+            vol_slug = ""
+        volumes.setdefault(vol_name, []).append(
+            (f"Chapter {ch_num} - Title {ch_num}", f"{SITE_URL}/manga/{manga_slug}/{vol_slug}chapter-{ch_num}/")
+        )
+    return {vol_name: chapters[::-1] for vol_name, chapters in reversed(volumes.items())}
+
+
+def make_manga_page(name: str, volumes: dict[str, list[tuple[str, str]]]) -> str:
+    """
+    Возвращает главную страницу манги name с томами volumes (см. make_manga_volumes).
+    """
+    def chapters_html(chapters: list[tuple[str, str]]) -> str:
+        return "".join(
+            f'<li class="wp-manga-chapter    ">\n<a href="{link}">\n{ch_name} </a>\n'
+            f'<span class="chapter-release-date"><i>April 1, 2022</i></span></li>\n'
+            for ch_name, link in chapters
+        )
+
+    if list(volumes) == ["No Volumes"]:
+        listing = f'<ul class="main version-chap no-volumn">\n{chapters_html(volumes["No Volumes"])}</ul>'
+    else:
+        listing = '<ul class="main version-chap volumns">\n' + "".join(
+            f'<li class="parent has-child">\n<a href="javascript:void(0)" class="has-child">{vol_name}</a>\n'
+            f'<ul class="sub-chap list-chap" style="display: none;">\n{chapters_html(chapters)}</ul></li>\n'
+            for vol_name, chapters in volumes.items()
+        ) + '</ul>'
+
+    return (
+        f'<!DOCTYPE html><html lang="en-US"><head><meta charset="UTF-8">'
+        f'<title>Read {name} | ColoredManga</title></head>\n'
+        f'<body class="wp-manga-template-default"><div class="wrap"><div class="body-wrap">'
+        f'<div class="profile-manga"><div class="post-title"><h1>{name}</h1></div>'
+        f'<div class="summary_content"><div class="post-content">{make_filler(5 * 1024)}</div></div></div>\n'
+        f'<div class="c-page-content"><div class="page-content-listing single-page">'
+        f'<div class="listing-chapters_wrap">\n{listing}\n</div></div></div>\n'
+        f'<div id="comments" class="comments-area">{make_filler(30 * 1024)}</div>'
+        f'</div></div></body></html>'
+    )
@@ -3,8 +3,11 @@ import os
 
 import requests
 
+from classes.c_utils.html_cache import CHAPTER_PAGE_TTL, html_cache
 import utility.utils as utils
+from utility.contents_format import ContentsIndex, index_contents, is_compact_file, load_compact
 from utility.decorators import timer
+from utility.rate_limiter import rate_limiter
 
 
 class Downloader:
@@ -14,6 +17,17 @@ class Downloader:
         """
         self.link = link
 
+        # значения заголовков ETag и Last-Modified последней загруженной страницы (ключи 'etag' и 'last_modified').
+        self.validators: dict[str, str] = {}
+
+    @staticmethod
+    def __get_validators(etag: str | None, last_modified: str | None) -> dict[str, str]:
+        """
+        Возвращает заданные значения заголовков ETag и Last-Modified в виде, в котором они хранятся в содержании.
+        """
+        validators = {"etag": etag, "last_modified": last_modified}
+        return {key: value for key, value in validators.items() if value}
+
     @staticmethod
     def __is_status_code_ok(data: requests.models.Response) -> None:
         """
@@ -38,29 +52,92 @@ class Downloader:
         self.__is_content_type_html(data)
 
     @timer
-    def download_html(self) -> str:
+    def download_html(self, ttl: float = CHAPTER_PAGE_TTL) -> str:
         """
         Загружает данные из удалённого источника.
+        Загруженная страница сохраняется в html_cache на время ttl (в секундах), и до его истечения повторные
+        запросы этой страницы обслуживаются из кэша. Устаревшая запись кэша проверяется условным запросом.
+        Частота запросов и скорость получения данных ограничиваются rate_limiter.
+        Значения заголовков ETag и Last-Modified страницы сохраняются в validators.
         """
+        entry = html_cache.get(self.link)
+        if entry is not None and entry.is_fresh:
+            self.validators = self.__get_validators(entry.etag, entry.last_modified)
+            return entry.text
+
+        headers = {**utils.headers, **html_cache.get_conditional_headers(entry)}
+        rate_limiter.wait_request()
         try:
-            data = requests.get(self.link, headers=utils.headers, timeout=10)
+            data = requests.get(self.link, headers=headers, timeout=10)
         except requests.exceptions.ConnectionError:
             raise TimeoutError(f"Сервер не отвечает на запрос по адресу {self.link}.")
+        rate_limiter.wait_bytes(len(data.content))
+
+        if entry is not None and data.status_code == 304:
+            html_cache.touch(self.link, ttl)
+            self.validators = self.__get_validators(entry.etag, entry.last_modified)
+            return entry.text
 
         self.__validate_html_data(data)
 
+        etag, last_modified = data.headers.get("ETag"), data.headers.get("Last-Modified")
+        html_cache.put(self.link, data.text, etag, last_modified, ttl)
+        self.validators = self.__get_validators(etag, last_modified)
         return data.text
 
+    def download_html_conditional(self, validators: dict[str, str]) -> tuple[str | None, dict[str, str]]:
+        """
+        Загружает данные из удалённого источника, только если они изменились с момента предыдущей загрузки.
+        validators содержит значения заголовков ETag и Last-Modified предыдущего ответа (ключи 'etag' и
+        'last_modified'). Если данные не изменились (ответ 304), то возвращает None и прежние validators, иначе -
+        данные и новые validators.
+        """
+        headers = dict(utils.headers)
+        if etag := validators.get("etag"):
+            headers["If-None-Match"] = etag
+        if last_modified := validators.get("last_modified"):
+            headers["If-Modified-Since"] = last_modified
+
+        rate_limiter.wait_request()
+        try:
+            data = requests.get(self.link, headers=headers, timeout=10)
+        except requests.exceptions.ConnectionError:
+            raise TimeoutError(f"Сервер не отвечает на запрос по адресу {self.link}.")
+        rate_limiter.wait_bytes(len(data.content))
+
+        if data.status_code == 304:
+            return None, validators
+
+        self.__validate_html_data(data)
+
+        return data.text, self.__get_validators(data.headers.get("ETag"), data.headers.get("Last-Modified"))
+
     def download_local_file(self) -> dict:
         """
-        Загружает данные из файла.
+        Загружает данные из файла. Файл может быть как в обычном формате JSON, так и в компактном (определяется по
+        расширению, см. contents_format).
         """
         try:
             with open(self.link, 'r', encoding='utf-8') as f_in:
                 if os.stat(self.link).st_size == 0:  # если файл пуст
                     raise ValueError("Файл пуст. Произведите загрузку данных из удалённого источника.")
+                if is_compact_file(self.link):
+                    return load_compact(self.link)
                 return json.load(f_in)
         except FileNotFoundError:
             raise FileNotFoundError(
                 "Файл отсутствует. Проверьте путь до файла или произведите загрузку данных из удалённого источника."
             )
+
+    def index_local_file(self) -> ContentsIndex:
+        """
+        Загружает из файла сведения о манге и названия её томов, не разбирая сами тома (см. contents_format).
+        """
+        try:
+            if os.stat(self.link).st_size == 0:  # если файл пуст
+                raise ValueError("Файл пуст. Произведите загрузку данных из удалённого источника.")
+            return index_contents(self.link)
+        except FileNotFoundError:
+            raise FileNotFoundError(
+                "Файл отсутствует. Проверьте путь до файла или произведите загрузку данных из удалённого источника."
+            )
@@ -1,7 +1,19 @@
 import lxml.html
+from lxml import etree
 
 from utility.decorators import timer
 
+# Префиксы классов контейнера со страницами главы и элемента, содержащего отдельную страницу (изображение).
+READER_CLASS = "reading-content"
+PAGE_BREAK_CLASS = "page-break"
+
+# Выражения XPath для разбора главной страницы манги компилируются один раз при загрузке модуля.
+TITLE_XPATH = etree.XPath("//head/title/text()")
+NO_VOLUMES_XPATH = etree.XPath("//*[starts-with(@class, 'main version-chap no-volumn')]")
+VOLUMES_XPATH = etree.XPath("//*[starts-with(@class, 'parent has-child')]")
+VOLUME_NAME_XPATH = etree.XPath("string((.//a/text())[1])")
+CHAPTER_LINKS_XPATH = etree.XPath(".//*[starts-with(@class, 'wp-manga-chapter')]/a")
+
 
 class Parser:
     def __init__(self, data: str) -> None:
@@ -14,29 +26,27 @@ class Parser:
     def parse_manga_page(self) -> tuple[str, dict[str, dict[str, str]]]:
         """
         Разбирает главную страницу манги и находит название манги, а так же тома и главы для соответствующих томов.
+        Название и ссылка каждой главы извлекаются из одного и того же элемента за один проход по тому.
         """
         parsed_data: dict[str, dict[str, str]] = {}
 
         tree = lxml.html.document_fromstring(self.data)
 
-        title: str = tree.xpath("//head/title/text()")[0].split('|')[0].strip()[5:]
+        title: str = TITLE_XPATH(tree)[0].split('|')[0].strip()[5:]
 
         # У некоторых манг на сайте нет томов, только список глав. Обрабатываем такой случай.
-        no_volumes = tree.xpath("//*[starts-with(@class, 'main version-chap no-volumn')]")
+        no_volumes = NO_VOLUMES_XPATH(tree)
 
-        vols = no_volumes if no_volumes else tree.xpath("//*[starts-with(@class, 'parent has-child')]")
+        vols = no_volumes if no_volumes else VOLUMES_XPATH(tree)
 
         for vol in vols:
-            vol_name = vol.xpath(".//a/text()")[0].strip()
-            if no_volumes:
-                vol_name = "No Volumes"
-            chapters_names = vol.xpath(".//*[starts-with(@class, 'wp-manga-chapter')]/a/text()")
-            chapters_links = vol.xpath(".//*[starts-with(@class, 'wp-manga-chapter')]/a//@href")
+            vol_name = "No Volumes" if no_volumes else VOLUME_NAME_XPATH(vol).strip()
 
-            parsed_data[vol_name] = parsed_data.setdefault(vol_name, {})
+            vol_chapters = parsed_data.setdefault(vol_name, {})
 
-            for chapter_name, chapter_link in zip(chapters_names, chapters_links):
-                parsed_data[vol_name][chapter_name.strip()] = chapter_link
+            for link in CHAPTER_LINKS_XPATH(vol):
+                chapter_name = link.text if link.text is not None else link.text_content()
+                vol_chapters[chapter_name.strip()] = link.get('href')
 
         return title, parsed_data
 
@@ -53,3 +63,77 @@ class Parser:
             parsed_data.append(el.xpath(".//img//@src")[0].strip())
 
         return parsed_data
+
+
+class ChapterPageTarget:
+    def __init__(self) -> None:
+        """
+        Обработчик событий потокового разбора html-страницы главы (target для lxml.etree.HTMLParser). Собирает ссылки
+        на страницы манги так же, как Parser.parse_chapter_page, и отмечает момент, когда закрывается контейнер со
+        страницами главы: всё, что идёт после него (комментарии, боковые панели, скрипты), для разбора не нужно.
+        """
+        self.pages: list[str] = []
+        self.is_done = False
+
+        # глубина вложенности текущего элемента, а также элементов контейнера главы и текущей страницы.
+        self.__depth = 0
+        self.__reader_depth: int | None = None
+        self.__page_break_depth: int | None = None
+        self.__has_img = False
+
+    def start(self, tag: str, attrib: dict) -> None:
+        self.__depth += 1
+        cls = attrib.get("class", "")
+        if self.__reader_depth is None and cls.startswith(READER_CLASS):
+            self.__reader_depth = self.__depth
+        if self.__page_break_depth is None and cls.startswith(PAGE_BREAK_CLASS):
+            self.__page_break_depth = self.__depth
+            self.__has_img = False
+        elif tag == "img" and self.__page_break_depth is not None and not self.__has_img and "src" in attrib:
+            # У каждой страницы берётся только первое изображение.
+            self.pages.append(attrib["src"].strip())
+            self.__has_img = True
+
+    def end(self, tag: str) -> None:
+        if self.__depth == self.__page_break_depth:
+            self.__page_break_depth = None
+        if self.__depth == self.__reader_depth:
+            self.is_done = True
+        self.__depth -= 1
+
+    def data(self, data: str) -> None:
+        pass
+
+    def close(self) -> list[str]:
+        return self.pages
+
+
+class ChapterPageStreamParser:
+    def __init__(self, encoding: str = "utf-8") -> None:
+        """
+        Класс, разбирающий html-страницу главы по частям по мере её загрузки. После того как свойство is_done
+        становится True, остаток страницы можно не загружать.
+        """
+        self.target = ChapterPageTarget()
+        self.parser = etree.HTMLParser(target=self.target, encoding=encoding)
+        self.bytes_read = 0
+
+    @property
+    def is_done(self) -> bool:
+        """
+        Возвращает True, если контейнер со страницами главы уже закрыт.
+        """
+        return self.target.is_done
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Передаёт очередную часть страницы на разбор.
+        """
+        self.bytes_read += len(chunk)
+        self.parser.feed(chunk)
+
+    def close(self) -> list[str]:
+        """
+        Завершает разбор и возвращает ссылки на страницы манги (т.е. изображения).
+        """
+        return self.parser.close()
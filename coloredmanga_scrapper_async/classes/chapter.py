@@ -1,34 +1,62 @@
+import sys
+
 import utility.utils as utils
 from classes.page import Page
+from utility.contents_format import get_common_prefix
+
+# Разделитель имён файлов страниц в строке, в которой они хранятся.
+FILES_SEPARATOR = "\n"
 
 
 class Chapter:
+    __slots__ = ('name', 'url', 'prefix', 'files', 'pages_num', '__pages')
+
     def __init__(self, name: str, chapter_url: str, raw_pages: list[str]) -> None:
         """
         Класс, хранящий название главы и список url-адресов её страниц.
+        Адреса страниц хранятся в виде общего для них начала prefix (одна строка на все главы с одинаковым началом)
+        и одной строки files с именами файлов страниц, разделёнными FILES_SEPARATOR. Список адресов raw_pages и
+        объекты Page создаются по этим данным при обращении к ним; объекты Page, полученные через pages,
+        сохраняются в главе.
         """
         self.name = name
         self.url = chapter_url
-        self.raw_pages = raw_pages
 
-        # список формируется путём обработки данных из self.raw_pages.
-        self.pages: list[Page] = []
+        prefix = get_common_prefix(raw_pages)
+        self.prefix = sys.intern(prefix)
+        self.files = FILES_SEPARATOR.join(page[len(prefix):] for page in raw_pages)
+        self.pages_num = len(raw_pages)
+        self.__pages: tuple[Page, ...] | None = None
 
-        self.__build_pages()
+    @classmethod
+    def from_packed(cls, name: str, chapter_url: str, prefix: str, files: list[str]) -> "Chapter":
+        """
+        Создаёт главу по данным компактного формата содержания: общему началу адресов страниц prefix и именам файлов
+        страниц files. Полные адреса страниц при этом не строятся и не разбиваются заново.
+        """
+        chapter = cls.__new__(cls)
+        chapter.name = name
+        chapter.url = chapter_url
+        chapter.prefix = sys.intern(prefix)
+        chapter.files = FILES_SEPARATOR.join(files)
+        chapter.pages_num = len(files)
+        chapter.__pages = None
+        return chapter
 
     def __repr__(self):
         """
         Строковое представление класса.
         """
+        pages = ", ".join(f'\n\t\t\t{page}' for page in self.raw_pages)
         return f'\n\t\tname: {self.name},\n' \
                f'\t\turl: {self.url},\n' \
-               f'\t\tpages: {self.pages}'
+               f'\t\tpages: [{pages}]'
 
     def to_JSON(self):
         chapter_dict = {
             "name": self.name,
             "url": self.url,
-            "pages": [page.to_JSON() for page in self.pages]
+            "pages": self.raw_pages
         }
         return chapter_dict
 
@@ -36,19 +64,31 @@ class Chapter:
         """
         Возвращает количество страниц в главе.
         """
-        return len(self.pages)
+        return self.pages_num
+
+    @property
+    def raw_pages(self) -> list[str]:
+        """
+        Возвращает список url-адресов страниц главы.
+        """
+        if not self.pages_num:
+            return []
+        return [self.prefix + file for file in self.files.split(FILES_SEPARATOR)]
 
-    # @console_log(info={'attr': 'name', 'm': 'обработано'})
-    def __build_pages(self) -> None:
+    @property
+    def pages(self) -> tuple[Page, ...]:
         """
-        Формирует список страниц данной главы.
+        Возвращает страницы данной главы. Страницы создаются при первом обращении и сохраняются в главе, поэтому
+        изменения страниц (например, пути page.path) видны при следующих обращениях; сам кортеж страниц неизменяем.
         """
-        for page in self.raw_pages:
-            self.pages.append(Page(page))
+        if self.__pages is None:
+            self.__pages = tuple(Page(page) for page in self.raw_pages)
+        return self.__pages
 
     def pages_preparation(self, path: str, page_number: int, is_flatten: bool) -> list[Page]:
         """
-        Формирует список страниц манги для загрузки.
+        Формирует список страниц манги для загрузки. Если к страницам главы уже обращались через pages, то пути
+        записываются в эти же страницы; иначе страницы создаются только для загрузки и в главе не сохраняются.
         """
         if is_flatten:
             permitted_path = path
@@ -56,8 +96,9 @@ class Chapter:
             path = f"{path}{self.name}\\"
             permitted_path = utils.create_dir(path)
 
+        pages = list(self.__pages) if self.__pages is not None else [Page(page) for page in self.raw_pages]
         number = page_number
-        for page in self.pages:
+        for page in pages:
             # Формируем имена страниц: "001" для обычного режима и "0001" для упрощённой иерархии файлов.
             if is_flatten:
                 number_str = str(number).rjust(4, "0")
@@ -68,4 +109,4 @@ class Chapter:
 
             page.pages_preparation(permitted_path, number_str)
 
-        return self.pages
+        return pages
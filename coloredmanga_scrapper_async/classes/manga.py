@@ -1,13 +1,20 @@
 import math
+from typing import Iterator
 
 import utility.utils as utils
 from classes.c_utils.downloader import Downloader
+from classes.c_utils.html_cache import MANGA_PAGE_TTL
 from classes.c_utils.parser import Parser
 from classes.page import Page
-from classes.volume import Volume
+from classes.volume import Volume, VolumeList
 from utility.async_contents_downloader import get_full_contents
 from utility.async_pages_downloader import download_pages
+from utility.cbz_writer import CbzWriter, skip_complete_archives
+from utility.contents_format import ContentsIndex
+from utility.dedup import DedupIndex
+from utility.journal import DownloadJournal
 from utility.decorators import console_log
+from utility.progress import progress
 
 
 class Manga:
@@ -20,7 +27,9 @@ class Manga:
         self.from_file = from_file
 
         self.name = None
-        self.volumes: list[Volume] = []
+        self.volumes = VolumeList()
+        # значения заголовков ETag и Last-Modified главной страницы, используемые при обновлении содержания.
+        self.validators: dict[str, str] = {}
 
         self.__build_volumes()
 
@@ -44,33 +53,38 @@ class Manga:
             "url": self.link,
             "volumes": [volume.to_JSON() for volume in self.volumes]
         }
+        if self.validators:
+            manga_dict["validators"] = self.validators
         return manga_dict
 
     @console_log(info='обработана главная страница')
     def __get_manga_from_url(self) -> dict[str, dict[str, str]]:
         """
         На основе url-адреса скачивает главную страницу манги и при помощи Parser определяет название и
-        тома, а так же url-адреса глав, соответствующих томам.
+        тома, а так же url-адреса глав, соответствующих томам. Значения заголовков ETag и Last-Modified главной
+        страницы сохраняются в validators, чтобы при обновлении содержания выполнить условный запрос.
         """
         downloader = Downloader(self.link)
-        manga_html = downloader.download_html()
+        manga_html = downloader.download_html(MANGA_PAGE_TTL)
+        self.validators = downloader.validators
 
         parser = Parser(manga_html)
         self.name, manga_vols = parser.parse_manga_page()
 
         return manga_vols
 
-    def __get_manga_from_file(self) -> list[dict]:
+    def __get_manga_from_file(self) -> ContentsIndex:
         """
-        На основе файла JSON заполняет поля класса Manga. Возвращает список томов для дальнейшей обработки.
+        На основе файла JSON заполняет поля класса Manga. Возвращает индекс томов для дальнейшей обработки.
         """
         downloader = Downloader(self.link)
-        manga_json = downloader.download_local_file()
+        contents_index = downloader.index_local_file()
 
-        self.link = manga_json['url']
-        self.name = manga_json['name']
+        self.link = contents_index.header['url']
+        self.name = contents_index.header['name']
+        self.validators = contents_index.header.get('validators', {})
 
-        return manga_json['volumes']
+        return contents_index
 
     def __build_vols_from_utl(self, manga_vols: dict[str, dict[str, str]]) -> None:
         """
@@ -83,26 +97,35 @@ class Manga:
             vol_name, chapters = list(vol.items())[0]
             self.volumes.append(Volume(vol_name, chapters))
 
-    def __build_vols_from_file(self, manga_vols: list[dict]) -> None:
+    def __build_vols_from_file(self, contents_index: ContentsIndex) -> None:
         """
-        Заполняет список томов для данных, полученных из файла.
+        Заполняет список томов для данных, полученных из файла. Сразу известны только названия томов; главы и
+        страницы тома разбираются из файла при первом обращении к нему, т.е. только для томов, которые будут
+        загружаться (или при сохранении всего содержания). Тома из файла в компактном формате создаются сразу из
+        общих начал адресов и имён файлов страниц, без восстановления полных адресов.
         """
-        for vol in manga_vols:
-            self.volumes.append(Volume(vol['name'], vol['chapters']))
+        def load_volume(i: int) -> Volume:
+            vol = contents_index.load_packed_volume(i)
+            if vol is not None:
+                return Volume.from_packed(vol['name'], vol['chapters'])
+            vol = contents_index.load_volume(i)
+            return Volume(vol['name'], vol['chapters'])
+
+        self.volumes = VolumeList(contents_index.names, load_volume)
 
     def __build_volumes(self) -> None:
         """
         Формирует данные, учитывая, откуда они поступают: из файла или удалённого ресурса.
         """
         if self.from_file:
-            manga_vols = self.__get_manga_from_file()
-            self.__build_vols_from_file(manga_vols)
+            contents_index = self.__get_manga_from_file()
+            self.__build_vols_from_file(contents_index)
         else:
             manga_vols = self.__get_manga_from_url()
             self.__build_vols_from_utl(manga_vols)
 
     @staticmethod
-    def __validate_downloading_params(start_with: int, end_with: int) -> None:
+    def validate_downloading_params(start_with: int, end_with: int) -> None:
         """
         Проверяет правильность параметров ограничения начального и конечного томов (глав, в случае, если томов
         у манги нет) для сохранения.
@@ -113,12 +136,46 @@ class Manga:
             if start_with >= end_with:
                 raise ValueError("Номер начального тома или главы больше или равен номеру конечного.")
 
-    def pages_preparation(self, dir_root: str, is_flatten: bool, start_with: int, end_with: int) -> list[Page]:
+    def iter_pages(self, dir_root: str, is_flatten: bool, start_with: int, end_with: int,
+                   is_resume: bool = False) -> Iterator[Page]:
         """
-        Формирует список страниц манги для загрузки на основе томов с учетом опциональных ограничений
+        Последовательно выдаёт страницы манги для загрузки на основе томов с учетом опциональных ограничений
         start_with и end_with. Если томов у манги нет, то данные ограничения применяются к главам.
+        Страницы формируются по одному тому за раз, поэтому загрузку можно начинать, не дожидаясь обработки всей манги.
+        Число страниц каждого тома передаётся в progress до начала его загрузки.
+        При is_resume=True пропускаются страницы, которые уже сохранены на диске.
+        """
+        manga_path = utils.get_permitted_path(f"{dir_root}{self.name}\\")
+        pages = (page for vol_name, vol_pages in self.iter_volumes(dir_root, is_flatten, start_with, end_with)
+                 for page in self.__track_volume(manga_path, vol_name, vol_pages))
+        if is_resume:
+            pages = utils.skip_complete_pages(pages)
+        yield from pages
+
+    @staticmethod
+    def __track_volume(manga_path: str, vol_name: str, pages: list[Page]) -> list[Page]:
+        """
+        Добавляет страницы тома vol_name в ход загрузки и возвращает их.
+        """
+        progress.add_volume(vol_name, utils.get_permitted_path(f"{manga_path}{vol_name}\\"), len(pages))
+        return pages
+
+    def count_volumes(self, start_with: int, end_with: int) -> int:
+        """
+        Возвращает число томов, попадающих в диапазон от start_with до end_with (см. iter_pages).
+        """
+        has_volumes = self.volumes.names != ["No Volumes"]
+        end_with = end_with or math.inf
+        return sum(self.get_chapters_range(vol_name, has_volumes, start_with, end_with) is not None
+                   for vol_name in self.volumes.names)
+
+    def iter_volumes(self, dir_root: str, is_flatten: bool, start_with: int,
+                     end_with: int) -> Iterator[tuple[str, list[Page]]]:
         """
-        self.__validate_downloading_params(start_with, end_with)
+        Последовательно выдаёт название и страницы для загрузки каждого тома, попадающего в диапазон от start_with
+        до end_with (см. iter_pages).
+        """
+        self.validate_downloading_params(start_with, end_with)
 
         path = f"{dir_root}{self.name}\\"
         permitted_path = utils.create_dir(path)
@@ -126,30 +183,61 @@ class Manga:
         if end_with == 0:
             end_with = math.inf
 
-        # Список всех загружаемых страниц.
-        pages_lst = []
-
-        for vol in self.volumes:
-            # У некоторых манг на сайте нет томов, только главы. Обрабатываем такой случай.
-            if len(self.volumes) == 1 and self.volumes[0].name == "No Volumes":
-                vol_num = start_with
-                start_with_ch = start_with
-                end_with_ch = end_with
-            else:
-                vol_num = int(vol.name.split()[1])
-                # Если тома есть, то снимаем ограничения start_with и end_with для глав, т.к. в таком случае
-                # они - ограничения на тома.
-                start_with_ch = 0
-                end_with_ch = math.inf
-            if start_with <= vol_num < end_with:
-                pages_lst.extend(
-                    vol.pages_preparation(permitted_path, is_flatten, start_with_ch, end_with_ch)
-                )
-        return pages_lst
-
-    def download(self, dir_root: str, is_flatten: bool, start_with: int, end_with: int) -> None:
-        """
-        Формирует список страниц манги, загружает и сохраняет их.
-        """
-        pages = self.pages_preparation(dir_root, is_flatten, start_with, end_with)
-        download_pages(pages)
+        # решение о загрузке тома принимается по его названию, поэтому невыбранные тома не создаются.
+        has_volumes = self.volumes.names != ["No Volumes"]
+        for i, vol_name in enumerate(self.volumes.names):
+            chapters_range = self.get_chapters_range(vol_name, has_volumes, start_with, end_with)
+            if chapters_range is not None:
+                yield vol_name, self.volumes[i].pages_preparation(permitted_path, is_flatten, *chapters_range)
+
+    @staticmethod
+    def get_chapters_range(vol_name: str, has_volumes: bool, start_with: int,
+                           end_with: int | float) -> tuple[int, int | float] | None:
+        """
+        Проверяет, попадает ли том vol_name в диапазон от start_with до end_with, и возвращает ограничения на номера
+        его глав. Если том не попадает в диапазон, то возвращает None.
+        """
+        # У некоторых манг на сайте нет томов, только главы. Обрабатываем такой случай.
+        if not has_volumes:
+            return start_with, end_with
+
+        vol_num = int(vol_name.split()[1])
+        if start_with <= vol_num < end_with:
+            # Если тома есть, то снимаем ограничения start_with и end_with для глав, т.к. в таком случае
+            # они - ограничения на тома.
+            return 0, math.inf
+        return None
+
+    def pages_preparation(self, dir_root: str, is_flatten: bool, start_with: int, end_with: int,
+                          is_resume: bool = False) -> list[Page]:
+        """
+        Формирует список страниц манги для загрузки на основе томов с учетом опциональных ограничений
+        start_with и end_with. Если томов у манги нет, то данные ограничения применяются к главам.
+        При is_resume=True из списка исключаются страницы, которые уже сохранены на диске.
+        """
+        return list(self.iter_pages(dir_root, is_flatten, start_with, end_with, is_resume))
+
+    def download(self, dir_root: str, is_flatten: bool, start_with: int, end_with: int,
+                 is_resume: bool = False, journal: DownloadJournal | None = None,
+                 dedup: DedupIndex | None = None, archives: CbzWriter | None = None) -> None:
+        """
+        Формирует страницы манги, загружает и сохраняет их. Страницы передаются на загрузку по мере формирования.
+        Если задан journal, то страницы записываются в журнал загрузки, а загруженные по данным журнала страницы
+        пропускаются без сканирования диска. Если задан dedup, то одинаковые изображения загружаются и хранятся
+        один раз. Если задан archives, то страницы каждой главы (при is_flatten=True - каждого тома) записываются
+        в архив CBZ, а при is_resume=True пропускаются страницы уже сохранённых архивов.
+        Ход загрузки выводится в консоль при помощи progress.
+        """
+        if archives is not None:
+            pages = self.iter_pages(dir_root, is_flatten, start_with, end_with)
+            if is_resume:
+                pages = skip_complete_archives(pages)
+        elif journal is None:
+            pages = self.iter_pages(dir_root, is_flatten, start_with, end_with, is_resume)
+        else:
+            pages = utils.plan_pages(self.iter_pages(dir_root, is_flatten, start_with, end_with), journal)
+        progress.start(self.count_volumes(start_with, end_with))
+        try:
+            download_pages(pages, journal=journal, dedup=dedup, archives=archives)
+        finally:
+            progress.stop()
@@ -1,4 +1,6 @@
 class Page:
+    __slots__ = ('url', 'path')
+
     def __init__(self, page_url: str) -> None:
         """
         Класс, хранящий url-адрес страницы и путь, по которому она будет сохранена.
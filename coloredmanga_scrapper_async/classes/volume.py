@@ -1,9 +1,14 @@
+from collections.abc import Sequence
+from typing import Callable, Iterator
+
 import utility.utils as utils
 from classes.chapter import Chapter
 from classes.page import Page
 
 
 class Volume:
+    __slots__ = ('name', 'chapters')
+
     def __init__(self, name: str, chapters: list[dict]) -> None:
         """
         Класс, хранящий название тома и список его глав.
@@ -13,6 +18,16 @@ class Volume:
 
         self.__build_chapters(chapters)
 
+    @classmethod
+    def from_packed(cls, name: str, chapters: list[dict]) -> "Volume":
+        """
+        Создаёт том по главам в компактном формате содержания (см. ContentsIndex.load_packed_volume).
+        """
+        volume = cls.__new__(cls)
+        volume.name = name
+        volume.chapters = [Chapter.from_packed(ch['name'], ch['url'], ch['prefix'], ch['files']) for ch in chapters]
+        return volume
+
     def __repr__(self):
         """
         Строковое представление класса.
@@ -61,5 +76,56 @@ class Volume:
                     ch.pages_preparation(permitted_path, ch_start_page_number, is_flatten)
                 )
                 if is_flatten:
-                    ch_start_page_number += len(ch.pages)
+                    ch_start_page_number += len(ch)
         return downloading_pages_lst
+
+
+class VolumeList(Sequence):
+    def __init__(self, names: list[str] | None = None, loader: Callable[[int], Volume] | None = None) -> None:
+        """
+        Класс, хранящий список томов манги. Названия всех томов известны сразу, а сами тома (с главами и страницами)
+        создаются функцией loader только при первом обращении к ним, после чего сохраняются. Это позволяет не строить
+        тома, которые не будут загружаться.
+        """
+        self.names: list[str] = names if names is not None else []
+        self.__loader = loader
+        self.__volumes: list[Volume | None] = [None] * len(self.names)
+
+    def __repr__(self):
+        """
+        Строковое представление класса.
+        """
+        return repr(list(self))
+
+    def __len__(self) -> int:
+        """
+        Возвращает количество томов.
+        """
+        return len(self.names)
+
+    def __getitem__(self, i):
+        """
+        Возвращает том с номером i, при необходимости создавая его.
+        """
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if self.__volumes[i] is None:
+            self.__volumes[i] = self.__loader(i % len(self))
+            # когда созданы все тома, исходные данные, с которыми работает loader, больше не нужны.
+            if None not in self.__volumes:
+                self.__loader = None
+        return self.__volumes[i]
+
+    def __iter__(self) -> Iterator[Volume]:
+        """
+        Последовательно выдаёт тома, создавая их по мере необходимости.
+        """
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, volume: Volume) -> None:
+        """
+        Добавляет в список уже созданный том.
+        """
+        self.names.append(volume.name)
+        self.__volumes.append(volume)
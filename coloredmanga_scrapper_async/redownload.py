@@ -0,0 +1,27 @@
+import argparse
+
+from utility import utils
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Повторная загрузка страниц, записанных в логи синхронной версии (log\\*.log). "
+                    "Записи загруженных страниц удаляются из логов."
+    )
+    parser.add_argument(
+        "logs", nargs="*", default=[utils.SYNC_LOG_DIR],
+        help=f"файлы логов или директории с ними (по умолчанию {utils.SYNC_LOG_DIR})"
+    )
+    parser.add_argument("--fsync", action="store_true", help="сбрасывать каждый загруженный файл на диск")
+    parser.add_argument("--rps", type=float, default=None, help="наибольшее число запросов в секунду")
+    parser.add_argument("--bps", type=float, default=None, help="наибольшая скорость загрузки, байт в секунду")
+    parser.add_argument("--verbose", action="store_true", help="выводить строку о каждой загруженной странице")
+    args = parser.parse_args()
+
+    utils.set_rate_limit(args.rps, args.bps)
+    utils.set_verbose(args.verbose)
+    utils.redownload_failures(args.logs, args.fsync)
+
+
+if __name__ == '__main__':
+    main()
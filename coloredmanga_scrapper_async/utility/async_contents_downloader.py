@@ -1,10 +1,94 @@
 import asyncio
+import sys
 from copy import deepcopy
 
 import aiohttp
 
 import utility.utils as utils
-from classes.c_utils.parser import Parser
+from classes.c_utils.html_cache import CHAPTER_PAGE_TTL, html_cache
+from classes.c_utils.parser import ChapterPageStreamParser, Parser
+from utility.concurrency import MAX_CONNECTIONS, concurrency
+from utility.progress import progress
+from utility.rate_limiter import rate_limiter
+
+
+def check_html_response(resp: aiohttp.ClientResponse) -> None:
+    """
+    Проверяет, что в результате выполнения запроса получен код 200 (ОК) и данные в формате html.
+    """
+    if resp.status != 200:
+        raise ConnectionError("Удалённый ресурс не отвечает или не существует.")
+    if 'text/html' not in (cont_type := resp.headers.get('Content-Type', '')):
+        raise ValueError(f"Результат запроса не HTML: {cont_type}")
+
+
+async def get_html(session: aiohttp.ClientSession, link: str, ttl: float = CHAPTER_PAGE_TTL) -> str:
+    """
+    Асинхронно загружает html-страницу по адресу link.
+    Загруженная страница сохраняется в html_cache на время ttl (в секундах), и до его истечения повторные
+    запросы этой страницы обслуживаются из кэша. Устаревшая запись кэша проверяется условным запросом.
+    Частота запросов и скорость получения данных ограничиваются rate_limiter.
+    Обращения к кэшу выполняются в отдельном потоке, чтобы чтение файла кэша не останавливало цикл событий.
+    """
+    entry = await asyncio.to_thread(html_cache.get, link)
+    if entry is not None and entry.is_fresh:
+        return entry.text
+
+    await rate_limiter.wait_request_async()
+    async with concurrency.slot(link) as slot, \
+            session.get(link, headers=html_cache.get_conditional_headers(entry)) as resp:
+        slot.got_response(resp.status)
+        if entry is not None and resp.status == 304:
+            await asyncio.to_thread(html_cache.touch, link, ttl)
+            return entry.text
+        check_html_response(resp)
+        body = await resp.read()
+        slot.got_bytes(len(body))
+        await rate_limiter.wait_bytes_async(len(body))
+        html = await resp.text()
+    await asyncio.to_thread(html_cache.put, link, html, resp.headers.get("ETag"), resp.headers.get("Last-Modified"),
+                            ttl)
+    return html
+
+
+async def get_chapter_pages(session: aiohttp.ClientSession, link: str) -> list[str]:
+    """
+    Асинхронно загружает html-страницу главы по адресу link и возвращает url-адреса её страниц, т.е. изображений.
+    Число одновременных запросов к html-страницам определяется concurrency, а частота запросов и скорость получения
+    данных ограничиваются rate_limiter.
+    Страница разбирается по частям по мере загрузки, и как только закрывается контейнер со страницами главы,
+    соединение закрывается, а остаток страницы не загружается. В html_cache сохраняется только загруженная часть
+    страницы, которой достаточно для повторного разбора. Обращения к кэшу выполняются в отдельном потоке.
+    """
+    entry = await asyncio.to_thread(html_cache.get, link)
+    if entry is not None and entry.is_fresh:
+        return Parser(entry.text).parse_chapter_page()
+
+    await rate_limiter.wait_request_async()
+    async with concurrency.slot(link) as slot, \
+            session.get(link, headers=html_cache.get_conditional_headers(entry)) as resp:
+        slot.got_response(resp.status)
+        if entry is not None and resp.status == 304:
+            await asyncio.to_thread(html_cache.touch, link, CHAPTER_PAGE_TTL)
+            return Parser(entry.text).parse_chapter_page()
+        check_html_response(resp)
+
+        encoding = resp.charset or "utf-8"
+        parser = ChapterPageStreamParser(encoding)
+        received = bytearray()
+        async for chunk in resp.content.iter_chunked(1024 * 16):
+            received += chunk
+            await rate_limiter.wait_bytes_async(len(chunk))
+            parser.feed(chunk)
+            if parser.is_done:
+                resp.close()
+                break
+        pages = parser.close()
+        slot.got_bytes(len(received))
+
+    await asyncio.to_thread(html_cache.put, link, received.decode(encoding, errors="replace"), resp.headers.get("ETag"),
+                            resp.headers.get("Last-Modified"), CHAPTER_PAGE_TTL)
+    return pages
 
 
 async def get_pages(session: aiohttp.ClientSession, ch_name: str, ch_link: str) -> dict:
@@ -12,16 +96,13 @@ async def get_pages(session: aiohttp.ClientSession, ch_name: str, ch_link: str)
     На основе url-адреса асинхронно скачивает html-страницу главы и при помощи Parser определяет url-адреса страниц,
     т.е. изображений, в главе.
     """
-    async with session.get(ch_link) as resp:
-        ch_html = await resp.text()
-        parser = Parser(ch_html)
-        pages = parser.parse_chapter_page()
-        print(f"Обработано {ch_name}")
-        return {
-            "name": ch_name,
-            "url": ch_link,
-            "pages": pages
-        }
+    pages = await get_chapter_pages(session, ch_link)
+    progress.chapter_done(ch_name)
+    return {
+        "name": ch_name,
+        "url": ch_link,
+        "pages": pages
+    }
 
 
 async def get_vol_chapters(session: aiohttp.ClientSession, vol_name: str, chapters: dict[str, str]) -> dict:
@@ -39,13 +120,15 @@ async def get_manga_vols(vols: dict[str, dict[str, str]]) -> list[dict[str, list
     """
     Открывает соединение для асинхронной загрузки данных; обрабатывает тома манги.
     """
-    connector = aiohttp.TCPConnector(limit=50)  # Число одновременных соединений
+    # Число одновременных запросов подбирается concurrency, соединений должно хватать на наибольшее из них.
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS)
     timeout = aiohttp.ClientTimeout(total=60 * 60 * 12)  # устанавливаем максимальное время работы сессии на 12 часов.
     async with aiohttp.ClientSession(headers=utils.headers, connector=connector, timeout=timeout) as session:
         tasks_vols = []
         for vol_name, vol_chapters in vols.items():
             tasks_vols.append(asyncio.ensure_future(get_vol_chapters(session, vol_name, vol_chapters)))
         all_vols = await asyncio.gather(*tasks_vols)
+        concurrency.report()
         return all_vols
 
 
@@ -55,6 +138,11 @@ def get_full_contents(manga_vols: dict[str, dict[str, str]]) -> list[dict[str, l
     """
     vols = deepcopy(manga_vols)
 
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-    vols = asyncio.run(get_manga_vols(vols))
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    progress.start(chapters_num=sum(len(chapters) for chapters in vols.values()))
+    try:
+        vols = asyncio.run(get_manga_vols(vols))
+    finally:
+        progress.stop()
     return vols
@@ -1,42 +1,372 @@
 import asyncio
+import hashlib
+import os
+import sys
+from typing import Iterable
+from urllib.parse import urlsplit
 
 import aiohttp
 
 import utility.utils as utils
 from classes.page import Page
+from utility.cbz_writer import CbzWriter
+from utility.concurrency import IMAGE_LIMITS, MAX_CONNECTIONS, concurrency
+from utility.dedup import DedupIndex, PageSource
+from utility.file_writer import WRITE_BLOCK_SIZE, FileWriter
+from utility.image_check import QUARANTINE_DIR_NAME, ImageValidator, IntegrityError, check_file, quarantine, read_head
+from utility.journal import DownloadJournal
+from utility.metrics import FAILED_PAGES, PAGES, QUEUE_DEPTH, RETRIES, watch_event_loop
+from utility.progress import progress
+from utility.rate_limiter import rate_limiter
+from utility.retry_policy import DownloadError, FailureManifest, RetryPolicy
 
+# Расширение файла, в который записывается ещё не до конца загруженная страница.
+PART_SUFFIX = ".part"
 
-async def get_page(session: aiohttp.ClientSession, page: Page) -> None:
+# Число обработчиков очереди загрузки - наибольшее возможное число одновременных загрузок. Фактическое число
+# одновременных запросов к серверу подбирается concurrency в зависимости от того, как сервер с ними справляется.
+WORKERS_NUM = IMAGE_LIMITS[2]
+
+# Ошибки соединения, после которых загрузку страницы имеет смысл повторить.
+TRANSIENT_ERRORS = (TimeoutError, ConnectionError, asyncio.TimeoutError, aiohttp.ClientConnectionError,
+                    aiohttp.ClientPayloadError)
+
+
+def get_part_offset(part_path: str) -> int:
+    """
+    Возвращает количество байт, уже загруженных в файл part_path, или 0, если такого файла нет.
+    """
+    try:
+        return os.path.getsize(part_path)
+    except FileNotFoundError:
+        return 0
+
+
+def is_range_accepted(resp: aiohttp.ClientResponse, offset: int) -> bool:
+    """
+    Проверяет, что сервер выполнил запрос Range и вернул данные, начиная с байта offset.
+    """
+    if resp.status != 206:
+        return False
+    return resp.headers.get("Content-Range", "").startswith(f"bytes {offset}-")
+
+
+def hash_file(path: str) -> "hashlib._Hash":
+    """
+    Возвращает объект SHA-256, в который переданы все данные файла path.
+    """
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f_in:
+        while block := f_in.read(WRITE_BLOCK_SIZE):
+            hasher.update(block)
+    return hasher
+
+
+def get_status_error(resp: aiohttp.ClientResponse, url: str) -> DownloadError:
+    """
+    Возвращает ошибку, соответствующую коду ответа сервера на запрос по адресу url.
+    """
+    return DownloadError(
+        f"Сервер вернул код {resp.status} на запрос по адресу {url}.",
+        resp.status,
+        RetryPolicy.parse_retry_after(resp.headers.get("Retry-After"))
+    )
+
+
+async def check_part(page: Page, part_path: str, writer: FileWriter) -> None:
+    """
+    Проверяет полностью загруженный временный файл страницы и при ошибке перемещает его в карантин.
+    """
+    try:
+        await writer.run(check_file, page.url, part_path)
+    except IntegrityError:
+        await writer.run(quarantine, part_path, os.path.join(utils.LOG_DIR, QUARANTINE_DIR_NAME))
+        raise
+
+
+async def get_page(session: aiohttp.ClientSession, page: Page, writer: FileWriter) -> tuple[int, str]:
     """
     На основе url-адреса асинхронно скачивает изображение и сохраняет его.
+    Данные записываются во временный файл с расширением .part, который переименовывается только после полной
+    загрузки. Если временный файл остался от прерванной попытки, то загрузка продолжается с его конца при помощи
+    запроса Range; если сервер не поддерживает Range, то изображение скачивается заново.
+    Все операции с диском выполняются writer вне цикла событий, а данные из сети передаются ему крупными блоками.
+    Число одновременных загрузок изображений определяется concurrency, а частота запросов и скорость получения
+    данных ограничиваются rate_limiter, причём данные изображения получаются равномерно, а не одним всплеском.
+    Возвращает размер сохранённого файла и его контрольную сумму SHA-256, которая вычисляется по мере загрузки.
+    По мере загрузки изображение проверяется (см. ImageValidator); файл, не прошедший проверку, перемещается в
+    карантин, а загрузка завершается ошибкой IntegrityError, после которой она повторяется.
     """
-    async with session.get(page.url) as resp:
-        with open(page.path, 'wb') as fd:
-            async for chunk in resp.content.iter_chunked(1024 * 8):
-                fd.write(chunk)
-        print(f"[+] {page.path}")
+    part_path = f"{page.path}{PART_SUFFIX}"
+    offset = await writer.run(get_part_offset, part_path)
+    headers = {"Range": f"bytes={offset}-"} if offset else None
+
+    await rate_limiter.wait_request_async()
+    async with concurrency.slot(page.url) as slot, session.get(page.url, headers=headers) as resp:
+        slot.got_response(resp.status)
+        if resp.status == 416:
+            # Запрошенный диапазон лежит за концом файла: либо временный файл уже загружен полностью, либо
+            # изображение на сервере изменилось.
+            if resp.headers.get("Content-Range", "").rpartition("/")[2] == str(offset):
+                await check_part(page, part_path, writer)
+                hasher = await writer.run(hash_file, part_path)
+                await writer.run(os.replace, part_path, page.path)
+                return offset, hasher.hexdigest()
+            await writer.run(os.remove, part_path)
+        else:
+            if resp.status not in (200, 206):
+                raise get_status_error(resp, page.url)
+            if not is_range_accepted(resp, offset):
+                offset = 0
+            # при продолжении загрузки контрольная сумма начинается с данных, уже записанных во временный файл.
+            hasher = await writer.run(hash_file, part_path) if offset else hashlib.sha256()
+            validator = ImageValidator(page.url, offset, await writer.run(read_head, part_path) if offset else b"")
+            validator.check_response(resp.headers.get("Content-Type"), resp.content_length,
+                                     resp.headers.get("Content-Encoding"))
 
+            fd = await writer.open(part_path, offset)
+            is_complete = False
+            try:
+                block = bytearray()
+                async for chunk in resp.content.iter_chunked(1024 * 8):
+                    block += chunk
+                    hasher.update(chunk)
+                    validator.update(chunk)
+                    await rate_limiter.wait_bytes_async(len(chunk))
+                    if len(block) >= WRITE_BLOCK_SIZE:
+                        block, data = bytearray(), block
+                        await writer.write(fd, data)
+                if block:
+                    await writer.write(fd, block)
+                is_complete = True
+            finally:
+                slot.got_bytes(validator.size - offset)
+                await writer.close(fd, is_complete)
 
-async def process_pages(pages: list[Page]) -> None:
+            try:
+                validator.check()
+            except IntegrityError:
+                await writer.run(quarantine, part_path, os.path.join(utils.LOG_DIR, QUARANTINE_DIR_NAME))
+                raise
+            await writer.run(os.replace, part_path, page.path)
+            return validator.size, hasher.hexdigest()
+
+    # Временный файл был удалён, загружаем изображение с начала.
+    return await get_page(session, page, writer)
+
+
+async def fetch_page(session: aiohttp.ClientSession, page: Page) -> tuple[bytes, str]:
     """
-    Открывает соединение для асинхронной загрузки данных.
+    На основе url-адреса асинхронно скачивает изображение в память, например, для записи в архив. Изображение
+    проверяется по мере загрузки (см. ImageValidator). Возвращает данные изображения и их контрольную сумму SHA-256.
     """
-    # устанавливаем небольшое число одновременных соединений, чтобы не нагружать сервер.
-    connector = aiohttp.TCPConnector(limit=20)
+    await rate_limiter.wait_request_async()
+    async with concurrency.slot(page.url) as slot, session.get(page.url) as resp:
+        slot.got_response(resp.status)
+        if resp.status != 200:
+            raise get_status_error(resp, page.url)
+        validator = ImageValidator(page.url)
+        validator.check_response(resp.headers.get("Content-Type"), resp.content_length,
+                                 resp.headers.get("Content-Encoding"))
+        hasher = hashlib.sha256()
+        data = bytearray()
+        async for chunk in resp.content.iter_chunked(1024 * 8):
+            data += chunk
+            hasher.update(chunk)
+            validator.update(chunk)
+            await rate_limiter.wait_bytes_async(len(chunk))
+        slot.got_bytes(len(data))
+    validator.check()
+    return bytes(data), hasher.hexdigest()
+
+
+class PagesDownloader:
+    def __init__(self, session: aiohttp.ClientSession, workers_num: int = WORKERS_NUM,
+                 retry_policy: RetryPolicy | None = None, fsync: bool = False,
+                 journal: DownloadJournal | None = None, dedup: DedupIndex | None = None,
+                 archives: CbzWriter | None = None) -> None:
+        """
+        Класс, загружающий страницы фиксированным числом обработчиков workers_num.
+        Страницы передаются через ограниченную очередь, поэтому в памяти одновременно находится лишь небольшая часть
+        страниц, независимо от размера манги, а загрузка начинается сразу после поступления первой страницы.
+        При временных ошибках загрузка повторяется по правилам retry_policy; страницы, которые так и не удалось
+        загрузить, записываются в manifest.
+        Запись на диск выполняется отдельным пулом потоков writer; при fsync=True каждый загруженный файл
+        принудительно сбрасывается на диск перед переименованием.
+        Если задан journal, то в него записываются попытки загрузки и результат загрузки каждой страницы. Журнал
+        записывается в пуле потоков writer, чтобы запись накопленных изменений в файл не останавливала цикл событий.
+        Если задан dedup, то изображения по одинаковым ссылкам загружаются один раз, а файлы с одинаковым
+        содержимым заменяются жёсткими ссылками на один файл.
+        Если задан archives, то страницы записываются не в отдельные файлы, а в архивы CBZ.
+        Ход загрузки выводится в консоль при помощи progress.
+        """
+        self.session = session
+        self.workers_num = workers_num
+        self.retry_policy = retry_policy or RetryPolicy(transient_errors=TRANSIENT_ERRORS)
+        self.manifest = FailureManifest()
+        self.writer = FileWriter(fsync=fsync)
+        self.journal = journal
+        self.dedup = dedup
+        self.archives = archives
+
+        # None в очереди служит сигналом обработчику о завершении работы.
+        self.queue: asyncio.Queue[Page | None] = asyncio.Queue(maxsize=workers_num * 2)
+        self.workers: list[asyncio.Task] = []
+        self.lag_watcher: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """
+        Запускает обработчики очереди.
+        """
+        self.workers = [asyncio.create_task(self.__worker()) for _ in range(self.workers_num)]
+        self.lag_watcher = asyncio.create_task(watch_event_loop())
+        progress.start()
+
+    async def put(self, page: Page) -> None:
+        """
+        Добавляет страницу в очередь на загрузку. Если очередь заполнена, то ожидает появления свободного места.
+        """
+        if self.archives is not None:
+            await self.writer.run(self.archives.add_page, page)
+        await self.queue.put(page)
+        QUEUE_DEPTH.set(self.queue.qsize())
+
+    async def join(self) -> None:
+        """
+        Дожидается загрузки всех страниц, добавленных в очередь, и завершает работу обработчиков.
+        """
+        for _ in self.workers:
+            await self.queue.put(None)
+        await asyncio.gather(*self.workers)
+        QUEUE_DEPTH.set(0)
+        if self.lag_watcher is not None:
+            self.lag_watcher.cancel()
+        if self.archives is not None:
+            await self.writer.run(self.archives.close)
+        self.writer.shutdown()
+        progress.stop()
+
+    async def __worker(self) -> None:
+        """
+        Обработчик, загружающий страницы из очереди до получения сигнала о завершении работы.
+        """
+        while (page := await self.queue.get()) is not None:
+            QUEUE_DEPTH.set(self.queue.qsize())
+            await self.__download(page)
+
+    async def __download(self, page: Page) -> None:
+        """
+        Загружает страницу. Если задан dedup, то страница, изображение которой уже загружено или загружается по
+        той же ссылке, сохраняется из уже загруженного файла.
+        """
+        if self.dedup is None:
+            await self.__fetch(page)
+            return
+
+        source = await self.dedup.acquire_url(page.url)
+        if source is not None:
+            try:
+                await self.writer.run(self.dedup.copy_url, source, page.path)
+            except FileNotFoundError:
+                # исходный файл удалён, загружаем изображение заново.
+                await self.__fetch(page)
+                return
+            if self.journal is not None:
+                await self.writer.run(self.journal.mark_done, page.path, source.size, source.checksum)
+            PAGES.inc()
+            # изображение не загружалось, а было взято из уже сохранённого файла.
+            progress.page_done(page.path, 0)
+            return
+
+        source = None
+        try:
+            result = await self.__fetch(page)
+            if result is not None:
+                source = PageSource(page.path, *result)
+                await self.writer.run(self.dedup.add_file, source)
+        finally:
+            self.dedup.release_url(page.url, source)
+
+    async def __fetch(self, page: Page) -> tuple[int, str] | None:
+        """
+        Загружает страницу, повторяя попытки при временных ошибках. Ожидание между попытками не блокирует загрузку
+        других страниц. Возвращает размер и контрольную сумму файла или None, если загрузить страницу не удалось.
+        """
+        retry_num = self.retry_policy.retry
+        for attempt in range(retry_num):
+            if self.journal is not None:
+                await self.writer.run(self.journal.mark_started, page.path)
+            try:
+                if self.archives is None:
+                    size, checksum = await get_page(self.session, page, self.writer)
+                else:
+                    data, checksum = await fetch_page(self.session, page)
+                    size = len(data)
+                    await self.writer.run(self.archives.write, page, data)
+                if self.journal is not None:
+                    await self.writer.run(self.journal.mark_done, page.path, size, checksum)
+                PAGES.inc()
+                progress.page_done(page.path, size)
+                return size, checksum
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError, DownloadError) as e:
+                error = e
+                if not self.retry_policy.is_transient(e) or attempt + 1 == retry_num:
+                    break
+                delay = self.retry_policy.get_delay(attempt, getattr(e, "retry_after", None))
+                RETRIES.inc(urlsplit(page.url).netloc)
+                progress.page_retry(
+                    f"[WARNING] Ошибка загрузки {page.path}: {e!r}.\n"
+                    f"Повторная попытка {attempt + 2}/{retry_num} через {delay:.1f} c."
+                )
+                await asyncio.sleep(delay)
+
+        print(f"[ERR] Не удалось загрузить {page.path}: {error!r}")
+        self.manifest.add(page.url, page.path, error, attempt + 1)
+        FAILED_PAGES.inc()
+        progress.page_failed(page.path)
+        if self.journal is not None:
+            await self.writer.run(self.journal.mark_failed, page.path, error)
+        if self.archives is not None:
+            await self.writer.run(self.archives.write, page, None)
+        return None
+
+
+def create_session(limit: int = MAX_CONNECTIONS) -> aiohttp.ClientSession:
+    """
+    Создаёт сессию для асинхронной загрузки данных с limit одновременными соединениями.
+    """
+    connector = aiohttp.TCPConnector(limit=limit)  # Число одновременных соединений
 
     timeout = aiohttp.ClientTimeout(total=60 * 60 * 12)  # устанавливаем максимальное время работы сессии на 12 часов.
 
-    session = aiohttp.ClientSession(headers=utils.headers, connector=connector, timeout=timeout)
-    tasks = []
-    for page in pages:
-        tasks.append(asyncio.ensure_future(get_page(session, page)))
-    tasks_done = await asyncio.gather(*tasks)
-    await session.close()
+    return aiohttp.ClientSession(headers=utils.headers, connector=connector, timeout=timeout)
+
+
+async def process_pages(pages: Iterable[Page], fsync: bool = False, journal: DownloadJournal | None = None,
+                        dedup: DedupIndex | None = None, archives: CbzWriter | None = None) -> None:
+    """
+    Открывает соединение для асинхронной загрузки данных и передаёт страницы обработчикам по мере их поступления.
+    """
+    async with create_session() as session:
+        downloader = PagesDownloader(session, fsync=fsync, journal=journal, dedup=dedup, archives=archives)
+        downloader.start()
+        try:
+            for page in pages:
+                await downloader.put(page)
+        finally:
+            await downloader.join()
+            downloader.manifest.save(utils.get_log_file_name("json"))
+            concurrency.report()
 
 
-def download_pages(pages: list) -> None:
+def download_pages(pages: Iterable[Page], fsync: bool = False, journal: DownloadJournal | None = None,
+                   dedup: DedupIndex | None = None, archives: CbzWriter | None = None) -> None:
     """
-    Позволяет асинхронно загрузить и сохранить страницы.
+    Позволяет асинхронно загрузить и сохранить страницы. При fsync=True каждый загруженный файл принудительно
+    сбрасывается на диск. Если задан journal, то ход загрузки записывается в журнал. Если задан dedup, то
+    одинаковые изображения загружаются и хранятся один раз. Если задан archives, то страницы записываются в
+    архивы CBZ.
     """
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-    asyncio.run(process_pages(pages))
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(process_pages(pages, fsync, journal, dedup, archives))
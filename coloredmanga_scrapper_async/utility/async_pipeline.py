@@ -0,0 +1,103 @@
+import asyncio
+import math
+import sys
+
+import aiohttp
+
+import utility.utils as utils
+from classes.c_utils.html_cache import MANGA_PAGE_TTL, html_cache
+from classes.c_utils.parser import Parser
+from classes.chapter import Chapter
+from classes.manga import Manga
+from utility.async_contents_downloader import get_html, get_pages
+from utility.async_pages_downloader import PagesDownloader, create_session
+from utility.concurrency import concurrency
+from utility.progress import progress
+
+
+def crawl_volume(session: aiohttp.ClientSession, chapters: dict[str, str], start_with: int,
+                 end_with: int | float) -> list[asyncio.Future]:
+    """
+    Запускает обработку глав тома, номера которых попадают в диапазон от start_with до end_with. Возвращает задачи
+    в порядке следования глав.
+    """
+    tasks = []
+    # Главы в томах располагаются на сайте в обратном порядке, поэтому переворачиваем.
+    for ch_name, ch_link in reversed(chapters.items()):
+        if start_with <= int(ch_name.split()[1]) < end_with:
+            tasks.append(asyncio.ensure_future(get_pages(session, ch_name, ch_link)))
+    return tasks
+
+
+async def process_manga(url: str, dir_root: str, is_flatten: bool, start_with: int, end_with: int,
+                        is_resume: bool) -> None:
+    """
+    Открывает одну сессию, в которой обрабатывает главную страницу манги и главы выбранных томов, и сразу передаёт
+    страницы каждой обработанной главы на загрузку. Главы следующего тома начинают обрабатываться заранее, пока
+    загружаются страницы текущего.
+    """
+    Manga.validate_downloading_params(start_with, end_with)
+    if end_with == 0:
+        end_with = math.inf
+
+    async with create_session() as session:
+        manga_html = await get_html(session, url, MANGA_PAGE_TTL)
+        name, manga_vols = Parser(manga_html).parse_manga_page()
+
+        manga_path = utils.create_dir(f"{dir_root}{name}\\")
+        has_volumes = list(manga_vols) != ["No Volumes"]
+        selected_vols = []
+        for vol_name, chapters in manga_vols.items():
+            chapters_range = Manga.get_chapters_range(vol_name, has_volumes, start_with, end_with)
+            if chapters_range is not None:
+                selected_vols.append((vol_name, chapters, chapters_range))
+
+        progress.start(len(selected_vols))
+        downloader = PagesDownloader(session)
+        downloader.start()
+        complete_files: dict[str, set[str]] = {}
+        tasks = []
+        next_tasks = []
+        try:
+            next_tasks = crawl_volume(session, selected_vols[0][1], *selected_vols[0][2]) if selected_vols else []
+            for i, (vol_name, _, _) in enumerate(selected_vols):
+                tasks = next_tasks
+                if i + 1 < len(selected_vols):
+                    next_tasks = crawl_volume(session, selected_vols[i + 1][1], *selected_vols[i + 1][2])
+
+                vol_path = utils.create_dir(f"{manga_path}{vol_name}\\")
+                # Номер первой страницы главы: при is_flatten=True он равен сумме количества страниц ранее
+                # обработанных глав тома, иначе всегда 1.
+                ch_start_page_number = 1
+                for task in tasks:
+                    ch = await task
+                    chapter = Chapter(ch['name'], ch['url'], ch['pages'])
+                    pages = chapter.pages_preparation(vol_path, ch_start_page_number, is_flatten)
+                    progress.add_volume(vol_name, vol_path, len(pages))
+                    if is_flatten:
+                        ch_start_page_number += len(chapter)
+                    if is_resume:
+                        pages = utils.skip_complete_pages(pages, complete_files)
+                    for page in pages:
+                        await downloader.put(page)
+        finally:
+            # При ошибке отменяем обработку глав, результаты которой уже не понадобятся.
+            for task in tasks + next_tasks:
+                task.cancel()
+            await downloader.join()
+            downloader.manifest.save(utils.get_log_file_name("json"))
+            concurrency.report()
+            progress.stop()
+
+
+def download_manga_pipelined(url: str, dir_root: str, is_flatten: bool = False, start_with: int = 0,
+                             end_with: int = 0, is_resume: bool = False, use_cache: bool = True) -> None:
+    """
+    Загружает мангу по ссылке на главную страницу url без предварительного построения полной структуры: загрузка
+    страниц главы начинается сразу после её обработки. При use_cache=False html-страницы не берутся из кэша и
+    не сохраняются в него.
+    """
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    with html_cache.bypassed(not use_cache):
+        asyncio.run(process_manga(url, dir_root, is_flatten, start_with, end_with, is_resume))
@@ -0,0 +1,243 @@
+import os
+import threading
+import zipfile
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from classes.page import Page
+from utility.progress import progress
+
+# Расширение архива с изображениями страниц, который открывают программы для чтения комиксов.
+CBZ_SUFFIX = ".cbz"
+
+# Расширение архива, который ещё не записан полностью.
+PART_SUFFIX = ".part"
+
+# Наибольший объём (в байтах) изображений всех архивов, которые хранятся в памяти, пока не загружены
+# предшествующие им страницы. Изображения сверх этого объёма временно записываются на диск.
+CBZ_BUFFER_SIZE = 256 * 1024 * 1024
+
+
+class BufferBudget:
+    def __init__(self, size: int = CBZ_BUFFER_SIZE) -> None:
+        """
+        Класс, ограничивающий общий объём (не более size байт) изображений, ожидающих записи в памяти, для всех
+        архивов, которым он передан. Методы класса можно вызывать из разных потоков.
+        """
+        self.size = size
+        self.used = 0
+        self.__lock = threading.Lock()
+
+    def reserve(self, size: int) -> bool:
+        """
+        Занимает size байт, если они ещё свободны. Возвращает True, если место занято.
+        """
+        with self.__lock:
+            if self.used + size > self.size:
+                return False
+            self.used += size
+            return True
+
+    def release(self, size: int) -> None:
+        """
+        Освобождает size байт, занятых методом reserve.
+        """
+        with self.__lock:
+            self.used -= size
+
+
+class CbzArchive:
+    def __init__(self, dir_path: str, budget: BufferBudget | None = None) -> None:
+        """
+        Класс, записывающий изображения страниц, которые должны были сохраняться в директорию dir_path, в архив
+        dir_path.cbz без сжатия (изображения JPEG и PNG почти не сжимаются). Записи архива идут в порядке
+        добавления страниц, т.е. по их номерам, даже если страницы загружаются в другом порядке: изображения,
+        загруженные раньше предшествующих им, ожидают своей очереди в памяти (в пределах budget, общего для всех
+        архивов) или во временных файлах. Архив записывается в файл .cbz.part и переименовывается после записи
+        последней страницы. Методы класса можно вызывать из разных потоков.
+        """
+        self.dir_path = dir_path
+        self.path = f"{dir_path}{CBZ_SUFFIX}"
+        self.part_path = f"{self.path}{PART_SUFFIX}"
+        self.budget = budget if budget is not None else BufferBudget()
+
+        self.names: list[str] = []
+        self.next_index = 0
+        self.failures = 0
+        self.is_closed = False
+        self.is_finished = False
+
+        # изображения, ожидающие записи: номер записи -> данные, путь к временному файлу или None для страницы,
+        # которую не удалось загрузить.
+        self.__pending: dict[int, bytes | str | None] = {}
+        self.__lock = threading.Lock()
+        self.__zip = zipfile.ZipFile(self.part_path, 'w', compression=zipfile.ZIP_STORED)
+
+    def add_entry(self, name: str) -> int:
+        """
+        Добавляет в архив запись name и возвращает её номер.
+        """
+        with self.__lock:
+            self.names.append(name)
+            return len(self.names) - 1
+
+    def put(self, index: int, data: bytes | None) -> None:
+        """
+        Передаёт изображение записи index (None - страницу не удалось загрузить). Изображение записывается в архив
+        сразу, если все предшествующие ему уже записаны, иначе откладывается.
+        Если при записи изображения index возникает OSError, то запись не считается переданной, и её можно передать
+        повторно (например, как None). Ошибки записи отложенных изображений других страниц выводятся в консоль, а
+        архив остаётся незавершённым.
+        """
+        with self.__lock:
+            if index != self.next_index:
+                self.__defer(index, data)
+                return
+            self.__write(index, data)
+            self.next_index += 1
+            while self.next_index in self.__pending:
+                self.__write_pending(self.next_index)
+                self.next_index += 1
+            self.__finish_if_complete()
+
+    def close(self) -> None:
+        """
+        Отмечает, что записей в архиве больше не будет. Архив завершается, как только будут записаны все записи.
+        """
+        with self.__lock:
+            self.is_closed = True
+            self.__finish_if_complete()
+
+    def __defer(self, index: int, data: bytes | None) -> None:
+        """
+        Откладывает запись изображения до записи предшествующих ему изображений.
+        """
+        if data is None or self.budget.reserve(len(data)):
+            self.__pending[index] = data
+            return
+        tmp_path = f"{self.part_path}.{index}"
+        with open(tmp_path, 'wb') as f_out:
+            f_out.write(data)
+        self.__pending[index] = tmp_path
+
+    def __write(self, index: int, data: bytes | str | None) -> None:
+        """
+        Записывает изображение записи index в архив.
+        """
+        if data is None:
+            self.failures += 1
+            return
+        info = zipfile.ZipInfo(self.names[index], date_time=datetime.now().timetuple()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        if isinstance(data, str):
+            with open(data, 'rb') as f_in, self.__zip.open(info, 'w') as f_out:
+                while block := f_in.read(1024 * 1024):
+                    f_out.write(block)
+            os.remove(data)
+            return
+        self.__zip.writestr(info, data)
+
+    def __write_pending(self, index: int) -> None:
+        """
+        Записывает в архив отложенное изображение записи index и освобождает занятую им память. При ошибке записи
+        страница считается не загруженной.
+        """
+        data = self.__pending.pop(index)
+        try:
+            self.__write(index, data)
+        except OSError as e:
+            print(f"[ERR] Не удалось записать {self.names[index]} в архив {self.part_path}: {e!r}")
+            self.failures += 1
+        finally:
+            if isinstance(data, bytes):
+                self.budget.release(len(data))
+
+    def __finish_if_complete(self) -> None:
+        """
+        Завершает архив, если в него записаны все записи.
+        """
+        if not self.is_closed or self.is_finished or self.next_index < len(self.names):
+            return
+        self.is_finished = True
+        try:
+            self.__zip.close()
+            if not self.failures:
+                os.replace(self.part_path, self.path)
+        except OSError as e:
+            print(f"[ERR] Не удалось завершить архив {self.part_path}: {e!r}")
+            return
+        if self.failures:
+            print(f"[ERR] Архив {self.part_path} не завершён: не удалось загрузить страниц {self.failures}.")
+            return
+        progress.log(f"[+] {self.path}")
+        # директория, в которую сохранялись бы страницы, не нужна, если она пуста.
+        try:
+            os.rmdir(self.dir_path)
+        except OSError:
+            pass
+
+
+class CbzWriter:
+    def __init__(self, buffer_size: int = CBZ_BUFFER_SIZE) -> None:
+        """
+        Класс, записывающий страницы в архивы CBZ вместо отдельных файлов: страницы каждой директории (главы или,
+        при упрощённой иерархии, тома) попадают в отдельный архив (см. CbzArchive). Страницы должны добавляться в
+        порядке их номеров, а страницы одной директории - подряд. Изображения, ожидающие записи, занимают в памяти
+        не более buffer_size байт на все архивы вместе.
+        """
+        self.budget = BufferBudget(buffer_size)
+        self.current: CbzArchive | None = None
+        self.entries: dict[str, tuple[CbzArchive, int]] = {}
+        self.__lock = threading.Lock()
+
+    def add_page(self, page: Page) -> None:
+        """
+        Добавляет страницу в архив её директории. Архив предыдущей директории закрывается для добавления.
+        """
+        dir_path, _, name = page.path.rpartition("\\")
+        with self.__lock:
+            if self.current is None or self.current.dir_path != dir_path:
+                self.__close_current()
+                self.current = CbzArchive(dir_path, self.budget)
+            self.entries[page.path] = self.current, self.current.add_entry(name)
+
+    def write(self, page: Page, data: bytes | None) -> None:
+        """
+        Записывает изображение страницы в архив. data=None означает, что страницу загрузить не удалось.
+        Страница удаляется из entries только после записи, поэтому после ошибки записи её можно передать повторно.
+        """
+        with self.__lock:
+            archive, index = self.entries[page.path]
+        archive.put(index, data)
+        with self.__lock:
+            del self.entries[page.path]
+
+    def close(self) -> None:
+        """
+        Закрывает последний архив.
+        """
+        with self.__lock:
+            self.__close_current()
+
+    def __close_current(self) -> None:
+        """
+        Закрывает текущий архив для добавления страниц.
+        """
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+
+
+def skip_complete_archives(pages: Iterable[Page]) -> Iterator[Page]:
+    """
+    Отбрасывает страницы, архивы которых уже сохранены на диске. Существование каждого архива проверяется один раз.
+    """
+    complete_archives: dict[str, bool] = {}
+    for page in pages:
+        dir_path = page.path.rpartition("\\")[0]
+        if dir_path not in complete_archives:
+            complete_archives[dir_path] = os.path.isfile(f"{dir_path}{CBZ_SUFFIX}")
+        if not complete_archives[dir_path]:
+            yield page
+        else:
+            progress.page_skipped(page.path)
@@ -0,0 +1,263 @@
+import asyncio
+import time
+from collections import deque
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from utility.metrics import DOWNLOADED_BYTES, REQUEST_DURATION, REQUEST_TTFB, REQUESTS
+
+# Часть пути, по которой адреса изображений отличаются от адресов html-страниц. Изображения раздаются иначе, чем
+# страницы сайта, поэтому число одновременных запросов для них подбирается отдельно.
+UPLOADS_PATH = "/wp-content/uploads/"
+
+# Начальное, минимальное и максимальное число одновременных запросов к html-страницам и к изображениям.
+HTML_LIMITS = (4, 1, 32)
+IMAGE_LIMITS = (8, 1, 64)
+
+# Наибольшее число одновременных соединений, которое может понадобиться сессии.
+MAX_CONNECTIONS = HTML_LIMITS[2] + IMAGE_LIMITS[2]
+
+# Коды ответа, которыми сервер сообщает о перегрузке или об ограничении частоты запросов.
+CONGESTION_STATUSES = {429, 503}
+
+# Ошибки, означающие, что сервер не успевает отвечать.
+TIMEOUT_ERRORS = (TimeoutError, asyncio.TimeoutError, aiohttp.ServerTimeoutError)
+
+# Во сколько раз уменьшается число одновременных запросов при перегрузке сервера.
+DECREASE_FACTOR = 0.5
+
+# Сглаживание времени до первого байта: вес нового измерения в скользящем среднем.
+TTFB_SMOOTHING = 0.2
+
+# Время до первого байта считается выросшим, если его скользящее среднее превышает наименьшее измеренное значение
+# в TTFB_GROWTH раз и не менее чем на TTFB_MIN_RISE секунд.
+TTFB_GROWTH = 3.0
+TTFB_MIN_RISE = 0.25
+
+
+class LimitChange(NamedTuple):
+    """
+    Запись истории изменения числа одновременных запросов: время изменения, новое значение и причина.
+    """
+    time: float
+    limit: int
+    reason: str
+
+
+class RequestSlot:
+    def __init__(self, limit: "AdaptiveLimit") -> None:
+        """
+        Разрешение на выполнение одного запроса в рамках ограничения limit. Используется как асинхронный контекстный
+        менеджер: при входе ожидает свободного места, при выходе сообщает limit результат запроса.
+        Время запроса, время до первого байта и число полученных байт записываются в метрики с метками limit.
+        """
+        self.limit = limit
+        self.ticket = 0
+        self.started_at = 0.0
+        self.status: int | None = None
+        self.ttfb: float | None = None
+
+    async def __aenter__(self) -> "RequestSlot":
+        self.ticket = await self.limit.acquire()
+        self.started_at = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        REQUEST_DURATION.observe(time.perf_counter() - self.started_at, *self.limit.labels)
+        REQUESTS.inc(*self.limit.labels, str(self.status or "error"))
+        try:
+            if self.status in CONGESTION_STATUSES:
+                self.limit.on_congestion(self.ticket, f"код ответа {self.status}")
+            elif exc_type is not None and issubclass(exc_type, TIMEOUT_ERRORS):
+                self.limit.on_congestion(self.ticket, "превышено время ожидания")
+            elif exc_type is None and self.ttfb is not None:
+                self.limit.on_success(self.ticket, self.ttfb)
+        finally:
+            self.limit.release()
+
+    def got_response(self, status: int) -> None:
+        """
+        Отмечает получение заголовков ответа с кодом status и запоминает время до первого байта.
+        """
+        self.status = status
+        self.ttfb = time.perf_counter() - self.started_at
+        REQUEST_TTFB.observe(self.ttfb, *self.limit.labels)
+
+    def got_bytes(self, size: int) -> None:
+        """
+        Учитывает получение size байт данных ответа.
+        """
+        DOWNLOADED_BYTES.inc(*self.limit.labels, amount=size)
+
+
+class AdaptiveLimit:
+    def __init__(self, name: str, initial: int, min_limit: int, max_limit: int,
+                 labels: tuple[str, ...] = ()) -> None:
+        """
+        Класс, ограничивающий число одновременных запросов и подбирающий это число по правилу AIMD.
+        Пока сервер отвечает без ошибок и без роста времени до первого байта, ограничение увеличивается: сначала
+        на 1 после каждого успешного запроса (т.е. удваивается за каждый набор из limit запросов), а после первой
+        перегрузки - на 1 за каждые limit успешных запросов. При ответах 429 и 503, истечении времени ожидания или
+        росте времени до первого байта ограничение уменьшается в 1 / DECREASE_FACTOR раз, но не чаще одного раза на
+        запросы, начатые до предыдущего уменьшения. Ограничение увеличивается, только если оно было исчерпано.
+        Все изменения выводятся в лог и сохраняются в history. labels - значения меток метрик запросов (хост и вид).
+        """
+        self.name = name
+        self.labels = labels
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.in_flight = 0
+        self.history: list[LimitChange] = [LimitChange(time.time(), initial, "начальное значение")]
+
+        self.__waiters: deque[asyncio.Future] = deque()
+        self.__is_slow_start = True
+        self.__successes = 0
+        # номер последнего начатого запроса и номер последнего запроса, начатого до уменьшения ограничения.
+        self.__started = 0
+        self.__decreased_at = 0
+        self.__min_ttfb: float | None = None
+        self.__avg_ttfb: float | None = None
+
+    def slot(self) -> RequestSlot:
+        """
+        Возвращает разрешение на выполнение одного запроса.
+        """
+        return RequestSlot(self)
+
+    async def acquire(self) -> int:
+        """
+        Ожидает, пока число выполняемых запросов станет меньше ограничения, и занимает место. Возвращает порядковый
+        номер запроса.
+        """
+        while self.in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self.__waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # если место уже было передано этому запросу, то передаём его следующему.
+                if waiter.done() and not waiter.cancelled():
+                    self.__wake()
+                raise
+            finally:
+                if waiter in self.__waiters:
+                    self.__waiters.remove(waiter)
+        self.in_flight += 1
+        self.__started += 1
+        return self.__started
+
+    def release(self) -> None:
+        """
+        Освобождает место, занятое завершившимся запросом.
+        """
+        self.in_flight -= 1
+        self.__wake()
+
+    def __wake(self) -> None:
+        """
+        Пробуждает ожидающие запросы по числу свободных мест.
+        """
+        free = self.limit - self.in_flight
+        while free > 0 and self.__waiters:
+            waiter = self.__waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def __is_ttfb_rising(self, ttfb: float) -> bool:
+        """
+        Учитывает время до первого байта ttfb очередного запроса и проверяет, выросло ли оно.
+        """
+        if self.__min_ttfb is None:
+            self.__min_ttfb = self.__avg_ttfb = ttfb
+            return False
+        self.__min_ttfb = min(self.__min_ttfb, ttfb)
+        self.__avg_ttfb += TTFB_SMOOTHING * (ttfb - self.__avg_ttfb)
+        rise = self.__avg_ttfb - self.__min_ttfb
+        return rise > TTFB_MIN_RISE and rise > self.__min_ttfb * (TTFB_GROWTH - 1)
+
+    def on_success(self, ticket: int, ttfb: float) -> None:
+        """
+        Учитывает успешное завершение запроса с номером ticket.
+        """
+        if self.__is_ttfb_rising(ttfb):
+            self.on_congestion(ticket, f"время до первого байта выросло до {self.__avg_ttfb:.2f} c")
+            return
+        if self.in_flight < self.limit:
+            return
+        if self.__is_slow_start:
+            self.__set_limit(self.limit + 1, "ошибок нет")
+            return
+        self.__successes += 1
+        if self.__successes >= self.limit:
+            self.__successes = 0
+            self.__set_limit(self.limit + 1, "ошибок нет")
+
+    def on_congestion(self, ticket: int, reason: str) -> None:
+        """
+        Учитывает признак перегрузки сервера, полученный при выполнении запроса с номером ticket.
+        """
+        if ticket <= self.__decreased_at:
+            return
+        self.__decreased_at = self.__started
+        self.__is_slow_start = False
+        self.__successes = 0
+        self.__set_limit(int(self.limit * DECREASE_FACTOR), reason)
+
+    def __set_limit(self, limit: int, reason: str) -> None:
+        """
+        Устанавливает новое ограничение в пределах от min_limit до max_limit.
+        """
+        limit = max(self.min_limit, min(self.max_limit, limit))
+        if limit == self.limit:
+            return
+        print(f"[INFO] {self.name}: одновременных запросов {self.limit} -> {limit} ({reason}).")
+        self.limit = limit
+        self.history.append(LimitChange(time.time(), limit, reason))
+        self.__wake()
+
+
+class ConcurrencyController:
+    def __init__(self) -> None:
+        """
+        Класс, хранящий отдельные ограничения числа одновременных запросов для каждого хоста, причём для
+        html-страниц и для изображений (путь UPLOADS_PATH) ограничения также отдельные. Подобранные значения
+        сохраняются между запусками загрузки в пределах одного процесса.
+        """
+        self.limits: dict[tuple[str, str], AdaptiveLimit] = {}
+
+    def get_limit(self, url: str) -> AdaptiveLimit:
+        """
+        Возвращает ограничение, которому подчиняется запрос по адресу url.
+        """
+        parts = urlsplit(url)
+        kind = "images" if parts.path.startswith(UPLOADS_PATH) else "html"
+        key = (parts.netloc, kind)
+        if key not in self.limits:
+            initial, min_limit, max_limit = IMAGE_LIMITS if kind == "images" else HTML_LIMITS
+            self.limits[key] = AdaptiveLimit(f"{parts.netloc} ({kind})", initial, min_limit, max_limit, key)
+        return self.limits[key]
+
+    def slot(self, url: str) -> RequestSlot:
+        """
+        Возвращает разрешение на выполнение запроса по адресу url.
+        """
+        return self.get_limit(url).slot()
+
+    def report(self) -> None:
+        """
+        Выводит текущие ограничения и пределы, в которых они менялись.
+        """
+        for limit in self.limits.values():
+            values = [change.limit for change in limit.history]
+            print(
+                f"[INFO] {limit.name}: одновременных запросов {limit.limit} "
+                f"(от {min(values)} до {max(values)}, изменений: {len(values) - 1})."
+            )
+
+
+# Ограничения числа одновременных запросов, общие для всех загрузчиков.
+concurrency = ConcurrencyController()
@@ -0,0 +1,239 @@
+import gzip
+import json
+import os
+import re
+from typing import Callable
+
+# Расширение файла содержания манги в компактном формате.
+COMPACT_EXTENSION = ".json.gz"
+
+# Версия компактного формата, записываемая в файл.
+COMPACT_FORMAT = "compact/1"
+
+# Пробельные символы между элементами JSON.
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def is_compact_file(filename: str) -> bool:
+    """
+    Проверяет по расширению, хранится ли содержание манги в файле filename в компактном формате.
+    """
+    return filename.endswith(COMPACT_EXTENSION)
+
+
+def get_common_prefix(urls: list[str]) -> str:
+    """
+    Возвращает общее начало url-адресов urls, оканчивающееся символом '/'.
+    """
+    if not urls:
+        return ""
+    prefix = os.path.commonprefix(urls)
+    return prefix[:prefix.rfind("/") + 1]
+
+
+def pack_contents(manga_json: dict) -> dict:
+    """
+    Преобразует содержание манги из обычного формата JSON в компактный. Адреса страниц главы хранятся в виде общего
+    начала и списка имён файлов, а общая для всех глав часть адресов страниц и адрес манги в адресах глав хранятся
+    один раз. Адреса глав, которые не начинаются с адреса манги, сохраняются полностью.
+    """
+    manga_url = manga_json['url']
+    chapters_prefixes = [
+        get_common_prefix(ch['pages'])
+        for vol in manga_json['volumes'] for ch in vol['chapters'] if ch['pages']
+    ]
+    pages_prefix = get_common_prefix(chapters_prefixes)
+
+    volumes = []
+    for vol in manga_json['volumes']:
+        chapters = []
+        for ch in vol['chapters']:
+            prefix = get_common_prefix(ch['pages'])
+            chapters.append({
+                "name": ch['name'],
+                "url": ch['url'][len(manga_url):] if ch['url'].startswith(manga_url) else ch['url'],
+                "prefix": prefix[len(pages_prefix):],
+                "files": [page[len(prefix):] for page in ch['pages']]
+            })
+        volumes.append({"name": vol['name'], "chapters": chapters})
+
+    packed = {key: value for key, value in manga_json.items() if key != 'volumes'}
+    packed.update(format=COMPACT_FORMAT, pages_prefix=pages_prefix, volumes=volumes)
+    return packed
+
+
+def get_chapter_url(url: str, manga_url: str) -> str:
+    """
+    Возвращает полный адрес главы по адресу url, записанному в компактном формате.
+    """
+    return url if "://" in url else manga_url + url
+
+
+def unpack_chapter(chapter: dict, manga_url: str, pages_prefix: str) -> dict:
+    """
+    Преобразует главу из компактного формата в обычный.
+    """
+    prefix = pages_prefix + chapter['prefix']
+    return {
+        "name": chapter['name'],
+        "url": get_chapter_url(chapter['url'], manga_url),
+        "pages": [prefix + file for file in chapter['files']]
+    }
+
+
+def unpack_contents(packed: dict) -> dict:
+    """
+    Преобразует содержание манги из компактного формата в обычный формат JSON.
+    """
+    if packed.get('format') != COMPACT_FORMAT:
+        raise ValueError(f"Неподдерживаемый формат содержания: {packed.get('format')}")
+
+    manga_url = packed['url']
+    pages_prefix = packed['pages_prefix']
+    manga_json = {key: value for key, value in packed.items() if key not in ('format', 'pages_prefix', 'volumes')}
+    manga_json['volumes'] = [
+        {
+            "name": vol['name'],
+            "chapters": [unpack_chapter(ch, manga_url, pages_prefix) for ch in vol['chapters']]
+        }
+        for vol in packed['volumes']
+    ]
+    return manga_json
+
+
+def load_compact(filename: str) -> dict:
+    """
+    Загружает содержание манги из файла в компактном формате и возвращает его в обычном формате JSON.
+    """
+    with gzip.open(filename, 'rt', encoding='utf-8') as f_in:
+        return unpack_contents(json.load(f_in))
+
+
+def save_compact(manga_json: dict, filename: str) -> None:
+    """
+    Сохраняет содержание манги, представленное в обычном формате JSON, в файл в компактном формате.
+    """
+    with gzip.open(filename, 'wt', encoding='utf-8', compresslevel=9) as f_out:
+        json.dump(pack_contents(manga_json), f_out, ensure_ascii=False, separators=(',', ':'))
+
+
+class ContentsIndex:
+    def __init__(self, header: dict, names: list[str], volume_loader: Callable[[int], dict],
+                 packed_loader: Callable[[int], dict] | None = None) -> None:
+        """
+        Класс, хранящий сведения о манге (название, адрес и т.п.) из файла содержания и названия её томов, но не сами
+        тома. Том с номером i (нумерация с 0) разбирается из файла только при вызове load_volume(i).
+        Для файла в компактном формате задаётся packed_loader, возвращающий том без восстановления адресов страниц.
+        """
+        self.header = header
+        self.names = names
+        self.__volume_loader = volume_loader
+        self.__packed_loader = packed_loader
+
+    def load_volume(self, i: int) -> dict:
+        """
+        Возвращает том с номером i в обычном формате JSON.
+        """
+        return self.__volume_loader(i)
+
+    def load_packed_volume(self, i: int) -> dict | None:
+        """
+        Возвращает том с номером i в компактном формате, в котором у каждой главы полный адрес url, полное общее
+        начало адресов страниц prefix и список имён файлов страниц files. Возвращает None, если файл содержания
+        записан в обычном формате.
+        """
+        if self.__packed_loader is None:
+            return None
+        return self.__packed_loader(i)
+
+
+def skip_whitespace(text: str, pos: int) -> int:
+    """
+    Возвращает позицию первого непробельного символа в text, начиная с pos.
+    """
+    return WHITESPACE.match(text, pos).end()
+
+
+def index_json(text: str) -> ContentsIndex:
+    """
+    Строит индекс содержания манги, записанного в обычном формате JSON: запоминает позиции начала томов в тексте.
+    Тома разбираются по одному, поэтому в памяти одновременно находится не более одного разобранного тома.
+    """
+    decoder = json.JSONDecoder()
+    header = {}
+    names = []
+    offsets = []
+
+    pos = skip_whitespace(text, 0)
+    if text[pos] != "{":
+        raise ValueError("Файл содержания манги должен содержать объект JSON.")
+    pos = skip_whitespace(text, pos + 1)
+    while text[pos] != "}":
+        key, pos = decoder.raw_decode(text, pos)
+        pos = skip_whitespace(text, skip_whitespace(text, pos) + 1)  # пропускаем ':'
+        if key == 'volumes':
+            pos = skip_whitespace(text, pos + 1)  # пропускаем '['
+            while text[pos] != "]":
+                offsets.append(pos)
+                vol, pos = decoder.raw_decode(text, pos)
+                names.append(vol['name'])
+                pos = skip_whitespace(text, pos)
+                if text[pos] == ",":
+                    pos = skip_whitespace(text, pos + 1)
+            pos += 1
+        else:
+            header[key], pos = decoder.raw_decode(text, pos)
+        pos = skip_whitespace(text, pos)
+        if text[pos] == ",":
+            pos = skip_whitespace(text, pos + 1)
+
+    return ContentsIndex(header, names, lambda i: decoder.raw_decode(text, offsets[i])[0])
+
+
+def index_compact(filename: str) -> ContentsIndex:
+    """
+    Строит индекс содержания манги, записанного в компактном формате. Тома хранятся в компактном виде и
+    преобразуются в обычный формат только при обращении к ним; load_packed_volume возвращает том без такого
+    преобразования.
+    """
+    with gzip.open(filename, 'rt', encoding='utf-8') as f_in:
+        packed = json.load(f_in)
+    if packed.get('format') != COMPACT_FORMAT:
+        raise ValueError(f"Неподдерживаемый формат содержания: {packed.get('format')}")
+
+    manga_url = packed['url']
+    pages_prefix = packed['pages_prefix']
+    volumes = packed['volumes']
+    header = {key: value for key, value in packed.items() if key not in ('format', 'pages_prefix', 'volumes')}
+
+    def load_volume(i: int) -> dict:
+        return {
+            "name": volumes[i]['name'],
+            "chapters": [unpack_chapter(ch, manga_url, pages_prefix) for ch in volumes[i]['chapters']]
+        }
+
+    def load_packed_volume(i: int) -> dict:
+        return {
+            "name": volumes[i]['name'],
+            "chapters": [
+                {
+                    "name": ch['name'],
+                    "url": get_chapter_url(ch['url'], manga_url),
+                    "prefix": pages_prefix + ch['prefix'],
+                    "files": ch['files']
+                }
+                for ch in volumes[i]['chapters']
+            ]
+        }
+
+    return ContentsIndex(header, [vol['name'] for vol in volumes], load_volume, load_packed_volume)
+
+
+def index_contents(filename: str) -> ContentsIndex:
+    """
+    Строит индекс содержания манги из файла filename в обычном или компактном формате.
+    """
+    if is_compact_file(filename):
+        return index_compact(filename)
+    with open(filename, 'r', encoding='utf-8') as f_in:
+        return index_json(f_in.read())
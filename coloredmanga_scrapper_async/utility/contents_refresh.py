@@ -0,0 +1,66 @@
+from classes.c_utils.downloader import Downloader
+from classes.c_utils.parser import Parser
+from utility.async_contents_downloader import get_full_contents
+
+
+def merge_contents(manga_json: dict, manga_vols: dict[str, dict[str, str]],
+                   crawled_vols: list[dict[str, list[dict]]]) -> list[dict]:
+    """
+    Строит список томов по данным главной страницы manga_vols. Страницы глав берутся из ранее сохранённого
+    содержания manga_json, а для новых глав - из результатов их обработки crawled_vols.
+    """
+    known_chapters = {ch['url']: ch for vol in manga_json['volumes'] for ch in vol['chapters']}
+    crawled_chapters = {ch['url']: ch for vol in crawled_vols for chapters in vol.values() for ch in chapters}
+
+    volumes = []
+    for vol_name, chapters in manga_vols.items():
+        vol_chapters = []
+        # Главы в томах располагаются на сайте в обратном порядке, поэтому переворачиваем.
+        for ch_name, ch_link in reversed(chapters.items()):
+            ch = crawled_chapters.get(ch_link) or known_chapters[ch_link]
+            vol_chapters.append({
+                "name": ch_name,
+                "url": ch_link,
+                "pages": ch['pages']
+            })
+        volumes.append({
+            "name": vol_name,
+            "chapters": vol_chapters
+        })
+    return volumes
+
+
+def refresh_contents(manga_json: dict) -> bool:
+    """
+    Обновляет содержание манги manga_json, считанное из файла. Загружается только главная страница манги (при помощи
+    условного запроса, поэтому неизменившаяся страница не передаётся повторно), и обрабатываются только те главы,
+    которых нет в содержании или адрес которых изменился. Возвращает True, если содержание изменилось.
+    """
+    html, validators = Downloader(manga_json['url']).download_html_conditional(manga_json.get('validators', {}))
+    if html is None:
+        print("[INFO] Главная страница манги не изменилась.")
+        return False
+
+    name, manga_vols = Parser(html).parse_manga_page()
+
+    known_links = {ch['url'] for vol in manga_json['volumes'] for ch in vol['chapters']}
+    new_vols = {}
+    for vol_name, chapters in manga_vols.items():
+        new_chapters = {ch_name: ch_link for ch_name, ch_link in chapters.items() if ch_link not in known_links}
+        if new_chapters:
+            new_vols[vol_name] = new_chapters
+
+    new_chapters_num = sum(len(chapters) for chapters in new_vols.values())
+    site_links = {ch_link for chapters in manga_vols.values() for ch_link in chapters.values()}
+    print(f"[INFO] Новых или изменившихся глав: {new_chapters_num}, удалённых глав: {len(known_links - site_links)}")
+
+    crawled_vols = get_full_contents(new_vols) if new_vols else []
+    volumes = merge_contents(manga_json, manga_vols, crawled_vols)
+
+    # новые значения ETag и Last-Modified тоже сохраняются, иначе следующее обновление не сможет получить ответ 304.
+    is_changed = (new_chapters_num > 0 or name != manga_json['name'] or volumes != manga_json['volumes']
+                  or validators != manga_json.get('validators', {}))
+    manga_json['name'] = name
+    manga_json['volumes'] = volumes
+    manga_json['validators'] = validators
+    return is_changed
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import shutil
+import threading
+
+# Расширение временного файла, через который создаётся ссылка на уже сохранённое изображение.
+LINK_SUFFIX = ".link"
+
+
+class PageSource:
+    __slots__ = ('path', 'size', 'checksum')
+
+    def __init__(self, path: str, size: int, checksum: str) -> None:
+        """
+        Класс, описывающий уже сохранённое изображение: путь к файлу, размер и контрольная сумма SHA-256.
+        """
+        self.path = path
+        self.size = size
+        self.checksum = checksum
+
+
+class DedupIndex:
+    def __init__(self) -> None:
+        """
+        Класс, исключающий повторную загрузку и хранение одинаковых изображений.
+        Изображения, которые загружаются по одной и той же ссылке, загружаются один раз, а остальные копии
+        создаются из сохранённого файла. Для изображений с одинаковым содержимым (по контрольной сумме, которая
+        вычисляется во время загрузки) вместо отдельных файлов создаются жёсткие ссылки на один файл.
+        Файловые системы без поддержки жёстких ссылок (например, FAT32) обрабатываются без экономии места.
+        """
+        self.by_checksum: dict[str, str] = {}
+        self.by_url: dict[str, asyncio.Future] = {}
+        self.__lock = threading.Lock()
+
+        self.linked_files = 0
+        self.saved_disk = 0
+        self.repeated_urls = 0
+        self.saved_egress = 0
+
+    def add_checksums(self, checksums: dict[str, str]) -> None:
+        """
+        Добавляет в индекс изображения, сохранённые ранее: контрольная сумма -> путь к файлу.
+        """
+        with self.__lock:
+            self.by_checksum.update(checksums)
+
+    async def acquire_url(self, url: str) -> PageSource | None:
+        """
+        Если изображение по ссылке url уже загружено или загружается, то дожидается окончания загрузки и возвращает
+        сохранённый файл. Иначе отмечает, что изображение загружается, и возвращает None; после загрузки нужно
+        вызвать release_url.
+        """
+        while (future := self.by_url.get(url)) is not None:
+            source = await future
+            if source is not None:
+                return source
+        self.by_url[url] = asyncio.get_running_loop().create_future()
+        return None
+
+    def release_url(self, url: str, source: PageSource | None) -> None:
+        """
+        Сообщает ожидающим загрузкам результат загрузки изображения по ссылке url. Если изображение загрузить не
+        удалось (source=None), то его загрузку сможет повторить следующая страница с той же ссылкой.
+        """
+        future = self.by_url[url]
+        if source is None:
+            del self.by_url[url]
+        future.set_result(source)
+
+    @staticmethod
+    def __link(src: str, dst: str, is_copy_allowed: bool) -> bool:
+        """
+        Заменяет файл dst жёсткой ссылкой на src. Если жёсткую ссылку создать нельзя, то при is_copy_allowed=True
+        файл копируется. Возвращает True, если была создана жёсткая ссылка.
+        """
+        tmp_path = f"{dst}{LINK_SUFFIX}"
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        try:
+            os.link(src, tmp_path)
+            is_linked = True
+        except OSError:
+            if not is_copy_allowed:
+                return False
+            shutil.copyfile(src, tmp_path)
+            is_linked = False
+        os.replace(tmp_path, dst)
+        return is_linked
+
+    def copy_url(self, source: PageSource, path: str) -> None:
+        """
+        Сохраняет изображение, повторно встретившееся по той же ссылке, в файл path из уже сохранённого файла.
+        """
+        is_linked = self.__link(source.path, path, is_copy_allowed=True)
+        with self.__lock:
+            self.repeated_urls += 1
+            self.saved_egress += source.size
+            if is_linked:
+                self.linked_files += 1
+                self.saved_disk += source.size
+
+    def add_file(self, source: PageSource) -> None:
+        """
+        Добавляет загруженное изображение в индекс. Если изображение с таким же содержимым уже сохранено, то файл
+        заменяется жёсткой ссылкой на него.
+        """
+        with self.__lock:
+            original = self.by_checksum.setdefault(source.checksum, source.path)
+        if original == source.path:
+            return
+        try:
+            if os.path.samefile(original, source.path):
+                return
+            is_linked = self.__link(original, source.path, is_copy_allowed=False)
+        except FileNotFoundError:
+            # исходный файл удалён, теперь изображение хранится в новом файле.
+            with self.__lock:
+                self.by_checksum[source.checksum] = source.path
+            return
+        if is_linked:
+            with self.__lock:
+                self.linked_files += 1
+                self.saved_disk += source.size
+
+    def report(self) -> None:
+        """
+        Выводит в консоль сведения о сэкономленном месте на диске и объёме загрузки.
+        """
+        print(
+            f"[INFO] Повторных ссылок на изображения: {self.repeated_urls}, не загружено "
+            f"{self.saved_egress / 1024 ** 2:.1f} МБ. Одинаковых файлов заменено ссылками: {self.linked_files}, "
+            f"сэкономлено на диске {self.saved_disk / 1024 ** 2:.1f} МБ."
+        )
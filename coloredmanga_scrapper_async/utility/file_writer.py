@@ -0,0 +1,79 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable
+
+# Число потоков, выполняющих запись на диск.
+WRITER_THREADS_NUM = 4
+
+# Размер блока, которыми данные записываются на диск. Мелкие фрагменты, получаемые из сети, накапливаются до этого
+# размера, чтобы обращаться к диску как можно реже.
+WRITE_BLOCK_SIZE = 1024 * 1024
+
+
+class FileWriter:
+    def __init__(self, threads_num: int = WRITER_THREADS_NUM, fsync: bool = False) -> None:
+        """
+        Класс, выполняющий все операции с файлами в отдельном пуле потоков, чтобы медленный диск не останавливал
+        цикл событий, а вместе с ним и загрузку остальных страниц.
+        Если fsync=True, то перед закрытием полностью записанного файла данные принудительно сбрасываются на диск.
+        Каждая загрузка дожидается окончания записи своего блока перед отправкой следующего, поэтому число блоков,
+        ожидающих записи, не превышает числа загрузчиков.
+        """
+        self.fsync = fsync
+        self.executor = ThreadPoolExecutor(max_workers=threads_num, thread_name_prefix="file_writer")
+
+    async def run(self, func: Callable, *args):
+        """
+        Выполняет блокирующую функцию func в пуле потоков записи.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    @staticmethod
+    def __open(path: str, offset: int) -> BinaryIO:
+        """
+        Открывает файл для записи с позиции offset, отсекая всё, что записано после неё.
+        Место под файл заранее не выделяется: размер временного файла служит позицией, с которой продолжается
+        прерванная загрузка, поэтому он должен совпадать с числом действительно записанных байт даже после
+        аварийного завершения программы, когда файл не был закрыт.
+        """
+        f_obj = open(path, 'r+b' if offset else 'wb')
+        f_obj.seek(offset)
+        f_obj.truncate()
+        return f_obj
+
+    def __close(self, f_obj: BinaryIO, is_complete: bool) -> None:
+        """
+        Закрывает файл.
+        """
+        try:
+            if is_complete and self.fsync:
+                f_obj.flush()
+                os.fsync(f_obj.fileno())
+        finally:
+            f_obj.close()
+
+    async def open(self, path: str, offset: int = 0) -> BinaryIO:
+        """
+        Открывает файл path для записи, начиная с позиции offset.
+        """
+        return await self.run(self.__open, path, offset)
+
+    async def write(self, f_obj: BinaryIO, data: bytes | bytearray) -> None:
+        """
+        Записывает блок данных в файл.
+        """
+        await self.run(f_obj.write, data)
+
+    async def close(self, f_obj: BinaryIO, is_complete: bool = True) -> None:
+        """
+        Закрывает файл. Параметр is_complete указывает, были ли записаны все данные.
+        """
+        await self.run(self.__close, f_obj, is_complete)
+
+    def shutdown(self) -> None:
+        """
+        Дожидается окончания всех операций записи и останавливает пул потоков.
+        """
+        self.executor.shutdown(wait=True)
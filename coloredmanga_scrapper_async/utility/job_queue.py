@@ -0,0 +1,193 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Iterator, NamedTuple
+
+from classes.page import Page
+
+# Наибольшее число страниц в одной единице работы. Тома, в которых страниц больше, делятся на диапазоны страниц.
+UNIT_PAGES = 200
+
+# Время (в секундах), на которое единица работы выдаётся обработчику. Обработчик продлевает его, пока работает;
+# если он завершился аварийно, то по истечении этого времени единица работы выдаётся другому обработчику.
+LEASE_TIME = 120
+
+# Наибольшее число выдач одной единицы работы. Единица работы, обработка которой столько раз прерывалась,
+# считается неудачной, чтобы она не останавливала обработчики бесконечно.
+MAX_LEASES = 5
+
+
+class WorkUnit(NamedTuple):
+    """
+    Единица работы: номер, название (том и диапазон страниц) и страницы для загрузки.
+    """
+    id: int
+    name: str
+    pages: list[Page]
+
+
+def make_work_units(volumes: Iterable[tuple[str, list[Page]]],
+                    unit_pages: int = UNIT_PAGES) -> Iterator[tuple[str, list[Page]]]:
+    """
+    Делит страницы томов volumes (см. Manga.iter_volumes) на единицы работы: каждый том - отдельная единица, а том,
+    в котором больше unit_pages страниц, делится на диапазоны не более чем по unit_pages страниц.
+    """
+    for vol_name, pages in volumes:
+        if len(pages) <= unit_pages:
+            yield vol_name, pages
+            continue
+        for start in range(0, len(pages), unit_pages):
+            end = min(start + unit_pages, len(pages))
+            yield f"{vol_name} [{start + 1}-{end}]", pages[start:end]
+
+
+class JobQueue:
+    def __init__(self, filename: str, lease_time: float = LEASE_TIME, max_leases: int = MAX_LEASES) -> None:
+        """
+        Класс, хранящий единицы работы задания на загрузку в файле SQLite и выдающий их обработчикам во временное
+        пользование (lease) на lease_time секунд. Блокировки файла SQLite позволяют обращаться к очереди из
+        нескольких процессов, а если файл лежит в общем хранилище с поддержкой блокировок, - и с нескольких машин.
+        Единица работы, срок выдачи которой истёк (обработчик завершился аварийно), выдаётся повторно.
+        Методы класса можно вызывать из разных потоков.
+        """
+        self.filename = filename
+        self.lease_time = lease_time
+        self.max_leases = max_leases
+
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        # isolation_level=None: транзакции открываются явно, чтобы выдача единицы работы была атомарной.
+        self.__connection = sqlite3.connect(filename, timeout=60, isolation_level=None, check_same_thread=False)
+        self.__lock = threading.Lock()
+        self.__connection.execute(
+            "CREATE TABLE IF NOT EXISTS units ("
+            "id INTEGER PRIMARY KEY, name TEXT, pages TEXT, state TEXT DEFAULT 'pending', owner TEXT, "
+            "lease_until REAL DEFAULT 0, leases INTEGER DEFAULT 0, failures INTEGER DEFAULT 0)"
+        )
+
+    def close(self) -> None:
+        """
+        Закрывает соединение с файлом очереди.
+        """
+        with self.__lock:
+            self.__connection.close()
+
+    def __len__(self) -> int:
+        """
+        Возвращает количество единиц работы в задании.
+        """
+        with self.__lock:
+            return self.__connection.execute("SELECT COUNT(*) FROM units").fetchone()[0]
+
+    def add_units(self, units: Iterable[tuple[str, list[Page]]]) -> int:
+        """
+        Добавляет единицы работы в задание, если оно ещё пустое. Возвращает количество единиц работы в задании.
+        Повторный вызов для уже созданного задания ничего не меняет, поэтому задание можно создавать при каждом
+        запуске.
+        """
+        with self.__lock:
+            connection = self.__connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                if connection.execute("SELECT COUNT(*) FROM units").fetchone()[0] == 0:
+                    connection.executemany(
+                        "INSERT INTO units (name, pages) VALUES (?, ?)",
+                        ((name, json.dumps([[page.url, page.path] for page in pages], ensure_ascii=False))
+                         for name, pages in units)
+                    )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            return connection.execute("SELECT COUNT(*) FROM units").fetchone()[0]
+
+    def lease(self, owner: str) -> WorkUnit | None:
+        """
+        Выдаёт обработчику owner первую свободную единицу работы или единицу работы с истёкшим сроком выдачи.
+        Возвращает None, если таких нет.
+        """
+        with self.__lock:
+            connection = self.__connection
+            now = time.time()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # единицы работы, выданные слишком много раз, считаются неудачными.
+                connection.execute(
+                    "UPDATE units SET state = 'failed' WHERE state = 'leased' AND lease_until < ? AND leases >= ?",
+                    (now, self.max_leases)
+                )
+                row = connection.execute(
+                    "SELECT id, name, pages FROM units "
+                    "WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?) ORDER BY id LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is not None:
+                    connection.execute(
+                        "UPDATE units SET state = 'leased', owner = ?, lease_until = ?, leases = leases + 1 "
+                        "WHERE id = ?",
+                        (owner, now + self.lease_time, row[0])
+                    )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+            if row is None:
+                return None
+            unit_id, name, pages_json = row
+            pages = []
+            for url, path in json.loads(pages_json):
+                page = Page(url)
+                page.path = path
+                pages.append(page)
+            return WorkUnit(unit_id, name, pages)
+
+    def renew(self, unit_id: int, owner: str) -> bool:
+        """
+        Продлевает срок выдачи единицы работы. Возвращает False, если единица работы уже выдана другому
+        обработчику, т.е. её обработку нужно прекратить.
+        """
+        with self.__lock:
+            cursor = self.__connection.execute(
+                "UPDATE units SET lease_until = ? WHERE id = ? AND owner = ? AND state = 'leased'",
+                (time.time() + self.lease_time, unit_id, owner)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, unit_id: int, owner: str, failures: int = 0) -> None:
+        """
+        Отмечает единицу работы выполненной. failures - количество страниц, которые не удалось загрузить.
+        """
+        with self.__lock:
+            self.__connection.execute(
+                "UPDATE units SET state = 'done', failures = ? WHERE id = ? AND owner = ?",
+                (failures, unit_id, owner)
+            )
+
+    def release(self, unit_id: int, owner: str) -> None:
+        """
+        Возвращает единицу работы в очередь, чтобы её мог взять другой обработчик.
+        """
+        with self.__lock:
+            self.__connection.execute(
+                "UPDATE units SET state = 'pending', lease_until = 0 "
+                "WHERE id = ? AND owner = ? AND state = 'leased'",
+                (unit_id, owner)
+            )
+
+    def get_stats(self) -> dict[str, int]:
+        """
+        Возвращает количество единиц работы в каждом состоянии: pending, leased, done, failed.
+        """
+        with self.__lock:
+            stats = dict.fromkeys(("pending", "leased", "done", "failed"), 0)
+            stats.update(self.__connection.execute("SELECT state, COUNT(*) FROM units GROUP BY state").fetchall())
+            return stats
+
+    def is_finished(self) -> bool:
+        """
+        Проверяет, что все единицы работы выполнены или признаны неудачными.
+        """
+        stats = self.get_stats()
+        return stats["pending"] == 0 and stats["leased"] == 0
@@ -0,0 +1,161 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable
+
+# Число изменений состояния страниц, после накопления которого они записываются в журнал одной транзакцией.
+JOURNAL_BATCH_SIZE = 200
+
+# Наибольшее время (в секундах), в течение которого изменения могут оставаться не записанными в журнал.
+JOURNAL_FLUSH_INTERVAL = 2.0
+
+# Состояния страниц в журнале: запланирована, загружается (на диске может быть файл .part), загружена, не загружена.
+PLANNED = "planned"
+PARTIAL = "partial"
+DONE = "done"
+FAILED = "failed"
+
+
+class DownloadJournal:
+    def __init__(self, filename: str, batch_size: int = JOURNAL_BATCH_SIZE,
+                 flush_interval: float = JOURNAL_FLUSH_INTERVAL) -> None:
+        """
+        Класс, ведущий журнал загрузки в файле SQLite (в режиме WAL): для каждой запланированной страницы хранятся
+        url-адрес, путь к файлу, состояние, размер, контрольная сумма SHA-256, число попыток и время планирования,
+        начала и окончания загрузки. По журналу можно продолжить загрузку после аварийного завершения программы, не
+        сканируя диск и не обрабатывая страницы сайта заново.
+        Изменения накапливаются и записываются одной транзакцией по batch_size штук, но не реже чем раз в
+        flush_interval секунд. При аварийном завершении теряются только последние изменения, и соответствующие
+        страницы будут загружены повторно. Методы класса можно вызывать из разных потоков.
+        """
+        self.filename = filename
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        self.__connection = sqlite3.connect(filename, timeout=60, check_same_thread=False)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        # в режиме WAL синхронизация при каждой фиксации транзакции не нужна для целостности базы.
+        self.__connection.execute("PRAGMA synchronous=NORMAL")
+        self.__connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "path TEXT PRIMARY KEY, url TEXT, state TEXT, size INTEGER, checksum TEXT, attempts INTEGER DEFAULT 0, "
+            "error TEXT, planned_at REAL, started_at REAL, finished_at REAL)"
+        )
+        self.__connection.commit()
+
+        self.__lock = threading.Lock()
+        self.__started: list[tuple] = []
+        self.__finished: list[tuple] = []
+        self.__flushed_at = time.monotonic()
+
+    def plan(self, pages: Iterable[tuple[str, str]]) -> None:
+        """
+        Добавляет в журнал страницы pages, заданные парами (url-адрес, путь к файлу). Страницы, которые уже есть в
+        журнале, не изменяются.
+        """
+        now = time.time()
+        with self.__lock:
+            with self.__connection:
+                self.__connection.executemany(
+                    "INSERT OR IGNORE INTO pages (path, url, state, planned_at) VALUES (?, ?, ?, ?)",
+                    ((path, url, PLANNED, now) for url, path in pages)
+                )
+
+    def get_done_paths(self) -> set[str]:
+        """
+        Возвращает пути к файлам всех загруженных страниц.
+        """
+        with self.__lock:
+            return {row[0] for row in self.__connection.execute("SELECT path FROM pages WHERE state = ?", (DONE,))}
+
+    def get_checksums(self) -> dict[str, str]:
+        """
+        Возвращает контрольные суммы загруженных страниц и пути к их файлам.
+        """
+        with self.__lock:
+            return dict(self.__connection.execute(
+                "SELECT checksum, path FROM pages WHERE state = ? ORDER BY rowid DESC", (DONE,)
+            ).fetchall())
+
+    def get_unfinished(self) -> list[tuple[str, str]]:
+        """
+        Возвращает url-адреса и пути к файлам всех страниц, которые ещё не загружены, в порядке планирования.
+        """
+        with self.__lock:
+            return self.__connection.execute(
+                "SELECT url, path FROM pages WHERE state != ? ORDER BY rowid", (DONE,)
+            ).fetchall()
+
+    def get_stats(self) -> dict[str, int]:
+        """
+        Возвращает количество страниц в каждом состоянии.
+        """
+        stats = dict.fromkeys((PLANNED, PARTIAL, DONE, FAILED), 0)
+        with self.__lock:
+            stats.update(self.__connection.execute("SELECT state, COUNT(*) FROM pages GROUP BY state").fetchall())
+        return stats
+
+    def mark_started(self, path: str) -> None:
+        """
+        Отмечает начало очередной попытки загрузки страницы path.
+        """
+        with self.__lock:
+            self.__started.append((PARTIAL, time.time(), path))
+            self.__flush_if_needed()
+
+    def mark_done(self, path: str, size: int, checksum: str) -> None:
+        """
+        Отмечает, что страница path загружена: size - размер файла в байтах, checksum - его контрольная сумма.
+        """
+        with self.__lock:
+            self.__finished.append((DONE, size, checksum, None, time.time(), path))
+            self.__flush_if_needed()
+
+    def mark_failed(self, path: str, error: Exception | str) -> None:
+        """
+        Отмечает, что страницу path загрузить не удалось.
+        """
+        with self.__lock:
+            self.__finished.append((FAILED, None, None, repr(error), time.time(), path))
+            self.__flush_if_needed()
+
+    def __flush_if_needed(self) -> None:
+        """
+        Записывает накопленные изменения, если их достаточно много или они накапливаются слишком долго.
+        """
+        if (len(self.__started) + len(self.__finished) >= self.batch_size
+                or time.monotonic() - self.__flushed_at >= self.flush_interval):
+            self.__flush()
+
+    def __flush(self) -> None:
+        """
+        Записывает накопленные изменения одной транзакцией.
+        """
+        started, self.__started = self.__started, []
+        finished, self.__finished = self.__finished, []
+        with self.__connection:
+            self.__connection.executemany(
+                "UPDATE pages SET state = ?, attempts = attempts + 1, started_at = ? WHERE path = ?", started
+            )
+            self.__connection.executemany(
+                "UPDATE pages SET state = ?, size = ?, checksum = ?, error = ?, finished_at = ? WHERE path = ?",
+                finished
+            )
+        self.__flushed_at = time.monotonic()
+
+    def flush(self) -> None:
+        """
+        Записывает все накопленные изменения.
+        """
+        with self.__lock:
+            self.__flush()
+
+    def close(self) -> None:
+        """
+        Записывает накопленные изменения и закрывает журнал.
+        """
+        with self.__lock:
+            self.__flush()
+            self.__connection.close()
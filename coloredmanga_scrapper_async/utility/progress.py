@@ -0,0 +1,260 @@
+import threading
+import time
+from collections import deque
+
+# Интервал (в секундах) между выводами строки хода загрузки.
+PROGRESS_INTERVAL = 5.0
+
+# Промежуток времени (в секундах), по которому вычисляется текущая скорость загрузки.
+SPEED_WINDOW = 30.0
+
+# Название, под которым учитываются страницы, том которых неизвестен (например, при повторной загрузке по логам).
+OTHER_VOLUME = "прочие"
+
+
+class VolumeProgress:
+    __slots__ = ('name', 'dir_path', 'total', 'done', 'skipped', 'failed')
+
+    def __init__(self, name: str, dir_path: str) -> None:
+        """
+        Класс, хранящий ход загрузки тома name, страницы которого сохраняются в директорию dir_path: число страниц
+        для загрузки, загруженных, пропущенных (уже сохранённых ранее) и тех, которые загрузить не удалось.
+        """
+        self.name = name
+        self.dir_path = dir_path
+        self.total = 0
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+
+
+def format_duration(seconds: float) -> str:
+    """
+    Возвращает время в формате ЧЧ:ММ:СС.
+    """
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class ProgressReporter:
+    def __init__(self, interval: float = PROGRESS_INTERVAL) -> None:
+        """
+        Класс, выводящий ход загрузки одной строкой раз в interval секунд: число обработанных глав, загруженных
+        страниц и байт, текущую скорость, оставшееся время и число ошибок по томам. Загрузчики только изменяют
+        счётчики под блокировкой, а вывод в консоль выполняет отдельный поток, поэтому его затраты не зависят от
+        числа страниц. Строки о каждом файле выводятся только в подробном режиме (verbose=True).
+        Вложенные вызовы start и stop допускаются: вывод завершается при последнем вызове stop.
+        """
+        self.interval = interval
+        self.verbose = False
+
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__thread: threading.Thread | None = None
+        self.__depth = 0
+        self.__reset()
+
+    def __reset(self) -> None:
+        """
+        Обнуляет все счётчики.
+        """
+        self.started_at = time.perf_counter()
+        self.volumes_num = 0
+        self.chapters_num = 0
+        self.chapters_done = 0
+        self.pages_done = 0
+        self.bytes_done = 0
+        self.retries = 0
+        self.volumes: list[VolumeProgress] = []
+        self.other = VolumeProgress(OTHER_VOLUME, "")
+        # директория страницы -> том, к которому она относится.
+        self.__dirs: dict[str, VolumeProgress] = {}
+        # моменты вывода строки и значения счётчиков страниц и байт в эти моменты.
+        self.__samples: deque[tuple[float, int, int]] = deque()
+
+    def log(self, message: str) -> None:
+        """
+        Выводит сообщение о файле в консоль, если включён подробный режим.
+        """
+        if self.verbose:
+            print(message)
+
+    def start(self, volumes_num: int = 0, chapters_num: int = 0) -> None:
+        """
+        Начинает вывод хода загрузки. volumes_num и chapters_num - ожидаемое число томов и глав (0 - неизвестно);
+        по ним оценивается общий объём работы.
+        """
+        with self.__lock:
+            self.__depth += 1
+            if self.__depth == 1:
+                self.__reset()
+            self.volumes_num = max(self.volumes_num, volumes_num)
+            self.chapters_num = max(self.chapters_num, chapters_num)
+            if self.__thread is not None:
+                return
+            self.__stop.clear()
+            self.__thread = threading.Thread(target=self.__run, name="progress", daemon=True)
+            self.__thread.start()
+
+    def stop(self) -> None:
+        """
+        Завершает вывод хода загрузки и выводит итог.
+        """
+        with self.__lock:
+            self.__depth = max(0, self.__depth - 1)
+            if self.__depth or self.__thread is None:
+                return
+            thread, self.__thread = self.__thread, None
+        self.__stop.set()
+        thread.join()
+        self.report()
+
+    def __run(self) -> None:
+        """
+        Выводит строку хода загрузки раз в interval секунд.
+        """
+        while not self.__stop.wait(self.interval):
+            print(self.render())
+
+    def add_volume(self, name: str, dir_path: str, pages_num: int = 0) -> None:
+        """
+        Добавляет pages_num страниц для загрузки в том name, страницы которого сохраняются в директорию dir_path
+        (и её поддиректории). Том создаётся при первом вызове.
+        """
+        with self.__lock:
+            for volume in self.volumes:
+                if volume.dir_path == dir_path:
+                    break
+            else:
+                volume = VolumeProgress(name, dir_path)
+                self.volumes.append(volume)
+            volume.total += pages_num
+
+    def __get_volume(self, path: str) -> VolumeProgress:
+        """
+        Возвращает том, к которому относится страница, сохраняемая по пути path. Вызывается под блокировкой.
+        """
+        dir_path = path.rpartition("\\")[0] + "\\"
+        volume = self.__dirs.get(dir_path)
+        if volume is None:
+            volume = next((vol for vol in self.volumes if dir_path.startswith(vol.dir_path)), self.other)
+            self.__dirs[dir_path] = volume
+        return volume
+
+    def chapter_done(self, name: str) -> None:
+        """
+        Отмечает, что обработана html-страница главы name.
+        """
+        with self.__lock:
+            self.chapters_done += 1
+        self.log(f"Обработано {name}")
+
+    def page_done(self, path: str, size: int) -> None:
+        """
+        Отмечает, что страница сохранена по пути path, причём загружено size байт.
+        """
+        with self.__lock:
+            self.__get_volume(path).done += 1
+            self.pages_done += 1
+            self.bytes_done += size
+        self.log(f"[+] {path}")
+
+    def page_skipped(self, path: str) -> None:
+        """
+        Отмечает, что страница уже сохранена по пути path и не загружается.
+        """
+        with self.__lock:
+            self.__get_volume(path).skipped += 1
+
+    def page_retry(self, message: str) -> None:
+        """
+        Отмечает повторную попытку загрузки страницы; сообщение message об ошибке выводится в подробном режиме.
+        """
+        with self.__lock:
+            self.retries += 1
+        self.log(message)
+
+    def page_failed(self, path: str) -> None:
+        """
+        Отмечает, что страницу path загрузить не удалось.
+        """
+        with self.__lock:
+            self.__get_volume(path).failed += 1
+
+    def __get_total(self) -> tuple[int, bool]:
+        """
+        Возвращает число страниц для загрузки и признак того, что это оценка: если известны ещё не все тома, то
+        для оставшихся томов берётся среднее число страниц уже известных. Вызывается под блокировкой.
+        """
+        total = sum(vol.total for vol in self.volumes) + self.other.done + self.other.skipped + self.other.failed
+        known = len(self.volumes)
+        if known and known < self.volumes_num:
+            return total + total * (self.volumes_num - known) // known, True
+        return total, False
+
+    def render(self) -> str:
+        """
+        Возвращает строку хода загрузки.
+        """
+        now = time.perf_counter()
+        with self.__lock:
+            volumes = self.volumes + [self.other]
+            done = self.pages_done
+            skipped = sum(vol.skipped for vol in volumes)
+            failures = [(vol.name, vol.failed) for vol in volumes if vol.failed]
+            total, is_estimate = self.__get_total()
+
+            # скорость вычисляется по изменению счётчиков за последние SPEED_WINDOW секунд.
+            self.__samples.append((now, done, self.bytes_done))
+            while len(self.__samples) > 2 and now - self.__samples[1][0] >= SPEED_WINDOW:
+                self.__samples.popleft()
+            since, done_since, bytes_since = self.__samples[0] if len(self.__samples) > 1 else (
+                self.started_at, 0, 0)
+            pages_speed = (done - done_since) / (now - since) if now > since else 0.0
+            bytes_speed = (self.bytes_done - bytes_since) / (now - since) if now > since else 0.0
+            parts = []
+            if self.chapters_num or self.chapters_done:
+                chapters = f"{self.chapters_done}/{self.chapters_num}" if self.chapters_num else self.chapters_done
+                parts.append(f"глав {chapters}")
+            if total or done:
+                parts.append(f"страниц {done + skipped}/{'~' if is_estimate else ''}{total}")
+            if skipped:
+                parts.append(f"пропущено {skipped}")
+            bytes_done = self.bytes_done
+            retries = self.retries
+
+        parts.append(f"{bytes_done / 1024 ** 2:.1f} МБ")
+        parts.append(f"{pages_speed:.1f} стр/с, {bytes_speed / 1024 ** 2:.2f} МБ/с")
+        left = total - done - skipped - sum(failed for _, failed in failures)
+        if left > 0:
+            parts.append(f"осталось {format_duration(left / pages_speed) if pages_speed else '--:--:--'}")
+        if retries:
+            parts.append(f"повторов {retries}")
+        if failures:
+            parts.append("ошибок " + ", ".join(f"{name}: {failed}" for name, failed in failures))
+        return f"[INFO] {format_duration(now - self.started_at)} " + ", ".join(parts)
+
+    def report(self) -> None:
+        """
+        Выводит итог загрузки и число страниц, которые не удалось загрузить, по томам.
+        """
+        elapsed = time.perf_counter() - self.started_at
+        with self.__lock:
+            volumes = [vol for vol in self.volumes + [self.other] if vol.failed]
+            pages_done = self.pages_done
+            bytes_done = self.bytes_done
+            skipped = sum(vol.skipped for vol in self.volumes + [self.other])
+            chapters_done = self.chapters_done
+        if chapters_done and not pages_done:
+            print(f"[INFO] Обработано глав: {chapters_done} за {format_duration(elapsed)}.")
+            return
+        print(
+            f"[INFO] Загружено страниц: {pages_done} ({bytes_done / 1024 ** 2:.1f} МБ) за {format_duration(elapsed)}, "
+            f"пропущено уже сохранённых: {skipped}."
+        )
+        for vol in volumes:
+            print(f"[ERR] {vol.name}: не удалось загрузить страниц {vol.failed} из {vol.total or vol.failed}.")
+
+
+# Вывод хода загрузки, общий для всей программы.
+progress = ProgressReporter()
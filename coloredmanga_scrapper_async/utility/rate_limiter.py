@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+
+# Ограничения по умолчанию: число запросов в секунду и число байт в секунду. None - ограничения нет.
+REQUESTS_PER_SECOND: float | None = None
+BYTES_PER_SECOND: float | None = None
+
+# Время (в секундах), за которое накапливается наибольший допустимый всплеск запросов или данных после простоя.
+BURST_SECONDS = 1.0
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        """
+        Класс, реализующий алгоритм token bucket: маркеры поступают со скоростью rate в секунду и накапливаются не
+        более чем до capacity. Каждая операция забирает нужное ей число маркеров; если их не хватает, то маркеры
+        берутся в долг, а операция должна подождать, пока долг не будет покрыт. Благодаря этому операции,
+        запросившие маркеры раньше, выполняются раньше, а операция, требующая больше capacity маркеров, не
+        блокируется навсегда.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Забирает amount маркеров и возвращает время (в секундах), которое нужно подождать перед операцией.
+        """
+        with self.__lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class RateLimiter:
+    def __init__(self, requests_per_second: float | None = REQUESTS_PER_SECOND,
+                 bytes_per_second: float | None = BYTES_PER_SECOND) -> None:
+        """
+        Класс, ограничивающий частоту запросов requests_per_second и скорость получения данных bytes_per_second
+        для всех загрузчиков сразу. Если ограничение равно None, то оно не действует.
+        Методы wait_* предназначены для синхронного кода, методы wait_*_async - для асинхронного.
+        """
+        self.requests_bucket: TokenBucket | None = None
+        self.bytes_bucket: TokenBucket | None = None
+        self.configure(requests_per_second, bytes_per_second)
+
+    def configure(self, requests_per_second: float | None, bytes_per_second: float | None) -> None:
+        """
+        Устанавливает новые ограничения.
+        """
+        self.requests_bucket = self.__make_bucket(requests_per_second)
+        self.bytes_bucket = self.__make_bucket(bytes_per_second)
+
+    @staticmethod
+    def __make_bucket(rate: float | None) -> TokenBucket | None:
+        """
+        Создаёт TokenBucket для ограничения rate или возвращает None, если ограничения нет.
+        """
+        if not rate:
+            return None
+        if rate < 0:
+            raise ValueError("Ограничение скорости не может быть меньше 0.")
+        return TokenBucket(rate, max(1.0, rate * BURST_SECONDS))
+
+    def __reserve_request(self) -> float:
+        """
+        Возвращает время ожидания перед очередным запросом.
+        """
+        return self.requests_bucket.reserve(1) if self.requests_bucket is not None else 0.0
+
+    def __reserve_bytes(self, size: int) -> float:
+        """
+        Возвращает время ожидания после получения size байт.
+        """
+        return self.bytes_bucket.reserve(size) if self.bytes_bucket is not None else 0.0
+
+    def wait_request(self) -> None:
+        """
+        Ожидает возможности выполнить очередной запрос.
+        """
+        if delay := self.__reserve_request():
+            time.sleep(delay)
+
+    def wait_bytes(self, size: int) -> None:
+        """
+        Учитывает получение size байт и ожидает, если скорость получения данных превышена.
+        """
+        if delay := self.__reserve_bytes(size):
+            time.sleep(delay)
+
+    async def wait_request_async(self) -> None:
+        """
+        Ожидает возможности выполнить очередной запрос, не блокируя цикл событий.
+        """
+        if delay := self.__reserve_request():
+            await asyncio.sleep(delay)
+
+    async def wait_bytes_async(self, size: int) -> None:
+        """
+        Учитывает получение size байт и ожидает, не блокируя цикл событий, если скорость получения данных превышена.
+        """
+        if delay := self.__reserve_bytes(size):
+            await asyncio.sleep(delay)
+
+
+# Ограничитель, общий для всех загрузчиков.
+rate_limiter = RateLimiter()
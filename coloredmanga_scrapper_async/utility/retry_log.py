@@ -0,0 +1,56 @@
+import glob
+import os
+import re
+from typing import Iterable
+
+# Директория, в которую декоратор Retry синхронной версии записывает логи страниц, которые не удалось загрузить.
+SYNC_LOG_DIR = "..\\coloredmanga_scrapper_sync\\log\\"
+
+# Запись лога Retry: ссылка на изображение и путь к файлу, в который оно должно было быть сохранено.
+LOG_RECORD = re.compile(r"^from_link: (.+?)\s*\nto_file: (.+?)\s*$", re.MULTILINE)
+
+
+def get_log_files(paths: Iterable[str]) -> list[str]:
+    """
+    Возвращает список файлов логов: пути к файлам берутся как есть, а из директорий берутся все файлы *.log.
+    """
+    log_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            log_files.extend(sorted(glob.glob(os.path.join(path, "*.log"))))
+        else:
+            log_files.append(path)
+    return log_files
+
+
+def parse_retry_log(filename: str) -> list[tuple[str, str]]:
+    """
+    Возвращает пары (ссылка на изображение, путь к файлу) из лога filename в порядке записи.
+    """
+    with open(filename, 'r', encoding='utf-8') as f_in:
+        return LOG_RECORD.findall(f_in.read())
+
+
+def read_retry_logs(log_files: Iterable[str]) -> dict[str, list[tuple[str, str]]]:
+    """
+    Читает логи log_files и возвращает для каждого из них пары (ссылка на изображение, путь к файлу) без повторов.
+    """
+    return {filename: list(dict.fromkeys(parse_retry_log(filename))) for filename in log_files}
+
+
+def prune_retry_log(filename: str, records: list[tuple[str, str]], done_paths: set[str]) -> int:
+    """
+    Перезаписывает лог filename, оставляя в нём только записи records, файлы которых не входят в done_paths.
+    Если записей не осталось, то лог удаляется. Возвращает количество оставшихся записей.
+    """
+    records = [(link, path) for link, path in records if path not in done_paths]
+    if not records:
+        os.remove(filename)
+        return 0
+
+    # лог перезаписывается через временный файл, чтобы при сбое не потерять записи.
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, 'w', encoding='utf-8') as f_out:
+        f_out.writelines(f"from_link: {link}\nto_file: {path}\n\n" for link, path in records)
+    os.replace(tmp_filename, filename)
+    return len(records)
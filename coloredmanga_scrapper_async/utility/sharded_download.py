@@ -0,0 +1,143 @@
+import asyncio
+import multiprocessing
+import os
+import socket
+import sys
+from datetime import datetime
+from typing import Callable
+
+import aiohttp
+
+import utility.utils as utils
+from classes.manga import Manga
+from utility.async_pages_downloader import PagesDownloader, create_session
+from utility.concurrency import concurrency
+from utility.job_queue import UNIT_PAGES, JobQueue, WorkUnit, make_work_units
+from utility.progress import progress
+from utility.retry_policy import FailureManifest
+
+# Пауза (в секундах) перед повторной попыткой получить единицу работы, если все оставшиеся единицы выданы другим
+# обработчикам: если какой-либо из них завершится аварийно, то его единица работы будет выдана повторно.
+POLL_INTERVAL = 5
+
+
+def get_worker_id() -> str:
+    """
+    Возвращает идентификатор обработчика, уникальный среди процессов всех машин: имя машины и номер процесса.
+    """
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def create_job(contents: Manga, job_file: str, dir_root: str, is_flatten: bool, start_with: int, end_with: int,
+               unit_pages: int = UNIT_PAGES) -> None:
+    """
+    Создаёт в файле job_file задание на загрузку манги: страницы, сформированные так же, как для download_manga,
+    делятся на единицы работы по томам и диапазонам не более чем по unit_pages страниц. Если задание в этом файле
+    уже создано, то оно не изменяется.
+    """
+    queue = JobQueue(job_file)
+    try:
+        volumes = contents.iter_volumes(dir_root, is_flatten, start_with, end_with)
+        units_num = queue.add_units(make_work_units(volumes, unit_pages))
+    finally:
+        queue.close()
+    print(f"[INFO] Задание {job_file}: единиц работы {units_num}.")
+
+
+async def download_unit(session: aiohttp.ClientSession, queue: JobQueue, unit: WorkUnit, worker_id: str,
+                        manifest: FailureManifest) -> None:
+    """
+    Загружает страницы единицы работы, пропуская уже сохранённые на диске (например, обработчиком, который
+    завершился аварийно), и продлевает срок её выдачи, пока идёт загрузка. Если единица работы была выдана другому
+    обработчику, то новые страницы на загрузку не передаются.
+    """
+    print(f"[INFO] {worker_id}: {unit.name}, страниц: {len(unit.pages)}.")
+    is_leased = True
+
+    async def renew() -> None:
+        nonlocal is_leased
+        while is_leased:
+            await asyncio.sleep(queue.lease_time / 3)
+            is_leased = await asyncio.to_thread(queue.renew, unit.id, worker_id)
+
+    downloader = PagesDownloader(session)
+    downloader.start()
+    renewal = asyncio.create_task(renew())
+    try:
+        for page in utils.skip_complete_pages(unit.pages):
+            if not is_leased:
+                break
+            await downloader.put(page)
+    except BaseException:
+        await asyncio.to_thread(queue.release, unit.id, worker_id)
+        raise
+    finally:
+        await downloader.join()
+        renewal.cancel()
+        manifest.failures.extend(downloader.manifest.failures)
+
+    if is_leased:
+        await asyncio.to_thread(queue.complete, unit.id, worker_id, len(downloader.manifest))
+    else:
+        print(f"[WARNING] {worker_id}: {unit.name} передана другому обработчику.")
+
+
+async def process_job(job_file: str, worker_id: str, manifest: FailureManifest) -> None:
+    """
+    Получает из очереди job_file и загружает единицы работы, пока все они не будут выполнены.
+    """
+    queue = JobQueue(job_file)
+    try:
+        async with create_session() as session:
+            while True:
+                unit = await asyncio.to_thread(queue.lease, worker_id)
+                if unit is not None:
+                    await download_unit(session, queue, unit, worker_id, manifest)
+                elif await asyncio.to_thread(queue.is_finished):
+                    break
+                else:
+                    await asyncio.sleep(POLL_INTERVAL)
+        print(f"[INFO] {worker_id}: задание выполнено, {queue.get_stats()}.")
+    finally:
+        queue.close()
+
+
+def run_worker(job_file: str) -> None:
+    """
+    Запускает обработчик задания job_file в текущем процессе. Обработчики можно запускать в нескольких процессах и
+    на нескольких машинах, если файл задания и директория для сохранения манги находятся в общем хранилище.
+    Сведения о страницах, которые не удалось загрузить, сохраняются в LOG_DIR в файл с идентификатором обработчика.
+    """
+    worker_id = get_worker_id()
+    manifest = FailureManifest()
+
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    progress.start()
+    try:
+        asyncio.run(process_job(job_file, worker_id, manifest))
+    finally:
+        progress.stop()
+        manifest.save(os.path.join(utils.LOG_DIR, f"{datetime.now():%d_%m_%y %H_%M_%S} {worker_id}.json"))
+        concurrency.report()
+
+
+def run_workers(target: Callable[[str], None], job_file: str, processes_num: int) -> None:
+    """
+    Запускает processes_num процессов, выполняющих target(job_file), и дожидается их завершения.
+    """
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=target, args=(job_file,)) for _ in range(processes_num)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    queue = JobQueue(job_file)
+    try:
+        stats = queue.get_stats()
+    finally:
+        queue.close()
+    print(f"[INFO] Задание {job_file}: {stats}.")
+    if stats["failed"]:
+        print(f"[ERR] Единиц работы, которые не удалось выполнить: {stats['failed']}.")
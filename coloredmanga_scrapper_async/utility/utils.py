@@ -1,13 +1,33 @@
 import json
 import os
+from datetime import datetime
+from typing import Iterable, Iterator
 
+from classes.c_utils.downloader import Downloader
+from classes.c_utils.html_cache import html_cache
 from classes.manga import Manga
+from classes.page import Page
+from utility import contents_refresh
+from utility.async_pages_downloader import PART_SUFFIX, download_pages
+from utility.async_pipeline import download_manga_pipelined
+from utility.cbz_writer import CbzWriter
+from utility.contents_format import is_compact_file, save_compact
 from utility.decorators import console_log, timer
+from utility.dedup import DedupIndex
+from utility.journal import JOURNAL_BATCH_SIZE, DownloadJournal
+from utility.metrics import EXPORT_INTERVAL, metrics
+from utility.progress import progress
+from utility.rate_limiter import rate_limiter
+from utility.retry_log import SYNC_LOG_DIR, get_log_files, prune_retry_log, read_retry_logs
+from utility import sharded_download
 
 # Название манги и глав могут содержать символы, запрещённые в именах папок Windows.
 # В этом случае они должны быть удалены при создании папок.
 WINDOWS_PROHIBITED_DIR_NAME_CHARS = ["<", ">", "*", "?", "/", "\\", "|", ":", '"']
 
+# Директория, в которую сохраняются логи и сведения о страницах, которые не удалось загрузить.
+LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "log")
+
 # Параметры для запросов.
 headers = {
     "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9",
@@ -16,30 +36,97 @@ headers = {
 
 
 @timer
-def build_contents(link: str, from_file: bool = False) -> Manga:
+def build_contents(link: str, from_file: bool = False, use_cache: bool = True) -> Manga:
     """
     Создаёт и возвращает экземпляр класса Manga.
     В процессе создания происходит загрузка иерархии файлов манги по ссылке link (т.е. томов, глав и страниц) с сайта
     или из предварительно сохранённого файла JSON в зависимости от параметра from_file.
+    Загруженные с сайта html-страницы сохраняются в кэш и при повторном построении берутся из него; при
+    use_cache=False кэш не используется.
     """
-    return Manga(link, from_file)
+    with html_cache.bypassed(not use_cache):
+        return Manga(link, from_file)
 
 
 @console_log(info='Данные сохранены')
 def save_contents(manga: Manga, filename: str = "..\\coloredmanga_scrapper_async\\data\\contents.json") -> None:
     """
     Сохраняет содержимое, то есть иерархию томов, глав и страниц, класса Manga в файл в формате JSON.
+    Если имя файла оканчивается на .json.gz, то содержимое сохраняется в компактном формате (см. contents_format).
+    """
+    dump_contents(manga.to_JSON(), filename)
+
+
+def dump_contents(manga_json: dict, filename: str) -> None:
+    """
+    Сохраняет содержание манги, представленное в формате JSON, в файл. Формат файла определяется по его расширению.
     """
     try:
-        with open(filename, 'w', encoding='utf-8') as f_out:
-            json.dump(manga.to_JSON(), f_out, indent=2, ensure_ascii=False)
+        if is_compact_file(filename):
+            save_compact(manga_json, filename)
+        else:
+            with open(filename, 'w', encoding='utf-8') as f_out:
+                json.dump(manga_json, f_out, indent=2, ensure_ascii=False)
     except PermissionError:
         raise PermissionError("Файл доступен только для чтения. Измените атрибуты доступа.")
 
 
+@timer
+def refresh_contents(filename: str, use_cache: bool = True) -> None:
+    """
+    Обновляет ранее сохранённое в файле filename содержание манги: загружает главную страницу манги и обрабатывает
+    только новые или изменившиеся главы, после чего сохраняет обновлённое содержание в тот же файл.
+    При use_cache=False страницы новых глав загружаются с сайта, а не из кэша.
+    """
+    manga_json = Downloader(filename).download_local_file()
+    with html_cache.bypassed(not use_cache):
+        is_changed = contents_refresh.refresh_contents(manga_json)
+    if is_changed:
+        dump_contents(manga_json, filename)
+        print(f"[INFO] Содержание обновлено: {filename}")
+
+
+@console_log(info='Данные преобразованы')
+def convert_contents(src_filename: str, dst_filename: str) -> None:
+    """
+    Преобразует файл содержания манги src_filename из одного формата в другой и сохраняет результат в dst_filename.
+    Формат обоих файлов определяется по расширению: .json.gz - компактный формат, иначе - обычный JSON.
+    """
+    dump_contents(Downloader(src_filename).download_local_file(), dst_filename)
+
+
+def set_rate_limit(requests_per_second: float | None = None, bytes_per_second: float | None = None) -> None:
+    """
+    Ограничивает частоту запросов к сайту (запросов в секунду) и скорость загрузки данных (байт в секунду) для всех
+    последующих загрузок. Значение None снимает соответствующее ограничение.
+    """
+    rate_limiter.configure(requests_per_second, bytes_per_second)
+
+
+def set_verbose(verbose: bool) -> None:
+    """
+    Включает или выключает подробный режим, в котором в консоль выводится строка о каждой загруженной странице и
+    обработанной главе, а также о каждой повторной попытке загрузки. Без него ход загрузки выводится одной строкой
+    раз в несколько секунд.
+    """
+    progress.verbose = verbose
+
+
+def start_metrics_export(json_file: str | None = None, prometheus_file: str | None = None,
+                         interval: float = EXPORT_INTERVAL) -> None:
+    """
+    Запускает периодическую (раз в interval секунд) выгрузку метрик загрузки: время запросов и время до первого
+    байта по хостам, объём загруженных данных, число загруженных страниц, повторов, длину очереди и т.д. Метрики
+    выгружаются в файл json_file в формате JSON и в файл prometheus_file в текстовом формате Prometheus (например,
+    в директорию textfile collector в node exporter). Последний снимок выгружается при завершении программы.
+    """
+    metrics.start_export(json_file, prometheus_file, interval)
+
+
 @timer
 def download_manga(contents: Manga, dir_root: str, is_flatten: bool = False, start_with: int = 0,
-                   end_with: int = 0) -> None:
+                   end_with: int = 0, is_resume: bool = False, journal_file: str | None = None,
+                   is_dedup: bool = False, is_cbz: bool = False) -> None:
     """
     Загружает и сохраняет в корневую директорию dir_root мангу, сохраняя при этом иерархию томов и глав на основе
     contents.
@@ -58,19 +145,221 @@ def download_manga(contents: Manga, dir_root: str, is_flatten: bool = False, sta
     скачивания. Если значение равно 0, то ограничений нет. Если параметр end_with задан, то производится скачивание
     томов до него не включительно, т.е. при start_with=5, end_with=9 будут скачаны тома 5, 6, 7, 8.
     Если томов у манги на сайте нет (только список глав), то данные параметры будут применены к главам.
+    Параметр is_resume позволяет продолжить прерванную загрузку: страницы, файлы которых уже есть на диске,
+    повторно не скачиваются.
+    Если задан journal_file, то ход загрузки записывается в журнал SQLite (см. DownloadJournal). При повторном
+    запуске с тем же журналом загруженные страницы пропускаются по данным журнала, без сканирования диска.
+    Параметр is_dedup позволяет не загружать и не хранить повторно одинаковые изображения: изображения по
+    одинаковым ссылкам загружаются один раз, а файлы с одинаковым содержимым заменяются жёсткими ссылками на один
+    файл (см. DedupIndex). Если задан journal_file, то учитываются и файлы, загруженные при предыдущих запусках.
+    Параметр is_cbz позволяет сохранять страницы сразу в архивы CBZ (без сжатия) вместо отдельных файлов: при
+    is_flatten=False создаётся архив для каждой главы в папке тома, при is_flatten=True - архив для каждого тома.
+    Страницы в архиве идут по порядку номеров, а архив появляется на диске только после записи всех его страниц.
+    Этот режим нельзя использовать вместе с journal_file и is_dedup.
+    Сведения о страницах, которые так и не удалось загрузить, сохраняются в формате JSON в директорию LOG_DIR.
     """
-    contents.download(dir_root, is_flatten, start_with, end_with)
+    if is_cbz and (journal_file is not None or is_dedup):
+        raise ValueError("Сохранение в архивы CBZ нельзя использовать вместе с журналом загрузки и is_dedup.")
+    dedup = DedupIndex() if is_dedup else None
+    if is_cbz:
+        contents.download(dir_root, is_flatten, start_with, end_with, is_resume, archives=CbzWriter())
+    elif journal_file is None:
+        contents.download(dir_root, is_flatten, start_with, end_with, is_resume, dedup=dedup)
+    else:
+        journal = DownloadJournal(journal_file)
+        try:
+            if dedup is not None:
+                dedup.add_checksums(journal.get_checksums())
+            contents.download(dir_root, is_flatten, start_with, end_with, journal=journal, dedup=dedup)
+            journal.flush()
+            print(f"[INFO] Журнал {journal_file}: {journal.get_stats()}.")
+        finally:
+            journal.close()
+    if dedup is not None:
+        dedup.report()
 
 
-def create_dir(path: str) -> str:
+@timer
+def resume_download(journal_file: str) -> None:
     """
-    Создаёт директорию по пути path, при этом из пути удаляются все неподдерживаемые Windows символы. Возвращает 
-    путь, по которому была создана директория.
+    Продолжает загрузку по журналу journal_file, созданному download_manga: загружаются все страницы, которые не
+    были загружены, без обработки страниц сайта и без сканирования диска.
+    """
+    journal = DownloadJournal(journal_file)
+    try:
+        pages = []
+        for url, path in journal.get_unfinished():
+            page = Page(url)
+            page.path = path
+            pages.append(page)
+        print(f"[INFO] Журнал {journal_file}: страниц для загрузки {len(pages)}.")
+        download_pages(pages, journal=journal)
+        journal.flush()
+        print(f"[INFO] Журнал {journal_file}: {journal.get_stats()}.")
+    finally:
+        journal.close()
+
+
+def create_download_job(contents: Manga, job_file: str, dir_root: str, is_flatten: bool = False,
+                        start_with: int = 0, end_with: int = 0) -> None:
+    """
+    Создаёт в файле SQLite job_file задание на загрузку манги, которое могут выполнять несколько процессов на одной
+    или нескольких машинах (см. run_download_worker). Страницы делятся на единицы работы по томам (большие тома - по
+    диапазонам страниц). Параметры dir_root, is_flatten, start_with и end_with аналогичны параметрам download_manga.
+    """
+    sharded_download.create_job(contents, job_file, dir_root, is_flatten, start_with, end_with)
+
+
+def run_download_worker(job_file: str) -> None:
+    """
+    Выполняет задание job_file в текущем процессе: получает единицы работы из очереди и загружает их страницы, пока
+    задание не будет выполнено. Единица работы выдаётся процессу на время и продлевается, пока он работает; если
+    процесс завершился аварийно, то его единица работы по истечении этого времени выдаётся другому процессу.
+    Для работы на нескольких машинах файл задания и dir_root должны находиться в общем хранилище.
+    """
+    sharded_download.run_worker(job_file)
+
+
+@timer
+def download_manga_sharded(contents: Manga, job_file: str, dir_root: str, is_flatten: bool = False,
+                           start_with: int = 0, end_with: int = 0, processes_num: int | None = None) -> None:
+    """
+    Создаёт задание на загрузку манги (см. create_download_job) и выполняет его processes_num процессами (по
+    умолчанию - по числу ядер процессора). К выполнению того же задания можно подключить процессы на других машинах
+    при помощи run_download_worker.
+    """
+    create_download_job(contents, job_file, dir_root, is_flatten, start_with, end_with)
+    sharded_download.run_workers(run_download_worker, job_file, processes_num or os.cpu_count())
+
+
+@timer
+def redownload_failures(log_paths: Iterable[str] = (SYNC_LOG_DIR,), fsync: bool = False) -> None:
+    """
+    Повторно загружает страницы, записанные в логи декоратора Retry синхронной версии (см. retry_log). log_paths -
+    файлы логов или директории, из которых берутся все файлы *.log. Одинаковые записи загружаются один раз, а
+    страницы, файлы которых уже есть на диске, не загружаются. Загрузка выполняется асинхронно (см. download_pages).
+    Записи загруженных страниц удаляются из логов; лог, в котором не осталось записей, удаляется.
+    """
+    logs = read_retry_logs(get_log_files(log_paths))
+    records = dict.fromkeys(record for log_records in logs.values() for record in log_records)
+    print(f"[INFO] Логов: {len(logs)}, страниц для загрузки: {len(records)}.")
+
+    pages = []
+    for link, path in records:
+        dir_path = path.rpartition("\\")[0]
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        page = Page(link)
+        page.path = path
+        pages.append(page)
+    download_pages(skip_complete_pages(pages), fsync)
+
+    done_paths = {path for _, path in records if os.path.isfile(path)}
+    for filename, log_records in logs.items():
+        left = prune_retry_log(filename, log_records, done_paths)
+        if left:
+            print(f"[WARNING] В логе {filename} осталось записей: {left}.")
+        else:
+            print(f"[INFO] Все страницы из лога {filename} загружены, лог удалён.")
+
+
+def get_log_file_name(extension: str) -> str:
+    """
+    Возвращает путь к файлу в директории LOG_DIR, имя которого соответствует текущим дате и времени.
+    """
+    return os.path.join(LOG_DIR, f"{datetime.now():%d_%m_%y %H_%M_%S}.{extension}")
+
+
+@timer
+def download_manga_from_url(url: str, dir_root: str, is_flatten: bool = False, start_with: int = 0,
+                            end_with: int = 0, is_resume: bool = False, use_cache: bool = True) -> None:
+    """
+    Загружает и сохраняет в корневую директорию dir_root мангу по ссылке на её главную страницу url, не строя
+    предварительно полную структуру манги: страницы каждой главы передаются на загрузку сразу после обработки главы,
+    а обработка глав и загрузка страниц используют одну сессию и общий набор соединений.
+    Параметры is_flatten, start_with, end_with и is_resume аналогичны параметрам download_manga, а use_cache -
+    параметру build_contents.
+    """
+    download_manga_pipelined(url, dir_root, is_flatten, start_with, end_with, is_resume, use_cache)
+
+
+def get_permitted_path(path: str) -> str:
+    """
+    Возвращает путь к директории path, из последней части которого удалены все неподдерживаемые Windows символы.
     """
     *path_lst, name = filter(None, path.split("\\"))
     for ch in WINDOWS_PROHIBITED_DIR_NAME_CHARS:
         name = name.replace(ch, "")
     path_lst.append(name)
-    new_path = '\\'.join(path_lst) + "\\"
+    return '\\'.join(path_lst) + "\\"
+
+
+def create_dir(path: str) -> str:
+    """
+    Создаёт директорию по пути path, при этом из пути удаляются все неподдерживаемые Windows символы. Возвращает 
+    путь, по которому была создана директория.
+    """
+    new_path = get_permitted_path(path)
     os.makedirs(new_path, exist_ok=True)
     return new_path
+
+
+def get_complete_files(path: str) -> set[str]:
+    """
+    Возвращает имена полностью загруженных страниц в директории path. Страница загружается во временный файл
+    с расширением .part и получает своё имя только после того, как загружена полностью и прошла проверку, поэтому
+    полностью загруженными считаются все файлы, кроме временных. Размер файла не является признаком полноты: файл,
+    оборванный при сбое, тоже непустой. Директория читается одним вызовом os.scandir, без отдельного обращения
+    к каждому файлу.
+    """
+    try:
+        with os.scandir(path) as entries:
+            return {entry.name for entry in entries if entry.is_file() and not entry.name.endswith(PART_SUFFIX)}
+    except FileNotFoundError:
+        return set()
+
+
+def skip_complete_pages(pages: Iterable[Page],
+                        complete_files: dict[str, set[str]] | None = None) -> Iterator[Page]:
+    """
+    Отбрасывает страницы, файлы которых уже сохранены на диске. Каждая директория сканируется только один раз;
+    результаты сканирования хранятся в complete_files, который можно передавать в несколько последовательных вызовов.
+    """
+    if complete_files is None:
+        complete_files = {}
+    for page in pages:
+        dir_path, _, file_name = page.path.rpartition("\\")
+        if dir_path not in complete_files:
+            complete_files[dir_path] = get_complete_files(dir_path + "\\")
+        if file_name not in complete_files[dir_path]:
+            yield page
+        else:
+            progress.page_skipped(page.path)
+
+
+def plan_pages(pages: Iterable[Page], journal: DownloadJournal) -> Iterator[Page]:
+    """
+    Записывает страницы в журнал загрузки пакетами по JOURNAL_BATCH_SIZE штук и отбрасывает страницы, которые по
+    данным журнала уже загружены. Страница передаётся дальше только после того, как она записана в журнал.
+    """
+    done_paths = journal.get_done_paths()
+    batch = []
+    for page in pages:
+        batch.append(page)
+        if len(batch) >= JOURNAL_BATCH_SIZE:
+            yield from plan_batch(batch, journal, done_paths)
+            batch = []
+    if batch:
+        yield from plan_batch(batch, journal, done_paths)
+
+
+def plan_batch(batch: list[Page], journal: DownloadJournal, done_paths: set[str]) -> Iterator[Page]:
+    """
+    Записывает пакет страниц в журнал загрузки и выдаёт те из них, которые ещё не загружены.
+    """
+    journal.plan((page.url, page.path) for page in batch)
+    for page in batch:
+        if page.path in done_paths:
+            progress.page_skipped(page.path)
+        else:
+            yield page
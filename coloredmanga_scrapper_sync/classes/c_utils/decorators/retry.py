@@ -1,46 +1,85 @@
 import functools
 import os.path
+import threading
 import time
 from datetime import datetime
+from urllib.parse import urlsplit
+
+from utility.metrics import FAILED_PAGES, PAGES, RETRIES
+from utility.progress import progress
+from utility.retry_policy import FailureManifest, RetryPolicy
+
+# Директория, в которую сохраняются логи и сведения о страницах, которые не удалось загрузить.
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "log")
+
+# Сведения о страницах, которые не удалось загрузить за время работы программы.
+failure_manifest = FailureManifest()
 
 
 class Retry:
     def __init__(self, func, retry=5):
         """
-        Декорирующий класс, многократно выполняющий функцию func при условии, что внутри функции возникло исключение.
+        Декорирующий класс, многократно выполняющий функцию func при условии, что внутри функции возникла временная
+        ошибка (см. RetryPolicy).
         Функция перестаёт выполняться либо после корректного завершения своей работы (не возникает исключений),
-        либо по достижению лимита повторов выполнения (параметр retry, по умолчанию равен 5).
-        Если достигнут лимит повторов выполнения, то информация об этом логгируется.
+        либо при постоянной ошибке (например, 404), либо по достижению лимита повторов выполнения (параметр retry,
+        по умолчанию равен 5). Перед каждым повтором выдерживается экспоненциально растущая пауза с учётом заголовка
+        Retry-After. Если загрузить данные так и не удалось, то информация об этом логгируется.
+        Результат загрузки передаётся в progress: функция должна принимать путь к файлу вторым аргументом и
+        возвращать число загруженных байт.
         """
         functools.update_wrapper(self, func)
         self.func = func
 
-        self.retry_num = retry
+        self.policy = RetryPolicy(retry)
 
         dt = datetime.now()
         cur_date_time = dt.strftime("%d_%m_%y %H_%M_%S")
 
-        self.log_file_name = f"..\\coloredmanga_scrapper_sync\\log\\{cur_date_time}.log"
+        self.log_file_name = os.path.normpath(os.path.join(LOG_DIR, f"{cur_date_time}.log"))
+        # функция может выполняться одновременно в нескольких потоках, а записи в лог не должны перемешиваться.
+        self.log_lock = threading.Lock()
+
+    def __get__(self, instance, owner):
+        """
+        Позволяет декорировать методы: при обращении к методу через экземпляр класса экземпляр передаётся
+        функции первым аргументом.
+        """
+        if instance is None:
+            return self
+        return functools.partial(self.__call__, instance)
 
     def __call__(self, *args, **kwargs):
-        for i in range(self.retry_num):
+        retry_num = self.policy.retry
+        for i in range(retry_num):
             try:
                 val = self.func(*args, **kwargs)
-                print(f"[INFO] Загружено: {args[1]}")
+                PAGES.inc()
+                progress.page_done(args[1], val or 0)
                 return val
-            except Exception:  # Перехватываем все исключения.
-                print(
-                    f"[WARNING] Ошибка загрузки {args[1]}.\n"
-                    f"Пытаемся произвести загрузку повторно: {i + 1}/{self.retry_num}"
-                )
-                time.sleep(5)  # Ждём некоторое время перед очередной попыткой выполнить загрузку.
-        else:  # Если полностью выполнился цикл for, т.е. данные загрузить так и не удалось.
-            print(f"[ERR] Не удалось загрузить {args[1]}. См. {self.log_file_name}")
-            with open(self.log_file_name, "a+", encoding='utf-8') as f_out:
-                f_out.write(
-                    f"from_link: {args[0].link}\n"
-                    f"to_file: {args[1]}\n\n"
+            except Exception as e:  # Перехватываем все исключения.
+                error = e
+                if not self.policy.is_transient(e) or i + 1 == retry_num:
+                    break
+                delay = self.policy.get_delay(i, getattr(e, "retry_after", None))
+                RETRIES.inc(urlsplit(args[0].link).netloc)
+                progress.page_retry(
+                    f"[WARNING] Ошибка загрузки {args[1]}: {e!r}.\n"
+                    f"Пытаемся произвести загрузку повторно через {delay:.1f} c.: {i + 2}/{retry_num}"
                 )
+                time.sleep(delay)  # Ждём некоторое время перед очередной попыткой выполнить загрузку.
+
+        # Данные загрузить так и не удалось.
+        print(f"[ERR] Не удалось загрузить {args[1]}. См. {self.log_file_name}")
+        os.makedirs(os.path.dirname(self.log_file_name), exist_ok=True)
+        with self.log_lock, open(self.log_file_name, "a+", encoding='utf-8') as f_out:
+            f_out.write(
+                f"from_link: {args[0].link}\n"
+                f"to_file: {args[1]}\n\n"
+            )
+        failure_manifest.add(args[0].link, args[1], error, i + 1)
+        FAILED_PAGES.inc()
+        progress.page_failed(args[1])
         return None
 
     def __del__(self):
@@ -51,6 +90,7 @@ class Retry:
         if os.path.isfile(self.log_file_name):
             print("\n" + "#" * 20)
             print(f"[ERR] Не удалось загрузить часть файлов, смотри {self.log_file_name}")
+            print("[INFO] Загрузить их повторно можно при помощи coloredmanga_scrapper_async\\redownload.py")
 
 
 def retry(retry=5):
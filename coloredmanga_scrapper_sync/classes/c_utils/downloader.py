@@ -1,24 +1,68 @@
 import json
 import os
+import threading
+import time
+from typing import Callable
+from urllib.parse import urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from classes.c_utils.decorators.retry import retry
-from utility.decorators import timer
+from classes.c_utils.decorators.retry import LOG_DIR, retry
+from classes.c_utils.html_cache import CHAPTER_PAGE_TTL, html_cache
+from utility.contents_format import is_compact_file, load_compact
+from utility.image_check import QUARANTINE_DIR_NAME, ImageValidator, IntegrityError, check_file, quarantine, read_head
+from utility.metrics import DOWNLOADED_BYTES, REQUEST_DURATION, REQUEST_TTFB, REQUESTS
+from utility.rate_limiter import rate_limiter
+from utility.retry_policy import DownloadError, RetryPolicy
+from utility.workers import workers
 
 
 class Downloader:
+    # Расширение файла, в который записывается ещё не до конца загруженное изображение.
+    PART_SUFFIX = ".part"
+
     headers = {
         "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9",
         "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.60 Safari/537.36"
     }
 
+    # Сессия, общая для всех загрузчиков и потоков: соединения с сервером не закрываются после запроса и
+    # используются повторно, поэтому установка соединения (TCP и TLS) не выполняется для каждого запроса заново.
+    __session: requests.Session | None = None
+    __session_lock = threading.Lock()
+
     def __init__(self, link: str) -> None:
         """
         Класс, обеспечивающий загрузку данных по сети и из файла на основе ссылки.
         """
         self.link = link
 
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        """
+        Возвращает общую сессию, при необходимости создавая её. Число соединений в пуле сессии соответствует числу
+        потоков workers.
+        """
+        with cls.__session_lock:
+            if cls.__session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers.threads_num)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                cls.__session = session
+            return cls.__session
+
+    @classmethod
+    def close_session(cls) -> None:
+        """
+        Закрывает общую сессию. При следующем запросе будет создана новая.
+        """
+        with cls.__session_lock:
+            session, cls.__session = cls.__session, None
+        if session is not None:
+            session.close()
+
     @staticmethod
     def __is_status_code_ok(data: requests.models.Response) -> None:
         """
@@ -35,6 +79,19 @@ class Downloader:
         if 'text/html' not in (cont_type := data.headers.get('Content-Type')):
             raise requests.exceptions.InvalidHeader(f"Результат запроса не HTML: {cont_type}")
 
+    @staticmethod
+    def __check_img_status_code(data: requests.models.Response) -> None:
+        """
+        Проверяет, что в результате выполнения запроса изображения получен код 200 (ОК). Иначе вызывает DownloadError,
+        по коду ответа которого Retry определяет, стоит ли повторять загрузку.
+        """
+        if data.status_code != 200:
+            raise DownloadError(
+                f"Сервер вернул код {data.status_code} на запрос по адресу {data.url}.",
+                data.status_code,
+                RetryPolicy.parse_retry_after(data.headers.get("Retry-After"))
+            )
+
     def __validate_html_data(self, data: requests.models.Response) -> None:
         """
         Проверка корректности полученных данных.
@@ -42,28 +99,65 @@ class Downloader:
         self.__is_status_code_ok(data)
         self.__is_content_type_html(data)
 
-    @timer
-    def download_html(self) -> str:
+    def __record_response(self, kind: str, data: requests.models.Response) -> None:
+        """
+        Записывает в метрики код ответа и время до получения заголовков ответа на запрос вида kind.
+        """
+        host = urlsplit(self.link).netloc
+        REQUESTS.inc(host, kind, str(data.status_code))
+        REQUEST_TTFB.observe(data.elapsed.total_seconds(), host, kind)
+
+    def __record_body(self, kind: str, started_at: float, size: int) -> None:
+        """
+        Записывает в метрики полное время запроса вида kind и число полученных байт size.
+        """
+        host = urlsplit(self.link).netloc
+        REQUEST_DURATION.observe(time.perf_counter() - started_at, host, kind)
+        DOWNLOADED_BYTES.inc(host, kind, amount=size)
+
+    def download_html(self, ttl: float = CHAPTER_PAGE_TTL) -> str:
         """
         Загружает данные из удалённого источника.
+        Загруженная страница сохраняется в html_cache на время ttl (в секундах), и до его истечения повторные
+        запросы этой страницы обслуживаются из кэша. Устаревшая запись кэша проверяется условным запросом.
+        Частота запросов и скорость получения данных ограничиваются rate_limiter, а время запроса и объём данных
+        записываются в метрики.
         """
+        entry = html_cache.get(self.link)
+        if entry is not None and entry.is_fresh:
+            return entry.text
+
+        headers = {**self.headers, **html_cache.get_conditional_headers(entry)}
+        rate_limiter.wait_request()
+        started_at = time.perf_counter()
         try:
-            data = requests.get(self.link, headers=self.headers, timeout=10)
+            data = self.get_session().get(self.link, headers=headers, timeout=10)
         except requests.exceptions.ConnectionError:
             raise TimeoutError(f"Сервер не отвечает на запрос по адресу {self.link}.")
+        self.__record_response("html", data)
+        self.__record_body("html", started_at, len(data.content))
+        rate_limiter.wait_bytes(len(data.content))
+
+        if entry is not None and data.status_code == 304:
+            html_cache.touch(self.link, ttl)
+            return entry.text
 
         self.__validate_html_data(data)
 
+        html_cache.put(self.link, data.text, data.headers.get("ETag"), data.headers.get("Last-Modified"), ttl)
         return data.text
 
     def download_local_file(self) -> dict:
         """
-        Загружает данные из файла.
+        Загружает данные из файла. Файл может быть как в обычном формате JSON, так и в компактном (определяется по
+        расширению, см. contents_format).
         """
         try:
             with open(self.link, 'r', encoding='utf-8') as f_in:
                 if os.stat(self.link).st_size == 0:  # если файл пуст
                     raise ValueError("Файл пуст. Произведите загрузку данных из удалённого источника.")
+                if is_compact_file(self.link):
+                    return load_compact(self.link)
                 return json.load(f_in)
         except FileNotFoundError:
             raise FileNotFoundError(
@@ -71,29 +165,100 @@ class Downloader:
             )
 
     @staticmethod
-    def __save_img(data: requests.models.Response, path: str) -> None:
+    def __get_part_offset(part_path: str) -> int:
         """
-        Сохраняет изображение в файл.
+        Возвращает количество байт, уже загруженных в файл part_path, или 0, если такого файла нет.
         """
-        with open(path, 'wb', buffering=0) as f_obj:
+        try:
+            return os.path.getsize(part_path)
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def __is_range_accepted(data: requests.models.Response, offset: int) -> bool:
+        """
+        Проверяет, что сервер выполнил запрос Range и вернул данные, начиная с байта offset.
+        """
+        if data.status_code != 206:
+            return False
+        return data.headers.get("Content-Range", "").startswith(f"bytes {offset}-")
+
+    @staticmethod
+    def __save_img(data: requests.models.Response, path: str, validator: ImageValidator,
+                   is_append: bool = False) -> None:
+        """
+        Сохраняет изображение в файл. При is_append=True данные дописываются в конец файла.
+        Данные получаются со скоростью, не превышающей ограничение rate_limiter, и по мере получения передаются
+        validator для проверки.
+        """
+        with open(path, 'ab' if is_append else 'wb', buffering=0) as f_obj:
             for block in data.iter_content(chunk_size=64 * 1024):
                 f_obj.write(block)
+                validator.update(block)
+                rate_limiter.wait_bytes(len(block))
+
+    @staticmethod
+    def __check_img(part_path: str, check: Callable[[], None]) -> None:
+        """
+        Выполняет проверку изображения check; если изображение её не прошло, то временный файл part_path
+        перемещается в карантин, а ошибка передаётся дальше, чтобы загрузка была повторена.
+        """
+        try:
+            check()
+        except IntegrityError:
+            quarantine(part_path, os.path.join(LOG_DIR, QUARANTINE_DIR_NAME))
+            raise
 
-    @timer
     # @console_log(info={'attr': 'link', 'm': 'загружено'})
     @retry(retry=5)
-    def download_img(self, path: str) -> None:
+    def download_img(self, path: str) -> int:
         """
         Загружает изображение.
+        Данные записываются во временный файл с расширением .part, который переименовывается только после полной
+        загрузки. Если временный файл остался от прерванной попытки, то загрузка продолжается с его конца при помощи
+        запроса Range; если сервер не поддерживает Range, то изображение скачивается заново.
+        По мере загрузки изображение проверяется (см. ImageValidator); файл, не прошедший проверку, перемещается в
+        карантин, а загрузка завершается ошибкой IntegrityError, после которой Retry повторяет её.
+        Время запроса и объём данных записываются в метрики. Возвращает число байт, загруженных этим запросом.
         """
+        part_path = f"{path}{self.PART_SUFFIX}"
+        offset = self.__get_part_offset(part_path)
+        headers = {**self.headers, "Range": f"bytes={offset}-"} if offset else self.headers
+
+        rate_limiter.wait_request()
+        started_at = time.perf_counter()
         try:
-            data = requests.get(self.link, headers=self.headers, stream=True, timeout=10)
-        except requests.exceptions.ConnectionError:
+            data = self.get_session().get(self.link, headers=headers, stream=True, timeout=10)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             raise TimeoutError(f"Сервер не отвечает на запрос по адресу {self.link}.")
+        self.__record_response("images", data)
 
-        self.__is_status_code_ok(data)
+        if data.status_code == 416:
+            # Запрошенный диапазон лежит за концом файла: либо временный файл уже загружен полностью, либо
+            # изображение на сервере изменилось. Во втором случае удаляем файл, и следующая попытка начнётся с нуля.
+            if data.headers.get("Content-Range", "").rpartition("/")[2] == str(offset):
+                self.__check_img(part_path, lambda: check_file(self.link, part_path))
+                os.replace(part_path, path)
+                return 0
+            os.remove(part_path)
+            raise ConnectionError(f"Временный файл {part_path} не соответствует изображению на сервере.")
+
+        is_append = self.__is_range_accepted(data, offset)
+        if not is_append:
+            self.__check_img_status_code(data)
+        validator = ImageValidator(self.link, offset, read_head(part_path)) if is_append else ImageValidator(self.link)
+        content_length = data.headers.get("Content-Length")
+        validator.check_response(data.headers.get("Content-Type"), int(content_length) if content_length else None,
+                                 data.headers.get("Content-Encoding"))
 
         try:
-            self.__save_img(data, path)
-        except requests.exceptions.ConnectionError:
+            self.__save_img(data, part_path, validator, is_append)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError):
             raise TimeoutError(f"Сервер не отвечает на запрос по адресу {self.link}.")
+        finally:
+            self.__record_body("images", started_at, validator.size - offset)
+
+        self.__check_img(part_path, validator.check)
+        os.replace(part_path, path)
+        return validator.size - offset if is_append else validator.size
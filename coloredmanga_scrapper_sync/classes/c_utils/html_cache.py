@@ -0,0 +1,179 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple
+
+# Файл, в котором хранится кэш html-страниц.
+HTML_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "html_cache.sqlite")
+
+# Максимальный суммарный размер сжатых страниц в кэше, при превышении которого удаляются давно не использованные.
+HTML_CACHE_MAX_SIZE = 256 * 1024 * 1024
+
+# Время (в секундах), в течение которого страница считается актуальной. Главная страница манги меняется с выходом
+# новых глав, а страницы глав после публикации практически не меняются.
+MANGA_PAGE_TTL = 60 * 60
+CHAPTER_PAGE_TTL = 7 * 24 * 60 * 60
+
+# Время (в секундах), не чаще которого обновляется время последнего обращения к записи: для вытеснения давно не
+# использованных записей достаточно приблизительного времени, а запись при каждом чтении замедлила бы кэш.
+ACCESS_UPDATE_INTERVAL = 10 * 60
+
+
+class CacheEntry(NamedTuple):
+    """
+    Запись кэша: текст страницы, значения заголовков ETag и Last-Modified и признак того, что запись актуальна.
+    """
+    text: str
+    etag: str | None
+    last_modified: str | None
+    is_fresh: bool
+
+
+class HtmlCache:
+    def __init__(self, filename: str = HTML_CACHE_FILE, max_size: int = HTML_CACHE_MAX_SIZE,
+                 bypass: bool = False) -> None:
+        """
+        Класс, хранящий загруженные html-страницы в сжатом виде в файле SQLite. Ключом записи служит url-адрес
+        страницы. У каждой записи есть своё время актуальности; устаревшая запись может быть подтверждена сервером
+        по сохранённым ETag и Last-Modified без повторной передачи страницы. Если суммарный размер записей превышает
+        max_size, то удаляются записи, к которым дольше всего не обращались. Суммарный размер записей хранится в
+        памяти и пересчитывается по файлу только перед вытеснением.
+        При bypass=True кэш не используется: записи не читаются и не сохраняются.
+        """
+        self.filename = os.path.normpath(filename)
+        self.max_size = max_size
+        self.bypass = bypass
+
+        # соединение открывается при первом обращении, чтобы файл кэша не создавался, если кэш не используется.
+        self.__connection: sqlite3.Connection | None = None
+        self.__lock = threading.Lock()
+        self.__total_size = 0
+
+    def __connect(self) -> sqlite3.Connection:
+        """
+        Открывает соединение с файлом кэша и создаёт таблицу, если её ещё нет. Журнал WAL позволяет сохранять записи
+        без перезаписи основного файла базы при каждой транзакции.
+        """
+        if self.__connection is None:
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            connection = sqlite3.connect(self.filename, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT PRIMARY KEY, body BLOB, etag TEXT, last_modified TEXT, "
+                "expires_at REAL, accessed_at REAL, size INTEGER)"
+            )
+            self.__total_size = self.__get_total_size(connection)
+            self.__connection = connection
+        return self.__connection
+
+    @staticmethod
+    def __get_total_size(connection: sqlite3.Connection) -> int:
+        """
+        Возвращает суммарный размер всех записей кэша.
+        """
+        return connection.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    @contextmanager
+    def bypassed(self, bypass: bool = True) -> Iterator[None]:
+        """
+        Отключает кэш (при bypass=True) на время выполнения блока with и затем восстанавливает прежнее значение
+        bypass, чтобы отключение кэша для одной операции не действовало на последующие.
+        """
+        previous, self.bypass = self.bypass, bypass
+        try:
+            yield
+        finally:
+            self.bypass = previous
+
+    def get(self, url: str) -> CacheEntry | None:
+        """
+        Возвращает запись кэша для страницы url или None, если её нет. Время последнего обращения к записи
+        обновляется не чаще, чем раз в ACCESS_UPDATE_INTERVAL секунд.
+        """
+        if self.bypass:
+            return None
+        with self.__lock:
+            connection = self.__connect()
+            row = connection.execute(
+                "SELECT body, etag, last_modified, expires_at, accessed_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[4] >= ACCESS_UPDATE_INTERVAL:
+                with connection:
+                    connection.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (now, url))
+        body, etag, last_modified, expires_at, _ = row
+        return CacheEntry(zlib.decompress(body).decode('utf-8'), etag, last_modified, expires_at > now)
+
+    def put(self, url: str, text: str, etag: str | None, last_modified: str | None, ttl: float) -> None:
+        """
+        Сохраняет страницу url в кэш на время ttl (в секундах).
+        """
+        if self.bypass:
+            return
+        body = zlib.compress(text.encode('utf-8'))
+        now = time.time()
+        with self.__lock:
+            connection = self.__connect()
+            old_size = connection.execute("SELECT size FROM pages WHERE url = ?", (url,)).fetchone()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (url, body, etag, last_modified, now + ttl, now, len(body))
+                )
+            self.__total_size += len(body) - (old_size[0] if old_size else 0)
+            if self.__total_size > self.max_size:
+                self.__evict(connection)
+
+    def touch(self, url: str, ttl: float) -> None:
+        """
+        Продлевает актуальность записи url на время ttl после того, как сервер подтвердил, что страница не изменилась.
+        """
+        if self.bypass:
+            return
+        with self.__lock:
+            connection = self.__connect()
+            with connection:
+                connection.execute("UPDATE pages SET expires_at = ? WHERE url = ?", (time.time() + ttl, url))
+
+    @staticmethod
+    def get_conditional_headers(entry: CacheEntry | None) -> dict[str, str]:
+        """
+        Возвращает заголовки условного запроса, позволяющие серверу ответить 304, если страница не изменилась.
+        """
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def __evict(self, connection: sqlite3.Connection) -> None:
+        """
+        Удаляет записи, к которым дольше всего не обращались, пока суммарный размер кэша превышает max_size.
+        Размер пересчитывается по файлу, так как кэш мог одновременно изменять другой процесс.
+        """
+        total_size = self.__get_total_size(connection)
+        self.__total_size = total_size
+        if total_size <= self.max_size:
+            return
+        to_delete = []
+        for url, size in connection.execute("SELECT url, size FROM pages ORDER BY accessed_at"):
+            if total_size <= self.max_size:
+                break
+            to_delete.append((url,))
+            total_size -= size
+        with connection:
+            connection.executemany("DELETE FROM pages WHERE url = ?", to_delete)
+        self.__total_size = total_size
+
+
+# Кэш html-страниц, общий для всех загрузчиков.
+html_cache = HtmlCache()
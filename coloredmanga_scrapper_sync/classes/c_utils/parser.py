@@ -1,7 +1,15 @@
 import lxml.html
+from lxml import etree
 
 from utility.decorators import timer
 
+# Выражения XPath для разбора главной страницы манги компилируются один раз при загрузке модуля.
+TITLE_XPATH = etree.XPath("//head/title/text()")
+NO_VOLUMES_XPATH = etree.XPath("//*[starts-with(@class, 'main version-chap no-volumn')]")
+VOLUMES_XPATH = etree.XPath("//*[starts-with(@class, 'parent has-child')]")
+VOLUME_NAME_XPATH = etree.XPath("string((.//a/text())[1])")
+CHAPTER_LINKS_XPATH = etree.XPath(".//*[starts-with(@class, 'wp-manga-chapter')]/a")
+
 
 class Parser:
     def __init__(self, data: str) -> None:
@@ -14,29 +22,27 @@ class Parser:
     def parse_manga_page(self) -> tuple[str, dict[str, dict[str, str]]]:
         """
         Разбирает главную страницу манги и находит название манги, а так же тома и главы для соответствующих томов.
+        Название и ссылка каждой главы извлекаются из одного и того же элемента за один проход по тому.
         """
         parsed_data: dict[str, dict[str, str]] = {}
 
         tree = lxml.html.document_fromstring(self.data)
 
-        title: str = tree.xpath("//head/title/text()")[0].split('|')[0].strip()[5:]
+        title: str = TITLE_XPATH(tree)[0].split('|')[0].strip()[5:]
 
         # У некоторых манг на сайте нет томов, только список глав. Обрабатываем такой случай.
-        no_volumes = tree.xpath("//*[starts-with(@class, 'main version-chap no-volumn')]")
+        no_volumes = NO_VOLUMES_XPATH(tree)
 
-        vols = no_volumes if no_volumes else tree.xpath("//*[starts-with(@class, 'parent has-child')]")
+        vols = no_volumes if no_volumes else VOLUMES_XPATH(tree)
 
         for vol in vols:
-            vol_name = vol.xpath(".//a/text()")[0].strip()
-            if no_volumes:
-                vol_name = "No Volumes"
-            chapters_names = vol.xpath(".//*[starts-with(@class, 'wp-manga-chapter')]/a/text()")
-            chapters_links = vol.xpath(".//*[starts-with(@class, 'wp-manga-chapter')]/a//@href")
+            vol_name = "No Volumes" if no_volumes else VOLUME_NAME_XPATH(vol).strip()
 
-            parsed_data[vol_name] = parsed_data.setdefault(vol_name, {})
+            vol_chapters = parsed_data.setdefault(vol_name, {})
 
-            for chapter_name, chapter_link in zip(chapters_names, chapters_links):
-                parsed_data[vol_name][chapter_name.strip()] = chapter_link
+            for link in CHAPTER_LINKS_XPATH(vol):
+                chapter_name = link.text if link.text is not None else link.text_content()
+                vol_chapters[chapter_name.strip()] = link.get('href')
 
         return title, parsed_data
 
@@ -1,11 +1,16 @@
+from concurrent.futures import Future
+
 import utility.utils as utils
 from classes.c_utils.downloader import Downloader
 from classes.c_utils.parser import Parser
 from classes.page import Page
-from utility.decorators import console_log
+from utility.progress import progress
+from utility.workers import workers
 
 
 class Chapter:
+    __slots__ = ('name', 'url', 'from_file', 'pages', 'raw_pages')
+
     def __init__(self, name: str, chapter_url: str, raw_pages: list[str] = None, from_file: bool = False) -> None:
         """
         Класс, хранящий название главы и список url-адресов её страниц.
@@ -69,7 +74,6 @@ class Chapter:
         for page in self.raw_pages:
             self.pages.append(Page(page))
 
-    @console_log(info={'attr': 'name', 'm': 'обработано'})
     def __build_pages(self) -> None:
         """
         Формирует список страниц данной главы с учётом того, откуда поступают данные.
@@ -79,10 +83,15 @@ class Chapter:
         else:
             chapter_pages = self.__get_pages_from_url()
             self.__build_pages_from_url(chapter_pages)
+            progress.chapter_done(self.name)
 
-    def download(self, path: str, page_number: int, is_flatten: bool) -> None:
+    def download(self, path: str, page_number: int, is_flatten: bool, is_resume: bool = False,
+                 complete_files: set[str] | None = None) -> list[Future]:
         """
-        Загружает страницы манги и сохраняет их.
+        Передаёт страницы манги на загрузку в пул потоков workers и возвращает задачи загрузки. Имена файлов
+        страниц определяются до передачи в пул, поэтому не зависят от порядка завершения загрузок.
+        При is_resume=True страницы, файлы которых уже есть на диске, пропускаются. Для упрощённой иерархии список
+        сохранённых файлов папки тома передаётся в complete_files, чтобы не сканировать её для каждой главы.
         """
         if is_flatten:
             permitted_path = path
@@ -90,6 +99,10 @@ class Chapter:
             path = f"{path}{self.name}\\"
             permitted_path = utils.create_dir(path)
 
+        if is_resume and complete_files is None:
+            complete_files = utils.get_complete_files(permitted_path)
+
+        futures = []
         number = page_number
         for page in self.pages:
             # Формируем имена страниц: "001" для обычного режима и "0001" для упрощённой иерархии файлов.
@@ -100,4 +113,9 @@ class Chapter:
 
             number += 1
 
-            page.download(permitted_path, number_str)
+            if is_resume and page.get_file_name(number_str) in complete_files:
+                progress.page_skipped(f"{permitted_path}{page.get_file_name(number_str)}")
+                continue
+
+            futures.append(workers.submit(page.download, permitted_path, number_str))
+        return futures
@@ -2,9 +2,12 @@ import math
 
 import utility.utils as utils
 from classes.c_utils.downloader import Downloader
+from classes.c_utils.html_cache import MANGA_PAGE_TTL
 from classes.c_utils.parser import Parser
 from classes.volume import Volume
 from utility.decorators import console_log
+from utility.progress import progress
+from utility.workers import workers
 
 
 class Manga:
@@ -50,7 +53,7 @@ class Manga:
         тома, а так же url-адреса глав, соответствующих томам.
         """
         downloader = Downloader(self.link)
-        manga_html = downloader.download_html()
+        manga_html = downloader.download_html(MANGA_PAGE_TTL)
 
         parser = Parser(manga_html)
         self.name, manga_vols = parser.parse_manga_page()
@@ -76,11 +79,15 @@ class Manga:
         # обработка только 2-х томов в целях отладки.
         # manga_vols = {k: manga_vols[k] for k in list(manga_vols)[:2]}
 
-        for vol_name, chapters in manga_vols.items():
-            # Главы в томах располагаются в обратном порядке, например,
-            # от Chapter_8 к Chapter_1, поэтому переворачиваем.
-            sorted_chapters = dict(sorted(chapters.items(), key=lambda x: int(x[0].split()[1])))
-            self.volumes.append(Volume(vol_name, sorted_chapters))
+        progress.start(chapters_num=sum(len(chapters) for chapters in manga_vols.values()))
+        try:
+            for vol_name, chapters in manga_vols.items():
+                # Главы в томах располагаются в обратном порядке, например,
+                # от Chapter_8 к Chapter_1, поэтому переворачиваем.
+                sorted_chapters = dict(sorted(chapters.items(), key=lambda x: int(x[0].split()[1])))
+                self.volumes.append(Volume(vol_name, sorted_chapters))
+        finally:
+            progress.stop()
 
     def __build_vols_from_file(self, manga_vols: list[dict]) -> None:
         """
@@ -112,10 +119,15 @@ class Manga:
             if start_with >= end_with:
                 raise ValueError("Номер начального тома или главы больше или равен номеру конечного.")
 
-    def download(self, dir_root: str, is_flatten: bool, start_with: int, end_with: int) -> None:
+    def download(self, dir_root: str, is_flatten: bool, start_with: int, end_with: int,
+                 is_resume: bool = False) -> None:
         """
         Загружает тома манги с учетом опциональных ограничений start_with и end_with, и сохраняет их.
         Если томов у манги нет, то данные ограничения применяются к главам.
+        При is_resume=True страницы, файлы которых уже есть на диске, повторно не загружаются.
+        Страницы загружаются в пуле потоков workers. Страницы следующего тома передаются на загрузку, пока
+        загружаются страницы текущего, а задачи хранятся не более чем для двух томов.
+        Ход загрузки выводится в консоль при помощи progress.
         """
         self.__validate_downloading_params(start_with, end_with)
 
@@ -125,6 +137,21 @@ class Manga:
         if end_with == 0:
             end_with = math.inf
 
+        is_no_volumes = len(self.volumes) == 1 and self.volumes[0].name == "No Volumes"
+        progress.start(1 if is_no_volumes else sum(start_with <= int(vol.name.split()[1]) < end_with
+                                                     for vol in self.volumes))
+        try:
+            self.__download_volumes(permitted_path, is_flatten, start_with, end_with, is_resume)
+        finally:
+            progress.stop()
+
+    def __download_volumes(self, path: str, is_flatten: bool, start_with: int, end_with: int | float,
+                           is_resume: bool) -> None:
+        """
+        Передаёт на загрузку тома, попадающие в диапазон от start_with до end_with (см. download), и дожидается
+        окончания их загрузки.
+        """
+        prev_futures = []
         for vol in self.volumes:
             # У некоторых манг на сайте нет томов, только главы. Обрабатываем такой случай.
             if len(self.volumes) == 1 and self.volumes[0].name == "No Volumes":
@@ -138,4 +165,7 @@ class Manga:
                 start_with_ch = 0
                 end_with_ch = math.inf
             if start_with <= vol_num < end_with:
-                vol.download(permitted_path, is_flatten, start_with_ch, end_with_ch)
+                futures = vol.download(path, is_flatten, start_with_ch, end_with_ch, is_resume)
+                workers.wait(prev_futures)
+                prev_futures = futures
+        workers.wait(prev_futures)
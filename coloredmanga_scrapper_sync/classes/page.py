@@ -2,6 +2,8 @@ from classes.c_utils.downloader import Downloader
 
 
 class Page:
+    __slots__ = ('url',)
+
     def __init__(self, page_url: str) -> None:
         """
         Класс, хранящий url-адрес страницы.
@@ -17,11 +19,17 @@ class Page:
     def to_JSON(self):
         return self.url
 
+    def get_file_name(self, page_number: str) -> str:
+        """
+        Возвращает имя файла, под которым будет сохранена страница.
+        """
+        extension = self.url.split(".")[-1]  # Определяем расширение файла.
+        return f"{page_number}.{extension}"
+
     def download(self, path: str, page_number: str) -> None:
         """
         Загружает страницу манги и сохраняет её с необходимым расширением.
         """
-        extension = self.url.split(".")[-1]  # Определяем расширение файла.
-        path = f"{path}{page_number}.{extension}"
+        path = f"{path}{self.get_file_name(page_number)}"
         downloader = Downloader(self.url)
         downloader.download_img(path)
@@ -1,8 +1,14 @@
+from concurrent.futures import Future
+
 import utility.utils as utils
 from classes.chapter import Chapter
+from utility.progress import progress
+from utility.workers import workers
 
 
 class Volume:
+    __slots__ = ('name', 'chapters', 'from_file')
+
     def __init__(self, name: str, chapters: dict[str, str] | list[dict], from_file: bool = False) -> None:
         """
         Класс, хранящий название тома и список его глав.
@@ -35,10 +41,10 @@ class Volume:
 
     def __build_chapters_from_url(self, chapters: dict[str, str]) -> None:
         """`
-        Формирует список глав для данных, полученных из удалённого источника.
+        Формирует список глав для данных, полученных из удалённого источника. html-страницы глав загружаются
+        параллельно в пуле потоков workers, при этом порядок глав сохраняется.
         """
-        for chapter_name, chapter_url in chapters.items():
-            self.chapters.append(Chapter(chapter_name, chapter_url))
+        self.chapters.extend(workers.map(lambda chapter: Chapter(*chapter), chapters.items()))
 
     def __build_chapters_from_file(self, chapters: list[dict]) -> None:
         """`
@@ -56,20 +62,30 @@ class Volume:
         else:
             self.__build_chapters_from_url(chapters)
 
-    def download(self, path: str, is_flatten: bool, start_with: int, end_with: int) -> None:
+    def download(self, path: str, is_flatten: bool, start_with: int, end_with: int,
+                 is_resume: bool = False) -> list[Future]:
         """
-        Загружает главы манги с учетом опциональных ограничений start_with и end_with и сохраняет их.
+        Передаёт страницы глав манги на загрузку в пул потоков с учетом опциональных ограничений start_with и
+        end_with. Возвращает задачи загрузки страниц.
         Данные ограничения могут действовать только при отсутствии у манги томов; в ином случае загружаются все главы.
+        При is_resume=True страницы, файлы которых уже есть на диске, пропускаются.
         """
         path = f"{path}{self.name}\\"
         permitted_path = utils.create_dir(path)
+        chapters = [ch for ch in self.chapters if start_with <= int(ch.name.split()[1]) < end_with]
+        # том учитывается в ходе загрузки до передачи страниц в пул, чтобы загруженные и пропущенные страницы
+        # относились к нему; в число страниц тома входят и те, которые будут пропущены.
+        progress.add_volume(self.name, permitted_path, sum(len(ch.pages) for ch in chapters))
+
+        # При упрощённой иерархии все страницы тома лежат в одной папке, поэтому сканируем её один раз.
+        complete_files = utils.get_complete_files(permitted_path) if is_resume and is_flatten else None
 
         # Вычисляем, какой номер будет у первой страницы главы. Если is_flatten=False, то он всегда равен 1;
         # иначе он равен сумме количества страниц ранее обработанных глав.
         ch_start_page_number = 1
-        for ch in self.chapters:
-            ch_num = int(ch.name.split()[1])
-            if start_with <= ch_num < end_with:
-                ch.download(permitted_path, ch_start_page_number, is_flatten)
-                if is_flatten:
-                    ch_start_page_number += len(ch.pages)
+        futures = []
+        for ch in chapters:
+            futures.extend(ch.download(permitted_path, ch_start_page_number, is_flatten, is_resume, complete_files))
+            if is_flatten:
+                ch_start_page_number += len(ch.pages)
+        return futures
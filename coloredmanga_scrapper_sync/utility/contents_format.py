@@ -0,0 +1,105 @@
+import gzip
+import json
+import os
+
+# Расширение файла содержания манги в компактном формате.
+COMPACT_EXTENSION = ".json.gz"
+
+# Версия компактного формата, записываемая в файл.
+COMPACT_FORMAT = "compact/1"
+
+
+def is_compact_file(filename: str) -> bool:
+    """
+    Проверяет по расширению, хранится ли содержание манги в файле filename в компактном формате.
+    """
+    return filename.endswith(COMPACT_EXTENSION)
+
+
+def get_common_prefix(urls: list[str]) -> str:
+    """
+    Возвращает общее начало url-адресов urls, оканчивающееся символом '/'.
+    """
+    if not urls:
+        return ""
+    prefix = os.path.commonprefix(urls)
+    return prefix[:prefix.rfind("/") + 1]
+
+
+def pack_contents(manga_json: dict) -> dict:
+    """
+    Преобразует содержание манги из обычного формата JSON в компактный. Адреса страниц главы хранятся в виде общего
+    начала и списка имён файлов, а общая для всех глав часть адресов страниц и адрес манги в адресах глав хранятся
+    один раз. Адреса глав, которые не начинаются с адреса манги, сохраняются полностью.
+    """
+    manga_url = manga_json['url']
+    chapters_prefixes = [
+        get_common_prefix(ch['pages'])
+        for vol in manga_json['volumes'] for ch in vol['chapters'] if ch['pages']
+    ]
+    pages_prefix = get_common_prefix(chapters_prefixes)
+
+    volumes = []
+    for vol in manga_json['volumes']:
+        chapters = []
+        for ch in vol['chapters']:
+            prefix = get_common_prefix(ch['pages'])
+            chapters.append({
+                "name": ch['name'],
+                "url": ch['url'][len(manga_url):] if ch['url'].startswith(manga_url) else ch['url'],
+                "prefix": prefix[len(pages_prefix):],
+                "files": [page[len(prefix):] for page in ch['pages']]
+            })
+        volumes.append({"name": vol['name'], "chapters": chapters})
+
+    packed = {key: value for key, value in manga_json.items() if key != 'volumes'}
+    packed.update(format=COMPACT_FORMAT, pages_prefix=pages_prefix, volumes=volumes)
+    return packed
+
+
+def unpack_chapter(chapter: dict, manga_url: str, pages_prefix: str) -> dict:
+    """
+    Преобразует главу из компактного формата в обычный.
+    """
+    prefix = pages_prefix + chapter['prefix']
+    return {
+        "name": chapter['name'],
+        "url": chapter['url'] if "://" in chapter['url'] else manga_url + chapter['url'],
+        "pages": [prefix + file for file in chapter['files']]
+    }
+
+
+def unpack_contents(packed: dict) -> dict:
+    """
+    Преобразует содержание манги из компактного формата в обычный формат JSON.
+    """
+    if packed.get('format') != COMPACT_FORMAT:
+        raise ValueError(f"Неподдерживаемый формат содержания: {packed.get('format')}")
+
+    manga_url = packed['url']
+    pages_prefix = packed['pages_prefix']
+    manga_json = {key: value for key, value in packed.items() if key not in ('format', 'pages_prefix', 'volumes')}
+    manga_json['volumes'] = [
+        {
+            "name": vol['name'],
+            "chapters": [unpack_chapter(ch, manga_url, pages_prefix) for ch in vol['chapters']]
+        }
+        for vol in packed['volumes']
+    ]
+    return manga_json
+
+
+def load_compact(filename: str) -> dict:
+    """
+    Загружает содержание манги из файла в компактном формате и возвращает его в обычном формате JSON.
+    """
+    with gzip.open(filename, 'rt', encoding='utf-8') as f_in:
+        return unpack_contents(json.load(f_in))
+
+
+def save_compact(manga_json: dict, filename: str) -> None:
+    """
+    Сохраняет содержание манги, представленное в обычном формате JSON, в файл в компактном формате.
+    """
+    with gzip.open(filename, 'wt', encoding='utf-8', compresslevel=9) as f_out:
+        json.dump(pack_contents(manga_json), f_out, ensure_ascii=False, separators=(',', ':'))
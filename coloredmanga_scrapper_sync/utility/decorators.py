@@ -1,17 +1,20 @@
 import functools
 import time
 
+from utility.metrics import FUNCTION_DURATION
+
 
 def timer(func):
     """
-    Выводит в консоль время выполнения декорированной функции.
+    Выводит в консоль время выполнения декорированной функции и записывает его в метрику FUNCTION_DURATION.
     """
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        start = time.time()
+        start = time.perf_counter()
         val = func(*args, **kwargs)
-        end = time.time()
-        print(f"[INFO] Время выполнения {func.__name__}: {end - start:4f} c.")
+        elapsed = time.perf_counter() - start
+        FUNCTION_DURATION.observe(elapsed, func.__name__)
+        print(f"[INFO] Время выполнения {func.__name__}: {elapsed:4f} c.")
 
         return val
 
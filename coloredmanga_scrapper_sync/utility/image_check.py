@@ -0,0 +1,151 @@
+import os
+from datetime import datetime
+
+from utility.retry_policy import DownloadError
+
+# Название директории (внутри директории логов), в которую перемещаются файлы, не прошедшие проверку.
+QUARANTINE_DIR_NAME = "quarantine"
+
+# Сигнатуры форматов изображений: байты в начале файла и маркер конца файла.
+IMAGE_SIGNATURES = {
+    "jpeg": (b"\xff\xd8\xff", b"\xff\xd9"),
+    "png": (b"\x89PNG\r\n\x1a\n", b"IEND\xaeB`\x82"),
+    "gif": (b"GIF8", b"\x3b"),
+}
+
+# Число байт, которые сохраняются из начала и из конца данных для проверки сигнатур.
+HEAD_SIZE = 16
+TAIL_SIZE = 64
+
+# Байты, которыми некоторые программы дополняют файл после маркера его конца.
+TRAILING_PADDING = b"\x00\r\n "
+
+# Типы содержимого, которые допускаются кроме image/*: некоторые серверы не указывают тип изображения.
+ALLOWED_CONTENT_TYPES = {"application/octet-stream", "binary/octet-stream"}
+
+
+class IntegrityError(DownloadError):
+    def __init__(self, message: str) -> None:
+        """
+        Исключение, возникающее, если загруженные данные не являются полным изображением: ответ сервера оборван или
+        вместо изображения получена, например, html-страница с ошибкой. Загрузку имеет смысл повторить.
+        """
+        super().__init__(message)
+
+    @property
+    def is_transient(self) -> bool:
+        """
+        Ошибка проверки изображения всегда считается временной.
+        """
+        return True
+
+
+def read_head(path: str) -> bytes:
+    """
+    Возвращает первые HEAD_SIZE байт файла path.
+    """
+    with open(path, 'rb') as f_in:
+        return f_in.read(HEAD_SIZE)
+
+
+def read_tail(path: str) -> bytes:
+    """
+    Возвращает последние TAIL_SIZE байт файла path.
+    """
+    with open(path, 'rb') as f_in:
+        f_in.seek(max(0, os.path.getsize(path) - TAIL_SIZE))
+        return f_in.read()
+
+
+def get_image_format(head: bytes) -> str | None:
+    """
+    Определяет формат изображения по первым байтам данных head. Возвращает None, если формат не распознан.
+    """
+    for image_format, (signature, _) in IMAGE_SIGNATURES.items():
+        if head.startswith(signature):
+            return image_format
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+class ImageValidator:
+    def __init__(self, url: str, offset: int = 0, head: bytes = b"") -> None:
+        """
+        Класс, проверяющий изображение по мере его загрузки, без повторного чтения файла: тип содержимого и длина
+        ответа сервера, сигнатура формата в начале данных и маркер конца изображения. Для проверки из потока данных
+        сохраняются только первые HEAD_SIZE и последние TAIL_SIZE байт.
+        Если загрузка продолжается с позиции offset, то head - первые байты уже загруженной части файла.
+        """
+        self.url = url
+        self.size = offset
+        self.expected_size: int | None = None
+        self.head = head[:HEAD_SIZE]
+        self.tail = b""
+
+    def check_response(self, content_type: str | None, content_length: int | None,
+                       content_encoding: str | None = None) -> None:
+        """
+        Проверяет заголовки ответа сервера до начала загрузки данных и запоминает ожидаемый размер файла.
+        content_length - длина данных ответа (при запросе Range - длина оставшейся части).
+        """
+        mime_type = (content_type or "").partition(";")[0].strip().lower()
+        if mime_type and not mime_type.startswith("image/") and mime_type not in ALLOWED_CONTENT_TYPES:
+            raise IntegrityError(f"Сервер вернул {mime_type} вместо изображения по адресу {self.url}.")
+        # при сжатии ответа длина относится к сжатым данным, а не к файлу.
+        if content_length is not None and content_encoding in (None, "identity"):
+            self.expected_size = self.size + content_length
+
+    def update(self, chunk: bytes) -> None:
+        """
+        Учитывает очередную часть данных изображения.
+        """
+        self.size += len(chunk)
+        if len(self.head) < HEAD_SIZE:
+            self.head += chunk[:HEAD_SIZE - len(self.head)]
+        if len(chunk) >= TAIL_SIZE:
+            self.tail = chunk[-TAIL_SIZE:]
+        else:
+            self.tail = (self.tail + chunk)[-TAIL_SIZE:]
+
+    def check(self) -> None:
+        """
+        Проверяет загруженное изображение целиком: размер, сигнатуру формата и маркер конца изображения.
+        """
+        if self.expected_size is not None and self.size != self.expected_size:
+            raise IntegrityError(
+                f"Получено {self.size} байт вместо {self.expected_size} по адресу {self.url}."
+            )
+        image_format = get_image_format(self.head)
+        if image_format is None:
+            raise IntegrityError(f"Данные по адресу {self.url} не являются изображением известного формата.")
+
+        if image_format == "webp":
+            # в заголовке RIFF записан размер файла без первых 8 байт.
+            is_complete = int.from_bytes(self.head[4:8], "little") + 8 <= self.size
+        else:
+            is_complete = self.tail.rstrip(TRAILING_PADDING).endswith(IMAGE_SIGNATURES[image_format][1])
+        if not is_complete:
+            raise IntegrityError(f"Изображение {image_format} по адресу {self.url} загружено не полностью.")
+
+
+def check_file(url: str, path: str) -> None:
+    """
+    Проверяет уже загруженный файл path, читая с диска только его начало и конец.
+    """
+    validator = ImageValidator(url, os.path.getsize(path), read_head(path))
+    validator.tail = read_tail(path)
+    validator.check()
+
+
+def quarantine(path: str, quarantine_dir: str) -> str:
+    """
+    Перемещает файл path, не прошедший проверку, в директорию quarantine_dir, чтобы его можно было изучить, и
+    возвращает новый путь к файлу.
+    """
+    os.makedirs(quarantine_dir, exist_ok=True)
+    name = os.path.basename(path.replace("\\", os.sep))
+    new_path = os.path.join(quarantine_dir, f"{datetime.now():%d_%m_%y %H_%M_%S_%f} {name}")
+    os.replace(path, new_path)
+    print(f"[WARNING] Файл {path} не прошёл проверку и перемещён в {new_path}")
+    return new_path
@@ -0,0 +1,324 @@
+import asyncio
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Границы интервалов гистограмм времени (в секундах).
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Интервал (в секундах) периодической выгрузки метрик в файлы.
+EXPORT_INTERVAL = 15.0
+
+# Интервал (в секундах), с которым измеряется задержка цикла событий.
+LOOP_LAG_INTERVAL = 0.5
+
+# Префикс названий всех метрик.
+METRICS_PREFIX = "coloredmanga_"
+
+
+class Metric:
+    # Тип метрики в формате Prometheus.
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = ()) -> None:
+        """
+        Базовый класс метрики с названием name, описанием description и именами меток labels. Значения хранятся
+        отдельно для каждого набора значений меток. Методы класса можно вызывать из разных потоков; каждое
+        изменение метрики - одна операция со словарём под блокировкой, поэтому метрики можно обновлять при каждом
+        запросе без заметных затрат.
+        """
+        self.name = f"{METRICS_PREFIX}{name}"
+        self.description = description
+        self.labels = labels
+        self.values: dict[tuple[str, ...], object] = {}
+        self.lock = threading.Lock()
+
+    def format_labels(self, label_values: tuple[str, ...], extra: str = "") -> str:
+        """
+        Возвращает метки в формате Prometheus, например {host="example.com",kind="images"}.
+        """
+        pairs = [f'{name}="{value}"' for name, value in zip(self.labels, label_values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def snapshot(self) -> list[dict]:
+        """
+        Возвращает текущие значения метрики для выгрузки в JSON.
+        """
+        with self.lock:
+            return [{"labels": dict(zip(self.labels, key)), "value": value} for key, value in self.values.items()]
+
+    def to_prometheus(self) -> list[str]:
+        """
+        Возвращает строки метрики в текстовом формате Prometheus.
+        """
+        with self.lock:
+            items = list(self.values.items())
+        return [f"{self.name}{self.format_labels(key)} {value}" for key, value in items]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        """
+        Увеличивает счётчик с метками label_values на amount.
+        """
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def get(self, *label_values: str) -> float:
+        """
+        Возвращает значение счётчика с метками label_values.
+        """
+        return self.values.get(label_values, 0)
+
+    def get_total(self) -> float:
+        """
+        Возвращает сумму значений счётчика по всем меткам.
+        """
+        with self.lock:
+            return sum(self.values.values())
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *label_values: str) -> None:
+        """
+        Устанавливает значение label_values.
+        """
+        with self.lock:
+            self.values[label_values] = value
+
+    def dec(self, *label_values: str, amount: float = 1) -> None:
+        """
+        Уменьшает значение с метками label_values на amount.
+        """
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """
+        Гистограмма: количество наблюдений в интервалах buckets (последний интервал - всё, что больше последней
+        границы), их сумма и число.
+        """
+        super().__init__(name, description, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """
+        Добавляет наблюдение value для меток label_values.
+        """
+        i = bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.values.get(label_values)
+            if counts is None:
+                # количества по интервалам, затем сумма и число наблюдений.
+                counts = self.values[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            counts[i] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def get_quantile(self, q: float, *label_values: str) -> float | None:
+        """
+        Возвращает оценку квантиля q (от 0 до 1) по гистограмме с метками label_values или None, если наблюдений не
+        было. Внутри интервала, в который попадает квантиль, наблюдения считаются распределёнными равномерно (как в
+        histogram_quantile в Prometheus); если квантиль больше последней границы, то возвращается эта граница.
+        """
+        with self.lock:
+            counts = list(self.values.get(label_values, ()))
+        if not counts or not counts[-1]:
+            return None
+        rank = q * counts[-1]
+        accumulated = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, counts):
+            if count and accumulated + count >= rank:
+                return lower + (bound - lower) * (rank - accumulated) / count
+            accumulated += count
+            lower = bound
+        return self.buckets[-1]
+
+    def snapshot(self) -> list[dict]:
+        """
+        Возвращает число и сумму наблюдений, а также оценки квантилей p50 и p99.
+        """
+        with self.lock:
+            items = [(key, list(counts)) for key, counts in self.values.items()]
+        result = []
+        for key, counts in items:
+            result.append({
+                "labels": dict(zip(self.labels, key)), "count": counts[-1], "sum": round(counts[-2], 6),
+                "p50": self.get_quantile(0.5, *key), "p99": self.get_quantile(0.99, *key)
+            })
+        return result
+
+    def to_prometheus(self) -> list[str]:
+        """
+        Возвращает строки гистограммы в текстовом формате Prometheus (накопленные количества по интервалам).
+        """
+        with self.lock:
+            items = [(key, list(counts)) for key, counts in self.values.items()]
+        lines = []
+        for key, counts in items:
+            accumulated = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                accumulated += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{self.format_labels(key, le)} {accumulated}")
+            lines.append(f"{self.name}_sum{self.format_labels(key)} {counts[-2]}")
+            lines.append(f"{self.name}_count{self.format_labels(key)} {counts[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        """
+        Класс, хранящий все метрики программы и выгружающий их снимки в файлы JSON и в текстовом формате
+        Prometheus (например, для textfile collector в node exporter). Выгрузка может выполняться периодически
+        отдельным потоком.
+        """
+        self.metrics: dict[str, Metric] = {}
+        self.started_at = time.time()
+        self.json_file: str | None = None
+        self.prometheus_file: str | None = None
+        self.__exporter: threading.Thread | None = None
+        self.__stop = threading.Event()
+        self.__lock = threading.Lock()
+
+    def __register(self, metric: Metric) -> Metric:
+        """
+        Добавляет метрику в реестр или возвращает уже зарегистрированную метрику с тем же названием.
+        """
+        with self.__lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, description: str, labels: tuple[str, ...] = ()) -> Counter:
+        """
+        Возвращает счётчик name, при необходимости создавая его.
+        """
+        return self.__register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels: tuple[str, ...] = ()) -> Gauge:
+        """
+        Возвращает показатель name, при необходимости создавая его.
+        """
+        return self.__register(Gauge(name, description, labels))
+
+    def histogram(self, name: str, description: str, labels: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        """
+        Возвращает гистограмму name, при необходимости создавая её.
+        """
+        return self.__register(Histogram(name, description, labels, buckets))
+
+    def snapshot(self) -> dict:
+        """
+        Возвращает снимок всех метрик.
+        """
+        with self.__lock:
+            metrics = list(self.metrics.values())
+        uptime = time.time() - self.started_at
+        return {
+            "time": time.time(),
+            "uptime": round(uptime, 3),
+            "pages_per_second": round(PAGES.get_total() / uptime, 3) if uptime else 0.0,
+            "metrics": {metric.name: metric.snapshot() for metric in metrics}
+        }
+
+    def to_prometheus(self) -> str:
+        """
+        Возвращает все метрики в текстовом формате Prometheus.
+        """
+        with self.__lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.to_prometheus())
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def __write_atomic(filename: str, text: str) -> None:
+        """
+        Записывает файл через временный файл, чтобы читатель никогда не увидел его частично записанным.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        tmp_filename = f"{filename}.tmp"
+        with open(tmp_filename, 'w', encoding='utf-8') as f_out:
+            f_out.write(text)
+        os.replace(tmp_filename, filename)
+
+    def export(self) -> None:
+        """
+        Выгружает снимок метрик в заданные файлы.
+        """
+        if self.json_file is not None:
+            self.__write_atomic(self.json_file, json.dumps(self.snapshot(), indent=2, ensure_ascii=False))
+        if self.prometheus_file is not None:
+            self.__write_atomic(self.prometheus_file, self.to_prometheus())
+
+    def start_export(self, json_file: str | None = None, prometheus_file: str | None = None,
+                     interval: float = EXPORT_INTERVAL) -> None:
+        """
+        Запускает выгрузку метрик в файлы json_file и prometheus_file каждые interval секунд. Последний снимок
+        выгружается при завершении программы.
+        """
+        self.json_file = json_file
+        self.prometheus_file = prometheus_file
+        if self.__exporter is not None:
+            return
+
+        def run() -> None:
+            while not self.__stop.wait(interval):
+                self.export()
+
+        self.__exporter = threading.Thread(target=run, name="metrics_exporter", daemon=True)
+        self.__exporter.start()
+        atexit.register(self.stop_export)
+
+    def stop_export(self) -> None:
+        """
+        Останавливает периодическую выгрузку и выгружает последний снимок метрик.
+        """
+        self.__stop.set()
+        self.export()
+
+
+async def watch_event_loop(interval: float = LOOP_LAG_INTERVAL) -> None:
+    """
+    Измеряет задержку цикла событий: насколько позже заданного срока просыпается ожидающая задача. Большая задержка
+    означает, что цикл событий занят блокирующими операциями. Выполняется до отмены задачи.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started_at = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(max(0.0, loop.time() - started_at - interval))
+
+
+# Реестр метрик, общий для всей программы.
+metrics = MetricsRegistry()
+
+# Метрики загрузки.
+REQUESTS = metrics.counter("requests_total", "Число запросов по хостам, видам и кодам ответа.",
+                           ("host", "kind", "status"))
+REQUEST_DURATION = metrics.histogram("request_duration_seconds", "Полное время запроса.", ("host", "kind"))
+REQUEST_TTFB = metrics.histogram("request_ttfb_seconds", "Время до получения заголовков ответа.", ("host", "kind"))
+DOWNLOADED_BYTES = metrics.counter("downloaded_bytes_total", "Число загруженных байт.", ("host", "kind"))
+PAGES = metrics.counter("pages_total", "Число загруженных страниц.")
+FAILED_PAGES = metrics.counter("failed_pages_total", "Число страниц, которые не удалось загрузить.")
+RETRIES = metrics.counter("retries_total", "Число повторных попыток загрузки.", ("host",))
+QUEUE_DEPTH = metrics.gauge("queue_depth", "Число страниц, ожидающих загрузки.")
+LOOP_LAG = metrics.histogram("event_loop_lag_seconds", "Задержка цикла событий.")
+FUNCTION_DURATION = metrics.histogram("function_duration_seconds", "Время выполнения функций.", ("function",))
@@ -0,0 +1,115 @@
+import json
+import os
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Коды ответа сервера, при которых запрос имеет смысл повторить: сервер перегружен, ограничивает частоту запросов
+# или временно недоступен. Все остальные коды ошибок (например, 404) считаются постоянными.
+TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class DownloadError(Exception):
+    def __init__(self, message: str, status: int | None = None, retry_after: float | None = None) -> None:
+        """
+        Исключение, возникающее при получении от сервера ответа с кодом ошибки.
+        Хранит код ответа status и время ожидания retry_after (в секундах) из заголовка Retry-After, если он был.
+        """
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def is_transient(self) -> bool:
+        """
+        Возвращает True, если ошибка временная и запрос может быть повторён.
+        """
+        return self.status in TRANSIENT_STATUSES
+
+
+class RetryPolicy:
+    def __init__(self, retry: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 transient_errors: tuple[type[Exception], ...] = (TimeoutError, ConnectionError)) -> None:
+        """
+        Класс, определяющий правила повторной загрузки: максимальное число попыток retry, какие ошибки считаются
+        временными (transient_errors и DownloadError с кодами TRANSIENT_STATUSES) и сколько ждать перед очередной
+        попыткой. Время ожидания растёт экспоненциально от base_delay до max_delay и выбирается случайно, чтобы
+        повторные запросы множества загрузчиков не приходили на сервер одновременно.
+        """
+        self.retry = retry
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.transient_errors = transient_errors
+
+    def is_transient(self, error: Exception) -> bool:
+        """
+        Проверяет, является ли ошибка временной, т.е. имеет ли смысл повторить запрос.
+        """
+        if isinstance(error, DownloadError):
+            return error.is_transient
+        return isinstance(error, self.transient_errors)
+
+    def get_delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """
+        Возвращает время ожидания в секундах перед попыткой с номером attempt + 1 (нумерация с 0). Если сервер
+        указал в заголовке Retry-After, сколько нужно подождать, то ожидание будет не меньше этого значения.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    @staticmethod
+    def parse_retry_after(value: str | None) -> float | None:
+        """
+        Разбирает значение заголовка Retry-After, которое может быть задано числом секунд или датой.
+        """
+        if not value:
+            return None
+        if value.strip().isdigit():
+            return float(value)
+        try:
+            retry_date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, (retry_date - datetime.now(timezone.utc)).total_seconds())
+
+
+class FailureManifest:
+    def __init__(self) -> None:
+        """
+        Класс, накапливающий сведения о страницах, которые не удалось загрузить, и сохраняющий их в файл JSON.
+        """
+        self.failures: list[dict] = []
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """
+        Возвращает количество незагруженных страниц.
+        """
+        return len(self.failures)
+
+    def add(self, url: str, path: str, error: Exception, attempts: int) -> None:
+        """
+        Добавляет сведения о незагруженной странице.
+        """
+        with self.__lock:
+            self.failures.append({
+                "url": url,
+                "path": path,
+                "error": repr(error),
+                "status": getattr(error, "status", None),
+                "attempts": attempts
+            })
+
+    def save(self, filename: str) -> None:
+        """
+        Сохраняет сведения о незагруженных страницах в файл filename. Если ошибок не было, то файл не создаётся.
+        """
+        if not self.failures:
+            return
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'w', encoding='utf-8') as f_out:
+            json.dump({"failures": self.failures}, f_out, indent=2, ensure_ascii=False)
+        print(f"[ERR] Не удалось загрузить страниц: {len(self.failures)}. См. {filename}")
@@ -1,8 +1,17 @@
 import json
 import os
+from datetime import datetime
 
+from classes.c_utils.decorators.retry import LOG_DIR, failure_manifest
+from classes.c_utils.html_cache import html_cache
+from classes.c_utils.downloader import Downloader
 from classes.manga import Manga
+from utility.contents_format import is_compact_file, save_compact
 from utility.decorators import console_log, timer
+from utility.metrics import EXPORT_INTERVAL, metrics
+from utility.progress import progress
+from utility.rate_limiter import rate_limiter
+from utility.workers import workers
 
 # Название манги и глав могут содержать символы, запрещённые в именах папок Windows.
 # В этом случае они должны быть удалены при создании папок.
@@ -10,30 +19,90 @@ WINDOWS_PROHIBITED_DIR_NAME_CHARS = ["<", ">", "*", "?", "/", "\\", "|", ":", '"
 
 
 @timer
-def build_contents(link: str, from_file: bool = False) -> Manga:
+def build_contents(link: str, from_file: bool = False, use_cache: bool = True) -> Manga:
     """
     Создаёт и возвращает экземпляр класса Manga.
     В процессе создания происходит загрузка иерархии файлов манги по ссылке link (т.е. томов, глав и страниц) с сайта
     или из предварительно сохранённого файла JSON в зависимости от параметра from_file.
+    Загруженные с сайта html-страницы сохраняются в кэш и при повторном построении берутся из него; при
+    use_cache=False кэш не используется.
     """
-    return Manga(link, from_file)
+    with html_cache.bypassed(not use_cache):
+        return Manga(link, from_file)
 
 
 @console_log(info='Данные сохранены')
 def save_contents(manga: Manga, filename: str = "..\\coloredmanga_scrapper_sync\\data\\contents.json") -> None:
     """
     Сохраняет содержимое, то есть иерархию томов, глав и страниц, класса Manga в файл в формате JSON.
+    Если имя файла оканчивается на .json.gz, то содержимое сохраняется в компактном формате (см. contents_format).
+    """
+    dump_contents(manga.to_JSON(), filename)
+
+
+def dump_contents(manga_json: dict, filename: str) -> None:
+    """
+    Сохраняет содержание манги, представленное в формате JSON, в файл. Формат файла определяется по его расширению.
     """
     try:
-        with open(filename, 'w', encoding='utf-8') as f_out:
-            json.dump(manga.to_JSON(), f_out, indent=2, ensure_ascii=False)
+        if is_compact_file(filename):
+            save_compact(manga_json, filename)
+        else:
+            with open(filename, 'w', encoding='utf-8') as f_out:
+                json.dump(manga_json, f_out, indent=2, ensure_ascii=False)
     except PermissionError:
         raise PermissionError("Файл доступен только для чтения. Измените атрибуты доступа.")
 
 
+@console_log(info='Данные преобразованы')
+def convert_contents(src_filename: str, dst_filename: str) -> None:
+    """
+    Преобразует файл содержания манги src_filename из одного формата в другой и сохраняет результат в dst_filename.
+    Формат обоих файлов определяется по расширению: .json.gz - компактный формат, иначе - обычный JSON.
+    """
+    dump_contents(Downloader(src_filename).download_local_file(), dst_filename)
+
+
+def set_rate_limit(requests_per_second: float | None = None, bytes_per_second: float | None = None) -> None:
+    """
+    Ограничивает частоту запросов к сайту (запросов в секунду) и скорость загрузки данных (байт в секунду) для всех
+    последующих загрузок. Значение None снимает соответствующее ограничение.
+    """
+    rate_limiter.configure(requests_per_second, bytes_per_second)
+
+
+def set_verbose(verbose: bool) -> None:
+    """
+    Включает или выключает подробный режим, в котором в консоль выводится строка о каждой загруженной странице и
+    обработанной главе, а также о каждой повторной попытке загрузки. Без него ход загрузки выводится одной строкой
+    раз в несколько секунд.
+    """
+    progress.verbose = verbose
+
+
+def start_metrics_export(json_file: str | None = None, prometheus_file: str | None = None,
+                         interval: float = EXPORT_INTERVAL) -> None:
+    """
+    Запускает периодическую (раз в interval секунд) выгрузку метрик загрузки: время запросов и время до первого
+    байта по хостам, объём загруженных данных, число загруженных страниц, повторов, длину очереди и т.д. Метрики
+    выгружаются в файл json_file в формате JSON и в файл prometheus_file в текстовом формате Prometheus (например,
+    в директорию textfile collector в node exporter). Последний снимок выгружается при завершении программы.
+    """
+    metrics.start_export(json_file, prometheus_file, interval)
+
+
+def set_threads_num(threads_num: int) -> None:
+    """
+    Устанавливает число потоков, одновременно загружающих html-страницы глав и изображения, и соответствующее ему
+    число соединений с сервером.
+    """
+    workers.configure(threads_num)
+    Downloader.close_session()
+
+
 @timer
 def download_manga(contents: Manga, dir_root: str, is_flatten: bool = False, start_with: int = 0,
-                   end_with: int = 0) -> None:
+                   end_with: int = 0, is_resume: bool = False) -> None:
     """
     Загружает и сохраняет в корневую директорию dir_root мангу, сохраняя при этом иерархию томов и глав на основе
     contents.
@@ -52,8 +121,12 @@ def download_manga(contents: Manga, dir_root: str, is_flatten: bool = False, sta
     скачивания. Если значение равно 0, то ограничений нет. Если параметр end_with задан, то производится скачивание
     томов до него не включительно, т.е. при start_with=5, end_with=9 будут скачаны тома 5, 6, 7, 8.
     Если томов у манги на сайте нет (только список глав), то данные параметры будут применены к главам.
+    Параметр is_resume позволяет продолжить прерванную загрузку: страницы, файлы которых уже есть на диске,
+    повторно не скачиваются.
+    Сведения о страницах, которые так и не удалось загрузить, сохраняются в формате JSON в директорию log.
     """
-    contents.download(dir_root, is_flatten, start_with, end_with)
+    contents.download(dir_root, is_flatten, start_with, end_with, is_resume)
+    failure_manifest.save(os.path.normpath(os.path.join(LOG_DIR, f"{datetime.now():%d_%m_%y %H_%M_%S}.json")))
 
 
 def create_dir(path: str) -> str:
@@ -68,3 +141,20 @@ def create_dir(path: str) -> str:
     new_path = '\\'.join(path_lst) + "\\"
     os.makedirs(new_path, exist_ok=True)
     return new_path
+
+
+def get_complete_files(path: str) -> set[str]:
+    """
+    Возвращает имена полностью загруженных страниц в директории path. Страница загружается во временный файл
+    с расширением .part и получает своё имя только после того, как загружена полностью и прошла проверку, поэтому
+    полностью загруженными считаются все файлы, кроме временных. Размер файла не является признаком полноты: файл,
+    оборванный при сбое, тоже непустой. Директория читается одним вызовом os.scandir, без отдельного обращения
+    к каждому файлу.
+    """
+    try:
+        with os.scandir(path) as entries:
+            return {
+                entry.name for entry in entries if entry.is_file() and not entry.name.endswith(Downloader.PART_SUFFIX)
+            }
+    except FileNotFoundError:
+        return set()
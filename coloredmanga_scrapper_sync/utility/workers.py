@@ -0,0 +1,70 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable
+
+from utility.metrics import QUEUE_DEPTH
+
+# Число потоков, одновременно загружающих html-страницы глав и изображения. Устанавливаем небольшое значение,
+# чтобы не нагружать сервер.
+THREADS_NUM = 8
+
+
+class WorkersPool:
+    def __init__(self, threads_num: int = THREADS_NUM) -> None:
+        """
+        Класс, выполняющий загрузки в пуле из threads_num потоков. Пул создаётся при первом обращении и
+        используется всеми загрузчиками: и при обработке глав, и при загрузке страниц.
+        """
+        self.threads_num = threads_num
+        self.__executor: ThreadPoolExecutor | None = None
+        self.__lock = threading.Lock()
+
+    def configure(self, threads_num: int) -> None:
+        """
+        Устанавливает число потоков. Уже запущенные загрузки завершаются в прежнем пуле.
+        """
+        if threads_num < 1:
+            raise ValueError("Число потоков не может быть меньше 1.")
+        with self.__lock:
+            self.threads_num = threads_num
+            executor, self.__executor = self.__executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def __get_executor(self) -> ThreadPoolExecutor:
+        """
+        Возвращает пул потоков, при необходимости создавая его.
+        """
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = ThreadPoolExecutor(max_workers=self.threads_num, thread_name_prefix="downloader")
+            return self.__executor
+
+    def submit(self, func: Callable, *args) -> Future:
+        """
+        Передаёт функцию func на выполнение в пул потоков. Число невыполненных задач записывается в метрику
+        QUEUE_DEPTH.
+        """
+        QUEUE_DEPTH.inc()
+        future = self.__get_executor().submit(func, *args)
+        future.add_done_callback(lambda _: QUEUE_DEPTH.dec())
+        return future
+
+    def map(self, func: Callable, iterable: Iterable) -> list:
+        """
+        Выполняет func для всех элементов iterable в пуле потоков и возвращает результаты в исходном порядке.
+        """
+        return list(self.__get_executor().map(func, iterable))
+
+    @staticmethod
+    def wait(futures: Iterable[Future]) -> None:
+        """
+        Дожидается завершения всех задач futures. Если какая-либо задача завершилась с ошибкой, то ошибка передаётся
+        вызывающему коду.
+        """
+        for future in futures:
+            future.result()
+
+
+# Пул потоков, общий для всех загрузчиков.
+workers = WorkersPool()